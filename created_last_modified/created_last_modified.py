@@ -1,13 +1,20 @@
 import re
 import csv
+import sys
+import copy
 import json
 import argparse
 import os
-import shutil
 from datetime import datetime
-from zipfile import ZipFile, ZIP_DEFLATED
+from functools import partial
+from contextlib import nullcontext
+from multiprocessing import Pool
+from zipfile import ZipFile
+sys.path.append('../utilities/record_hashes')
+from record_hashes import dump_member, iter_hash_rows
 
-DUMP_FILES_DIR = 'dump_files'
+CACHE_DIR = 'hash_cache'
+STATE_FILE = 'history_state.json'
 
 
 def extract_date(file_name):
@@ -17,24 +24,35 @@ def extract_date(file_name):
     return None
 
 
-def get_json_file(dump_path):
-    if not os.path.exists(DUMP_FILES_DIR):
-        os.mkdir(DUMP_FILES_DIR)
-    dump_unzipped = None
-    with ZipFile(dump_path, "r") as zf:
-        json_filename = None
-        for name in zf.namelist():
-            # assumes ror-data zip will only contain 1 JSON file
-            if name.endswith('.json') and not 'MACOSX' in name and not 'schema_v2' in name:
-                json_filename = name
-        dump_unzipped = zf.extract(json_filename, DUMP_FILES_DIR)
-        json_file_date = extract_date(dump_unzipped)
-        if json_file_date is None:
-            head, tail = os.path.split(dump_path)
-            filename = os.path.splitext(tail)
-            os.rename(dump_unzipped, os.path.join(DUMP_FILES_DIR, filename[0] + '.json'))
-            dump_unzipped = os.path.join(DUMP_FILES_DIR, filename[0] + '.json')
-    return dump_unzipped
+def get_dump_hashes(dump_path, cache_dir):
+    # Runs in a worker process. Per-release hashes are kept in cache_dir, so
+    # each dump is only decompressed and parsed the first time it is seen.
+    try:
+        with ZipFile(dump_path, "r") as zf:
+            # v1 history: skip the v2 file in zips that contain both
+            member = dump_member(zf, exclude='schema_v2')
+        return {row[0]: row[1] for row in iter_hash_rows(dump_path, member, cache_dir=cache_dir)}
+    except Exception:
+        return None
+
+
+def load_state(cache_dir, dump_names):
+    # The state after the last run can be reused when the dumps it covered
+    # are still the first dumps in the list.
+    path = os.path.join(cache_dir, STATE_FILE)
+    if os.path.exists(path):
+        with open(path) as f_in:
+            state = json.load(f_in)
+        if state['dumps'] == dump_names[:len(state['dumps'])]:
+            return state
+    return {'dumps': [], 'created': {}, 'last_modified': {}, 'hashes': {}}
+
+
+def save_state(cache_dir, state):
+    path = os.path.join(cache_dir, STATE_FILE)
+    with open(path + '.tmp', 'w') as f_out:
+        json.dump(state, f_out)
+    os.replace(path + '.tmp', path)
 
 
 def write_to_csv(first_appearance, last_modified, output_file):
@@ -46,53 +64,41 @@ def write_to_csv(first_appearance, last_modified, output_file):
                                 last_modified.get(ror_id, first_appearance[ror_id])])
 
 
-def find_last_modified(json_files):
-    id_last_modified = {}
-    previous_records = {}
-    all_ids = set()
-    for json_file in (json_files):
-        release_date = extract_date(json_file)
-        try:
-            with open(json_file, 'r') as file:
-                records = json.load(file)
-                for record in records:
-                    ror_id = record.get("id")
-                    if ror_id not in all_ids:
-                        all_ids.add(ror_id)
-                        previous_records[ror_id] = record
-                        id_last_modified[ror_id] = release_date
-                    elif record != previous_records[ror_id]:
-                        previous_records[ror_id] = record
-                        id_last_modified[ror_id] = release_date
-        except:
-            print(f"Error processing file {json_file}.")
-    return id_last_modified
-
-
-def find_created(json_files):
-    id_map = {}
-    processed_ids = set()
-    for json_file in json_files:
-        release_date = extract_date(json_file)
-        try:
-            with open(json_file, 'r') as file:
-                records = json.load(file)
-                for record in records:
-                    ror_id = record.get("id")
-                    if ror_id not in processed_ids:
-                        id_map[ror_id] = release_date
-                        processed_ids.add(ror_id)
-        except:
-            print(f"Error processing file {json_file}.")
-    return id_map
-
-
-def extract_json_files(data_dumps):
-    json_files = []
-    for dump in data_dumps:
-        json_file = get_json_file(dump)
-        json_files.append(json_file)
-    return json_files
+def find_created_last_modified(data_dumps, cache_dir=CACHE_DIR, workers=1):
+    # Records are compared by content hash, so only one hash per ID is kept
+    # from the previous release, and dumps already covered by the saved state
+    # are skipped entirely.
+    os.makedirs(cache_dir, exist_ok=True)
+    state = load_state(cache_dir, [os.path.basename(dump) for dump in data_dumps])
+    id_created = state['created']
+    id_last_modified = state['last_modified']
+    previous_hashes = state['hashes']
+    pending = data_dumps[len(state['dumps']):]
+    print(f"{len(state['dumps'])} dumps already processed, {len(pending)} to process")
+    get_hashes = partial(get_dump_hashes, cache_dir=cache_dir)
+    # The state saved for the next run stops before the first dump that could
+    # not be read, so that dump and every later one are processed again
+    saved_state = None
+    with Pool(workers) if workers > 1 else nullcontext() as pool:
+        # imap keeps release order while later dumps are parsed in the background
+        results = pool.imap(get_hashes, pending) if pool else map(get_hashes, pending)
+        for dump, hashes in zip(pending, results):
+            if hashes is None:
+                print(f"Error processing file {dump}.")
+                if saved_state is None:
+                    saved_state = copy.deepcopy(state)
+                continue
+            state['dumps'].append(os.path.basename(dump))
+            release_date = extract_date(dump)
+            for ror_id, digest in hashes.items():
+                if ror_id not in id_created:
+                    id_created[ror_id] = release_date
+                    id_last_modified[ror_id] = release_date
+                elif digest != previous_hashes[ror_id]:
+                    id_last_modified[ror_id] = release_date
+                previous_hashes[ror_id] = digest
+    save_state(cache_dir, saved_state if saved_state is not None else state)
+    return id_created, id_last_modified
 
 
 def get_file_list(dump_dir):
@@ -110,6 +116,8 @@ def parse_args():
     parser = argparse.ArgumentParser(
         description="Parse ROR data dump files to determine when a record was first created and last modified.")
     parser.add_argument("-d", "--dump_directory", default="../../ror-data", help="Path to a directory that contains ROR dump files to extract dates from")
+    parser.add_argument("-c", "--cache_directory", default=CACHE_DIR, help="Directory for per-release record hashes and the saved history state")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="Number of worker processes used to parse dumps")
     return parser.parse_args()
 
 
@@ -117,12 +125,9 @@ def main():
     args = parse_args()
     data_dumps = get_file_list(args.dump_directory)
     output_file = os.path.split(data_dumps[len(data_dumps)-1])[1].strip(".zip") + "_created_last_mod.csv"
-    json_files = extract_json_files(data_dumps)
-    first_appearance_data = find_created(json_files)
-    last_modified_data = find_last_modified(json_files)
+    first_appearance_data, last_modified_data = find_created_last_modified(data_dumps, args.cache_directory, args.workers)
     print("Output file is {0}".format(output_file))
     write_to_csv(first_appearance_data, last_modified_data, output_file)
-    shutil.rmtree(DUMP_FILES_DIR)
 
 
 if __name__ == "__main__":
@@ -62,7 +62,64 @@ def parse_args(args: list[str] | None = None) -> argparse.Namespace:
     return parsed
 
 
+def parse_serve_args(args: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="curation-validation serve",
+        description="Serve validation jobs with the ROR data dump kept in memory",
+    )
+
+    parser.add_argument(
+        "-d", "--data-dump",
+        type=str,
+        default="github",
+        help="Path to data dump JSON/zip file (default: fetch from GitHub)",
+    )
+
+    parser.add_argument(
+        "-u", "--geonames-user",
+        type=str,
+        default=None,
+        help="Default GeoNames API username for jobs",
+    )
+
+    parser.add_argument(
+        "--host",
+        type=str,
+        default="127.0.0.1",
+        help="Address to bind (default: 127.0.0.1)",
+    )
+
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8765,
+        help="Port to bind (default: 8765)",
+    )
+
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=3600,
+        help="Seconds between checks for a newer data dump; 0 disables (default: 3600)",
+    )
+
+    return parser.parse_args(args)
+
+
 def main() -> int:
+    if sys.argv[1:2] == ["serve"]:
+        serve_args = parse_serve_args(sys.argv[2:])
+
+        from curation_validation.server import serve
+
+        return serve(
+            data_dump=serve_args.data_dump,
+            host=serve_args.host,
+            port=serve_args.port,
+            geonames_user=serve_args.geonames_user,
+            poll_interval=serve_args.poll_interval,
+        )
+
     args = parse_args()
 
     csv_file = Path(args.csv) if args.csv else None
@@ -4,7 +4,7 @@ import re
 import tempfile
 import zipfile
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Optional
 
 import requests
 
@@ -15,6 +15,7 @@ class DataSource:
     def __init__(self, records: list[dict]):
         self._records_by_id: dict[str, dict] = {}
         self._records: list[dict] = records
+        self._indexes: dict[str, Any] = {}
         for record in records:
             if "id" in record:
                 self._records_by_id[record["id"]] = record
@@ -76,6 +77,11 @@ class DataSource:
     def get_all_records(self) -> list[dict]:
         return self._records
 
+    def get_index(self, name: str, builder: Callable[[list[dict]], Any]) -> Any:
+        if name not in self._indexes:
+            self._indexes[name] = builder(self._records)
+        return self._indexes[name]
+
     def find_related_records(self, ror_id: str) -> list[dict]:
         related = []
         for record in self._records_by_id.values():
@@ -108,23 +114,38 @@ class DataLoader:
             return (int(match.group(1)), int(match.group(2)), match.group(3))
         return (0, 0, "")
 
-    def _load_from_github(self) -> DataSource:
+    def current_version(self) -> str:
+        if self.source == "github":
+            return self._latest_github_release()["name"]
+
+        file_path = Path(self.source)
+        if not file_path.exists():
+            raise DataLoadError(f"File not found: {file_path}")
+        stat = file_path.stat()
+        return f"{file_path.name}@{stat.st_mtime_ns}:{stat.st_size}"
+
+    def _latest_github_release(self) -> dict:
         try:
             response = requests.get(self.GITHUB_CONTENTS_URL, timeout=30)
             response.raise_for_status()
             contents = response.json()
+        except requests.RequestException as e:
+            raise DataLoadError(f"Error fetching from GitHub: {e}")
 
-            zip_files = [
-                item for item in contents
-                if item["name"].endswith(".zip") and self.VERSION_PATTERN.match(item["name"])
-            ]
+        zip_files = [
+            item for item in contents
+            if item["name"].endswith(".zip") and self.VERSION_PATTERN.match(item["name"])
+        ]
 
-            if not zip_files:
-                raise DataLoadError("No ROR data zip files found in repository")
+        if not zip_files:
+            raise DataLoadError("No ROR data zip files found in repository")
 
-            zip_files.sort(key=lambda x: self._parse_version(x["name"]), reverse=True)
-            latest = zip_files[0]
+        zip_files.sort(key=lambda x: self._parse_version(x["name"]), reverse=True)
+        return zip_files[0]
 
+    def _load_from_github(self) -> DataSource:
+        latest = self._latest_github_release()
+        try:
             zip_response = requests.get(latest["download_url"], timeout=120)
             zip_response.raise_for_status()
 
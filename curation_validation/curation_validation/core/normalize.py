@@ -2,13 +2,13 @@ import re
 from typing import Optional
 from urllib.parse import unquote, quote
 
-from furl import furl
-
 
 def normalize_url(url: str) -> Optional[str]:
     if not url or not url.strip():
         return None
 
+    from furl import furl
+
     try:
         f = furl(url)
         f.path.normalize()
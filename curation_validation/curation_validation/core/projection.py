@@ -0,0 +1,119 @@
+from functools import cached_property
+from typing import Any
+
+from curation_validation.core.normalize import normalize_wikipedia_url
+
+NAME_TYPES = ("ror_display", "alias", "label", "acronym")
+LINK_TYPES = ("wikipedia", "website")
+EXTERNAL_ID_TYPES = ("isni", "fundref", "wikidata")
+
+
+def _empty_simplified() -> dict[str, list]:
+    simplified = {
+        "status": [],
+        "types": [],
+        "established": [],
+        "locations.geonames_id": [],
+    }
+    for name_type in NAME_TYPES:
+        simplified[f"names.types.{name_type}"] = []
+    for link_type in LINK_TYPES:
+        simplified[f"links.type.{link_type}"] = []
+    for id_type in EXTERNAL_ID_TYPES:
+        simplified[f"external_ids.type.{id_type}.preferred"] = []
+        simplified[f"external_ids.type.{id_type}.all"] = []
+    return simplified
+
+
+class RecordProjection:
+    def __init__(self, record: dict, normalize_wikipedia: bool = True, sep: str = "_"):
+        self.record = record
+        self.normalize_wikipedia = normalize_wikipedia
+        self.sep = sep
+
+    @cached_property
+    def _simplified_and_inverted(self) -> tuple[dict[str, list], dict[Any, list[str]]]:
+        j = self.record
+        simplified = _empty_simplified()
+
+        simplified["status"].append(j.get("status", []))
+        simplified["types"].extend(j.get("types", []))
+        simplified["established"].append(j.get("established", []))
+        simplified["locations.geonames_id"].extend(
+            location["geonames_id"] for location in j.get("locations", [])
+        )
+
+        name_buckets = [
+            (name_type, simplified[f"names.types.{name_type}"]) for name_type in NAME_TYPES
+        ]
+        for name in j.get("names", []):
+            types = name.get("types", [])
+            for name_type, bucket in name_buckets:
+                if name_type in types:
+                    bucket.append(name["value"])
+
+        for link in j.get("links", []):
+            link_type = link.get("type")
+            if link_type not in LINK_TYPES:
+                continue
+            value = link["value"]
+            if link_type == "wikipedia" and self.normalize_wikipedia:
+                value = normalize_wikipedia_url(value)
+            simplified[f"links.type.{link_type}"].append(value)
+
+        invalid_all = set()
+        for ext_id in j.get("external_ids", []):
+            id_type = ext_id.get("type")
+            if id_type not in EXTERNAL_ID_TYPES:
+                continue
+            simplified[f"external_ids.type.{id_type}.preferred"].append(ext_id["preferred"])
+            all_values = ext_id.get("all", [])
+            if isinstance(all_values, list):
+                simplified[f"external_ids.type.{id_type}.all"].extend(all_values)
+            else:
+                invalid_all.add(id_type)
+        # A malformed "all" invalidates every value of that ID type, matching
+        # the behaviour of the original per-field projection.
+        for id_type in invalid_all:
+            simplified[f"external_ids.type.{id_type}.all"] = []
+
+        all_values = []
+        inverted: dict[Any, list[str]] = {}
+        for key, values in simplified.items():
+            for value in values:
+                if value:
+                    all_values.append(value)
+                    inverted.setdefault(value, []).append(key)
+        simplified["all"] = all_values
+        return simplified, inverted
+
+    @property
+    def simplified(self) -> dict[str, list]:
+        return self._simplified_and_inverted[0]
+
+    @property
+    def inverted(self) -> dict[Any, list[str]]:
+        return self._simplified_and_inverted[1]
+
+    @cached_property
+    def flattened(self) -> dict[str, Any]:
+        flattened = {}
+        sep = self.sep
+        path: list[str] = []
+
+        def flatten(obj):
+            if type(obj) is dict:
+                for key, value in obj.items():
+                    path.append(key)
+                    flatten(value)
+                    path.pop()
+            elif type(obj) is list:
+                for i, item in enumerate(obj):
+                    path.append(str(i))
+                    flatten(item)
+                    path.pop()
+            else:
+                flattened[sep.join(path)] = obj
+
+        flatten(self.record)
+        return flattened
@@ -1,12 +1,16 @@
+from __future__ import annotations
+
 import sys
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
 from curation_validation.core.exceptions import ConfigurationError
 from curation_validation.core.io import write_csv
-from curation_validation.core.loader import DataLoader, DataSource
 from curation_validation.validators.base import BaseValidator, ValidatorContext
 
+if TYPE_CHECKING:
+    from curation_validation.core.loader import DataSource
+
 
 VALIDATORS: dict[str, BaseValidator] = {}
 
@@ -36,6 +40,8 @@ def run_validators(
     data_dump_path: Optional[str],
     geonames_user: Optional[str],
     tests: list[str],
+    data_source: Optional[DataSource] = None,
+    reports: Optional[list[dict]] = None,
 ) -> int:
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
@@ -74,9 +80,10 @@ def run_validators(
         return 0
 
     needs_data = any(v.requires_data_source for v in runnable)
-    data_source: Optional[DataSource] = None
 
-    if needs_data:
+    if needs_data and data_source is None:
+        from curation_validation.core.loader import DataLoader
+
         if data_dump_path:
             print(f"Loading data from: {data_dump_path}")
             loader = DataLoader(data_dump_path)
@@ -119,6 +126,7 @@ def run_validators(
 
             print(f"Running {validator.name} ({fmt})...")
             results = validator.run(ctx)
+            output_path = None
             if results:
                 output_path = output_dir / output_filename
                 write_csv(results, output_path, validator.output_fields)
@@ -126,4 +134,12 @@ def run_validators(
             else:
                 print(f"  No issues found")
 
+            if reports is not None:
+                reports.append({
+                    "validator": validator.name,
+                    "format": fmt,
+                    "issues": len(results),
+                    "output": str(output_path) if output_path else None,
+                })
+
     return 0
@@ -0,0 +1,213 @@
+import contextlib
+import io
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+
+from curation_validation.core.exceptions import ConfigurationError, DataLoadError, RecordValidationError
+from curation_validation.core.loader import DataLoader, DataSource
+from curation_validation.runner import run_validators
+from curation_validation.validators import register_all_validators
+
+
+class ResidentDataSource:
+    def __init__(self, source: str | Path = "github"):
+        self._loader = DataLoader(source)
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._data_source: Optional[DataSource] = None
+        self.version: Optional[str] = None
+        self.loaded_at: Optional[float] = None
+
+    def snapshot(self) -> tuple[Optional[DataSource], Optional[str]]:
+        with self._lock:
+            return self._data_source, self.version
+
+    def refresh(self) -> bool:
+        with self._refresh_lock:
+            version = self._loader.current_version()
+            if version == self.version:
+                return False
+            logging.info(f"Loading data dump {version}")
+            data_source = self._loader.load()
+            # Swap only once the new dump is fully loaded so in-flight jobs keep
+            # validating against the previous one.
+            with self._lock:
+                self._data_source = data_source
+                self.version = version
+                self.loaded_at = time.time()
+            logging.info(f"Loaded {len(data_source)} records from {version}")
+            return True
+
+
+class ValidationService:
+    def __init__(
+        self,
+        resident: ResidentDataSource,
+        geonames_user: Optional[str] = None,
+    ):
+        self.resident = resident
+        self.geonames_user = geonames_user
+        # Validators are registered as shared instances, so jobs run one at a time.
+        self._job_lock = threading.Lock()
+
+    def status(self) -> dict:
+        data_source, version = self.resident.snapshot()
+        return {
+            "data_version": version,
+            "records": len(data_source) if data_source is not None else 0,
+            "loaded_at": self.resident.loaded_at,
+        }
+
+    def run_job(self, job: dict) -> dict:
+        if not job.get("csv") and not job.get("json_dir"):
+            raise RecordValidationError("At least one of csv or json_dir is required")
+
+        csv_file = Path(job["csv"]) if job.get("csv") else None
+        json_dir = Path(job["json_dir"]) if job.get("json_dir") else None
+        if csv_file and not csv_file.exists():
+            raise RecordValidationError(f"CSV file not found: {csv_file}")
+        if json_dir and not json_dir.exists():
+            raise RecordValidationError(f"JSON directory not found: {json_dir}")
+
+        tests = job.get("tests") or ["all"]
+        if isinstance(tests, str):
+            tests = [tests]
+
+        data_source, version = self.resident.snapshot()
+        reports: list[dict] = []
+        log = io.StringIO()
+        with self._job_lock:
+            started = time.perf_counter()
+            try:
+                with contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+                    exit_code = run_validators(
+                        csv_file=csv_file,
+                        json_dir=json_dir,
+                        output_dir=Path(job.get("output_dir", ".")),
+                        data_dump_path=None,
+                        geonames_user=job.get("geonames_user", self.geonames_user),
+                        tests=tests,
+                        data_source=data_source,
+                        reports=reports,
+                    )
+            except SystemExit as e:
+                exit_code = e.code if isinstance(e.code, int) else 1
+            elapsed = time.perf_counter() - started
+
+        return {
+            "exit_code": exit_code,
+            "data_version": version,
+            "elapsed_seconds": round(elapsed, 3),
+            "reports": reports,
+            "log": log.getvalue(),
+        }
+
+
+class ValidationRequestHandler(BaseHTTPRequestHandler):
+    service: ValidationService
+
+    def do_GET(self):
+        if self.path == "/status":
+            self._send_json(200, self.service.status())
+        else:
+            self._send_json(404, {"error": f"Unknown endpoint: {self.path}"})
+
+    def do_POST(self):
+        if self.path == "/validate":
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                job = json.loads(self.rfile.read(length) or b"{}")
+                self._send_json(200, self.service.run_job(job))
+            except DataLoadError as e:
+                self._send_json(502, {"error": str(e)})
+            except (json.JSONDecodeError, ConfigurationError, RecordValidationError) as e:
+                # Bad input, e.g. a csv_json validator requested without both inputs
+                self._send_json(400, {"error": str(e)})
+            except Exception as e:
+                logging.exception("Validation job failed")
+                self._send_json(500, {"error": str(e)})
+        elif self.path == "/reload":
+            try:
+                reloaded = self.service.resident.refresh()
+                self._send_json(200, {"reloaded": reloaded, **self.service.status()})
+            except DataLoadError as e:
+                self._send_json(502, {"error": str(e)})
+        else:
+            self._send_json(404, {"error": f"Unknown endpoint: {self.path}"})
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.info("%s - %s", self.address_string(), format % args)
+
+
+def _poll_for_new_dump(resident: ResidentDataSource, interval: float, stop: threading.Event) -> None:
+    while not stop.wait(interval):
+        try:
+            resident.refresh()
+        except DataLoadError as e:
+            logging.warning(f"Data dump refresh failed, keeping {resident.version}: {e}")
+
+
+def create_server(
+    service: ValidationService,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+) -> ThreadingHTTPServer:
+    handler = type(
+        "BoundValidationRequestHandler",
+        (ValidationRequestHandler,),
+        {"service": service},
+    )
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(
+    data_dump: str | Path = "github",
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    geonames_user: Optional[str] = None,
+    poll_interval: float = 3600,
+) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    register_all_validators()
+
+    resident = ResidentDataSource(data_dump)
+    try:
+        resident.refresh()
+    except DataLoadError as e:
+        logging.error(f"Could not load data dump: {e}")
+        return 1
+
+    service = ValidationService(resident, geonames_user=geonames_user)
+    server = create_server(service, host, port)
+
+    stop = threading.Event()
+    if poll_interval > 0:
+        threading.Thread(
+            target=_poll_for_new_dump,
+            args=(resident, poll_interval, stop),
+            daemon=True,
+        ).start()
+
+    logging.info(f"Serving validation jobs on http://{host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+    return 0
@@ -1,34 +1,63 @@
-from curation_validation.validators.validate_fields import ValidateFieldsValidator
-from curation_validation.validators.duplicate_external_ids import DuplicateExternalIdsValidator
-from curation_validation.validators.duplicate_urls import DuplicateUrlsValidator
-from curation_validation.validators.duplicate_domains import DuplicateDomainsValidator
-from curation_validation.validators.address_validation import AddressValidationValidator
-from curation_validation.validators.in_release_duplicates import InReleaseDuplicatesValidator
-from curation_validation.validators.production_duplicates import ProductionDuplicatesValidator
-from curation_validation.validators.duplicate_values import DuplicateValuesValidator
-from curation_validation.validators.unprintable_chars import UnprintableCharsValidator
-from curation_validation.validators.leading_trailing import LeadingTrailingValidator
-from curation_validation.validators.new_record_integrity import NewRecordIntegrityValidator
-from curation_validation.validators.update_record_integrity import UpdateRecordIntegrityValidator
-from curation_validation.validators.input_file_structure import InputFileStructureValidator
+import importlib
+
+# Validator modules pull in heavy optional dependencies (thefuzz, iso639,
+# chardet, furl, requests), so the registry only records where each validator
+# lives and imports it the first time it is actually used.
+VALIDATOR_SPECS = [
+    ("input_file_structure", "input_file_structure", "InputFileStructureValidator"),
+    ("validate_fields", "validate_fields", "ValidateFieldsValidator"),
+    ("duplicate-external-ids", "duplicate_external_ids", "DuplicateExternalIdsValidator"),
+    ("duplicate-urls", "duplicate_urls", "DuplicateUrlsValidator"),
+    ("duplicate-domains", "duplicate_domains", "DuplicateDomainsValidator"),
+    ("address-validation", "address_validation", "AddressValidationValidator"),
+    ("in-release-duplicates", "in_release_duplicates", "InReleaseDuplicatesValidator"),
+    ("production-duplicates", "production_duplicates", "ProductionDuplicatesValidator"),
+    ("duplicate_values", "duplicate_values", "DuplicateValuesValidator"),
+    ("unprintable-chars", "unprintable_chars", "UnprintableCharsValidator"),
+    ("leading_trailing", "leading_trailing", "LeadingTrailingValidator"),
+    ("new-record-integrity", "new_record_integrity", "NewRecordIntegrityValidator"),
+    ("update-record-integrity", "update_record_integrity", "UpdateRecordIntegrityValidator"),
+]
+
+_CLASS_MODULES = {class_name: module for _, module, class_name in VALIDATOR_SPECS}
+
+
+class LazyValidator:
+    def __init__(self, name: str, module: str, class_name: str):
+        self.name = name
+        self.module = f"{__name__}.{module}"
+        self.class_name = class_name
+        self._validator = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._validator is not None
+
+    def load(self):
+        if self._validator is None:
+            module = importlib.import_module(self.module)
+            self._validator = getattr(module, self.class_name)()
+        return self._validator
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self) -> str:
+        return f"LazyValidator({self.name!r}, loaded={self.loaded})"
 
 
 def register_all_validators():
     from curation_validation.runner import register_validator
 
-    register_validator(InputFileStructureValidator())
-    register_validator(ValidateFieldsValidator())
-    register_validator(DuplicateExternalIdsValidator())
-    register_validator(DuplicateUrlsValidator())
-    register_validator(DuplicateDomainsValidator())
-    register_validator(AddressValidationValidator())
-    register_validator(InReleaseDuplicatesValidator())
-    register_validator(ProductionDuplicatesValidator())
-    register_validator(DuplicateValuesValidator())
-    register_validator(UnprintableCharsValidator())
-    register_validator(LeadingTrailingValidator())
-    register_validator(NewRecordIntegrityValidator())
-    register_validator(UpdateRecordIntegrityValidator())
+    for name, module, class_name in VALIDATOR_SPECS:
+        register_validator(LazyValidator(name, module, class_name))
+
+
+def __getattr__(attr):
+    if attr in _CLASS_MODULES:
+        module = importlib.import_module(f"{__name__}.{_CLASS_MODULES[attr]}")
+        return getattr(module, attr)
+    raise AttributeError(f"module {__name__!r} has no attribute {attr!r}")
 
 
 __all__ = [
@@ -45,5 +74,7 @@ __all__ = [
     "LeadingTrailingValidator",
     "NewRecordIntegrityValidator",
     "UpdateRecordIntegrityValidator",
+    "LazyValidator",
+    "VALIDATOR_SPECS",
     "register_all_validators",
 ]
@@ -1,9 +1,12 @@
+from __future__ import annotations
+
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-from curation_validation.core.loader import DataSource
+if TYPE_CHECKING:
+    from curation_validation.core.loader import DataSource
 
 
 @dataclass
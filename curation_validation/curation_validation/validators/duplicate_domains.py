@@ -67,7 +67,7 @@ class DuplicateDomainsValidator(BaseValidator):
         return []
 
     def _run_json(self, ctx: ValidatorContext) -> list[dict]:
-        domain_dict = preprocess_data_source(ctx.data_source.get_all_records())
+        domain_dict = ctx.data_source.get_index("domains", preprocess_data_source)
         results = []
         records = read_json_dir(ctx.json_dir)
         for record in records:
@@ -93,7 +93,7 @@ class DuplicateDomainsValidator(BaseValidator):
         return results
 
     def _run_csv(self, ctx: ValidatorContext) -> list[dict]:
-        domain_dict = preprocess_data_source(ctx.data_source.get_all_records())
+        domain_dict = ctx.data_source.get_index("domains", preprocess_data_source)
         results = []
         rows = read_csv(ctx.csv_file)
         for row in rows:
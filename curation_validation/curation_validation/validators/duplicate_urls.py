@@ -61,7 +61,7 @@ class DuplicateUrlsValidator(BaseValidator):
         return []
 
     def _run_json(self, ctx: ValidatorContext) -> list[dict]:
-        url_dict = preprocess_data_source(ctx.data_source.get_all_records())
+        url_dict = ctx.data_source.get_index("website_urls", preprocess_data_source)
         results = []
         records = read_json_dir(ctx.json_dir)
         for record in records:
@@ -88,7 +88,7 @@ class DuplicateUrlsValidator(BaseValidator):
         return results
 
     def _run_csv(self, ctx: ValidatorContext) -> list[dict]:
-        url_dict = preprocess_data_source(ctx.data_source.get_all_records())
+        url_dict = ctx.data_source.get_index("website_urls", preprocess_data_source)
         results = []
         rows = read_csv(ctx.csv_file)
         for row in rows:
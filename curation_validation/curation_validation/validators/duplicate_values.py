@@ -2,7 +2,7 @@ import re
 from collections import defaultdict
 
 from curation_validation.validators.base import BaseValidator, ValidatorContext
-from curation_validation.core.json_utils import flatten_json
+from curation_validation.core.projection import RecordProjection
 from curation_validation.core.extract import extract_fields
 from curation_validation.core.io import read_csv, read_json_dir
 
@@ -83,7 +83,7 @@ class DuplicateValuesValidator(BaseValidator):
         for record in records:
             record_id = record.get("id", "")
             issue_url = record_id
-            flattened = flatten_json(record)
+            flattened = RecordProjection(record).flattened
 
             value_to_fields = defaultdict(list)
             for field, value in flattened.items():
@@ -1,5 +1,5 @@
 from curation_validation.validators.base import BaseValidator, ValidatorContext
-from curation_validation.core.json_utils import flatten_json
+from curation_validation.core.projection import RecordProjection
 from curation_validation.core.extract import extract_fields
 from curation_validation.core.io import read_csv, read_json_dir
 
@@ -49,7 +49,7 @@ class LeadingTrailingValidator(BaseValidator):
         for record in records:
             record_id = record.get("id", "")
             issue_url = record_id
-            flattened = flatten_json(record)
+            flattened = RecordProjection(record).flattened
             for field, value in flattened.items():
                 _check_value(issue_url, record_id, field, value, results)
         return results
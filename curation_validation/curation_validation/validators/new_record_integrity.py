@@ -4,8 +4,8 @@ from urllib.parse import unquote
 
 from curation_validation.validators.base import BaseValidator, ValidatorContext
 from curation_validation.core.io import read_csv
-from curation_validation.core.json_utils import simplify_json
 from curation_validation.core.normalize import normalize_wikipedia_url
+from curation_validation.core.projection import RecordProjection
 
 ROR_DATA_FIELDS = [
     'status',
@@ -102,7 +102,7 @@ class NewRecordIntegrityValidator(BaseValidator):
             with open(json_file_path, 'r', encoding='utf8') as f:
                 json_data = json.load(f)
 
-            simplified_json = simplify_json(json_data)
+            simplified_json = RecordProjection(json_data).simplified
             findings.extend(check_record_integrity(row, simplified_json))
 
         return findings
@@ -5,7 +5,7 @@ from pathlib import Path
 
 from curation_validation.validators.base import BaseValidator, ValidatorContext
 from curation_validation.core.io import read_csv
-from curation_validation.core.json_utils import simplify_and_invert_json
+from curation_validation.core.projection import RecordProjection
 
 VALID_FIELDS = [
     "status",
@@ -89,7 +89,9 @@ def check_if_updates_applied(csv_file, json_directory):
         with open(json_file_path, "r", encoding="utf-8") as f_in:
             json_file = json.load(f_in)
 
-        simplified_json, inverted_json = simplify_and_invert_json(json_file)
+        projection = RecordProjection(json_file, normalize_wikipedia=False)
+        simplified_json = projection.simplified
+        inverted_json = projection.inverted
 
         additions = ["add", "replace"]
         deletions = ["delete"]
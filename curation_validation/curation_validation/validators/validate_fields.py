@@ -1,7 +1,6 @@
 from curation_validation.validators.base import BaseValidator, ValidatorContext
 from curation_validation.core.io import read_csv, read_json_dir, detect_file_type
 from curation_validation.core.extract import extract_fields
-from iso639 import Language, LanguageNotFoundError
 
 from curation_validation.core.patterns import (
     ACRONYMS_PATTERN, NAMES_PATTERN, URL_PATTERN, WIKIPEDIA_URL_PATTERN,
@@ -13,6 +12,9 @@ from curation_validation.core.patterns import (
 def validate_language_code(lang_str: str) -> str | None:
     if not lang_str:
         return None
+
+    from iso639 import Language, LanguageNotFoundError
+
     try:
         Language.from_part1(lang_str.lower())
         return None
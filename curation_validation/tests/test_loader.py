@@ -72,3 +72,30 @@ class TestDataLoader:
         loader = DataLoader(file_path)
         ds = loader.load()
         assert len(ds) == 1
+
+    def test_current_version_tracks_file_changes(self, tmp_path):
+        file_path = tmp_path / "dump.json"
+        file_path.write_text(json.dumps([{"id": "https://ror.org/012345"}]))
+        loader = DataLoader(file_path)
+        first = loader.current_version()
+        assert loader.current_version() == first
+        file_path.write_text(json.dumps([{"id": "https://ror.org/012345"}, {"id": "https://ror.org/067890"}]))
+        assert loader.current_version() != first
+
+    def test_current_version_missing_file(self, tmp_path):
+        with pytest.raises(DataLoadError):
+            DataLoader(tmp_path / "missing.json").current_version()
+
+
+class TestDataSourceIndexes:
+    def test_index_built_once(self):
+        ds = DataSource([{"id": "https://ror.org/012345"}])
+        calls = []
+
+        def build(records):
+            calls.append(1)
+            return {r["id"] for r in records}
+
+        assert ds.get_index("ids", build) == {"https://ror.org/012345"}
+        assert ds.get_index("ids", build) == {"https://ror.org/012345"}
+        assert len(calls) == 1
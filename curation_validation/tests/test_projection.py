@@ -0,0 +1,125 @@
+from curation_validation.core.projection import RecordProjection
+
+
+SAMPLE_RECORD = {
+    "id": "https://ror.org/012345",
+    "status": "active",
+    "types": ["education"],
+    "established": 1990,
+    "names": [
+        {"value": "Test University", "types": ["label", "ror_display"], "lang": "en"},
+        {"value": "TU", "types": ["acronym"], "lang": "en"},
+        {"value": "Test Uni", "types": ["alias"], "lang": None},
+    ],
+    "links": [
+        {"type": "website", "value": "https://test.edu"},
+        {"type": "wikipedia", "value": "https://en.wikipedia.org/wiki/Polícia"},
+    ],
+    "locations": [{"geonames_id": 5367440, "geonames_details": {"country_code": "US", "name": "City"}}],
+    "external_ids": [
+        {"type": "wikidata", "all": ["Q12345"], "preferred": "Q12345"},
+        {"type": "isni", "all": ["0000 0001 2345 6789", "0000 0004 0000 0000"], "preferred": None},
+        {"type": "isni", "all": ["0000 0005 0000 0000"], "preferred": None},
+    ],
+    "relationships": [],
+    "domains": ["test.edu"],
+    "admin": {"created": {"date": "2026-01-01"}},
+}
+
+
+class TestSimplified:
+    def test_names_bucketed_by_type_in_order(self):
+        simplified = RecordProjection(SAMPLE_RECORD).simplified
+        assert simplified["names.types.label"] == ["Test University"]
+        assert simplified["names.types.ror_display"] == ["Test University"]
+        assert simplified["names.types.alias"] == ["Test Uni"]
+        assert simplified["names.types.acronym"] == ["TU"]
+
+    def test_external_id_all_values_concatenated(self):
+        simplified = RecordProjection(SAMPLE_RECORD).simplified
+        assert simplified["external_ids.type.isni.all"] == [
+            "0000 0001 2345 6789",
+            "0000 0004 0000 0000",
+            "0000 0005 0000 0000",
+        ]
+        assert simplified["external_ids.type.fundref.all"] == []
+
+    def test_non_list_all_invalidates_type(self):
+        record = {
+            **SAMPLE_RECORD,
+            "external_ids": [
+                {"type": "isni", "all": ["0000 0001 2345 6789"], "preferred": None},
+                {"type": "isni", "all": "0000 0004 0000 0000", "preferred": None},
+                {"type": "wikidata", "all": ["Q1"], "preferred": "Q1"},
+            ],
+        }
+        simplified = RecordProjection(record).simplified
+        assert simplified["external_ids.type.isni.all"] == []
+        assert simplified["external_ids.type.wikidata.all"] == ["Q1"]
+
+    def test_wikipedia_normalized_by_default(self):
+        simplified = RecordProjection(SAMPLE_RECORD).simplified
+        assert simplified["links.type.wikipedia"] == ["https://en.wikipedia.org/wiki/Pol%C3%ADcia"]
+
+    def test_wikipedia_normalization_optional(self):
+        simplified = RecordProjection(SAMPLE_RECORD, normalize_wikipedia=False).simplified
+        assert simplified["links.type.wikipedia"] == ["https://en.wikipedia.org/wiki/Polícia"]
+
+    def test_all_excludes_falsy(self):
+        simplified = RecordProjection(SAMPLE_RECORD).simplified
+        assert None not in simplified["all"]
+        assert "Q12345" in simplified["all"]
+        assert 1990 in simplified["all"]
+
+    def test_missing_fields_yield_empty_lists(self):
+        simplified = RecordProjection({}).simplified
+        assert simplified["types"] == []
+        assert simplified["names.types.label"] == []
+        assert simplified["all"] == []
+
+
+class TestInverted:
+    def test_maps_value_to_all_fields(self):
+        inverted = RecordProjection(SAMPLE_RECORD).inverted
+        assert inverted["Test University"] == ["names.types.ror_display", "names.types.label"]
+        assert inverted["Q12345"] == [
+            "external_ids.type.wikidata.preferred",
+            "external_ids.type.wikidata.all",
+        ]
+
+    def test_excludes_falsy_values(self):
+        inverted = RecordProjection(SAMPLE_RECORD).inverted
+        assert None not in inverted
+
+
+class TestFlattened:
+    def test_paths_joined_with_separator(self):
+        flattened = RecordProjection(SAMPLE_RECORD).flattened
+        assert flattened["names_0_value"] == "Test University"
+        assert flattened["names_0_types_1"] == "ror_display"
+        assert flattened["admin_created_date"] == "2026-01-01"
+
+    def test_custom_separator(self):
+        flattened = RecordProjection({"a": {"b": [1]}}, sep=".").flattened
+        assert flattened == {"a.b.0": 1}
+
+    def test_empty_containers_omitted(self):
+        flattened = RecordProjection({"relationships": [], "admin": {}}).flattened
+        assert flattened == {}
+
+    def test_preserves_traversal_order(self):
+        flattened = RecordProjection({"b": 1, "a": [2, {"c": 3}]}).flattened
+        assert list(flattened) == ["b", "a_0", "a_1_c"]
+
+
+class TestCaching:
+    def test_views_computed_once(self):
+        projection = RecordProjection(SAMPLE_RECORD)
+        assert projection.simplified is projection.simplified
+        assert projection.flattened is projection.flattened
+
+    def test_simplified_and_inverted_share_pass(self):
+        projection = RecordProjection(SAMPLE_RECORD)
+        projection.simplified
+        assert "_simplified_and_inverted" in projection.__dict__
+        assert "flattened" not in projection.__dict__
@@ -0,0 +1,171 @@
+import json
+import threading
+import urllib.request
+from urllib.error import HTTPError
+
+import pytest
+
+from curation_validation.core.exceptions import RecordValidationError
+from curation_validation.runner import VALIDATORS, register_validator
+from curation_validation.server import ResidentDataSource, ValidationService, create_server
+from curation_validation.validators.base import BaseValidator, ValidatorContext
+
+
+class FakeDumpValidator(BaseValidator):
+    name = "fake-dump"
+    supported_formats = {"csv"}
+    output_filename = "fake_dump.csv"
+    output_fields = ["record_count"]
+    requires_data_source = True
+
+    def __init__(self):
+        self.seen_sources = []
+
+    def run(self, ctx: ValidatorContext) -> list[dict]:
+        self.seen_sources.append(ctx.data_source)
+        return [{"record_count": len(ctx.data_source)}]
+
+
+class FakeCsvJsonValidator(BaseValidator):
+    name = "fake-csv-json"
+    supported_formats = {"csv_json"}
+    output_filename = "fake_csv_json.csv"
+    output_fields = ["issue"]
+
+    def run(self, ctx: ValidatorContext) -> list[dict]:
+        return []
+
+
+@pytest.fixture
+def dump_file(tmp_path):
+    path = tmp_path / "dump.json"
+    path.write_text(json.dumps([{"id": "https://ror.org/012345"}]))
+    return path
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / "input.csv"
+    path.write_text("id,html_url\n,https://github.com/ror-community/ror-updates/issues/1\n")
+    return path
+
+
+@pytest.fixture
+def fake_validator():
+    VALIDATORS.clear()
+    validator = FakeDumpValidator()
+    register_validator(validator)
+    yield validator
+    VALIDATORS.clear()
+
+
+class TestResidentDataSource:
+    def test_initial_refresh_loads(self, dump_file):
+        resident = ResidentDataSource(dump_file)
+        assert resident.refresh() is True
+        data_source, version = resident.snapshot()
+        assert len(data_source) == 1
+        assert version is not None
+
+    def test_refresh_skips_unchanged_dump(self, dump_file):
+        resident = ResidentDataSource(dump_file)
+        resident.refresh()
+        first, _ = resident.snapshot()
+        assert resident.refresh() is False
+        assert resident.snapshot()[0] is first
+
+    def test_refresh_swaps_newer_dump(self, dump_file):
+        resident = ResidentDataSource(dump_file)
+        resident.refresh()
+        first, first_version = resident.snapshot()
+        dump_file.write_text(json.dumps([{"id": "https://ror.org/012345"}, {"id": "https://ror.org/067890"}]))
+        assert resident.refresh() is True
+        second, second_version = resident.snapshot()
+        assert second is not first
+        assert len(second) == 2
+        assert second_version != first_version
+        assert len(first) == 1
+
+
+class TestValidationService:
+    def test_jobs_reuse_resident_data_source(self, dump_file, csv_file, tmp_path, fake_validator):
+        resident = ResidentDataSource(dump_file)
+        resident.refresh()
+        service = ValidationService(resident)
+        for _ in range(2):
+            result = service.run_job({"csv": str(csv_file), "output_dir": str(tmp_path / "out")})
+            assert result["exit_code"] == 0
+        assert fake_validator.seen_sources[0] is fake_validator.seen_sources[1]
+        assert result["reports"] == [{
+            "validator": "fake-dump",
+            "format": "csv",
+            "issues": 1,
+            "output": str(tmp_path / "out" / "csv_fake_dump.csv"),
+        }]
+
+    def test_requires_input(self, dump_file):
+        resident = ResidentDataSource(dump_file)
+        resident.refresh()
+        with pytest.raises(RecordValidationError):
+            ValidationService(resident).run_job({})
+
+    def test_missing_csv(self, dump_file, tmp_path):
+        resident = ResidentDataSource(dump_file)
+        resident.refresh()
+        with pytest.raises(RecordValidationError):
+            ValidationService(resident).run_job({"csv": str(tmp_path / "missing.csv")})
+
+
+class TestHttpEndpoint:
+    @pytest.fixture
+    def server(self, dump_file):
+        resident = ResidentDataSource(dump_file)
+        resident.refresh()
+        server = create_server(ValidationService(resident), port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield f"http://127.0.0.1:{server.server_port}"
+        server.shutdown()
+        server.server_close()
+
+    def _post(self, url, payload):
+        request = urllib.request.Request(
+            url, data=json.dumps(payload).encode("utf-8"), method="POST",
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return json.loads(response.read())
+
+    def test_status(self, server):
+        with urllib.request.urlopen(f"{server}/status", timeout=10) as response:
+            status = json.loads(response.read())
+        assert status["records"] == 1
+
+    def test_validate(self, server, csv_file, tmp_path, fake_validator):
+        result = self._post(f"{server}/validate", {
+            "csv": str(csv_file), "output_dir": str(tmp_path / "out"), "tests": ["fake-dump"],
+        })
+        assert result["reports"][0]["issues"] == 1
+        assert (tmp_path / "out" / "csv_fake_dump.csv").exists()
+
+    def test_validate_bad_request(self, server):
+        with pytest.raises(HTTPError) as exc_info:
+            self._post(f"{server}/validate", {})
+        assert exc_info.value.code == 400
+
+    def test_validate_missing_input_for_validator(self, server, csv_file, tmp_path):
+        VALIDATORS.clear()
+        register_validator(FakeCsvJsonValidator())
+        try:
+            with pytest.raises(HTTPError) as exc_info:
+                self._post(f"{server}/validate", {
+                    "csv": str(csv_file), "output_dir": str(tmp_path / "out"), "tests": ["fake-csv-json"],
+                })
+        finally:
+            VALIDATORS.clear()
+        assert exc_info.value.code == 400
+        assert "requires both" in json.loads(exc_info.value.read())["error"]
+
+    def test_reload_without_change(self, server):
+        result = self._post(f"{server}/reload", {})
+        assert result["reloaded"] is False
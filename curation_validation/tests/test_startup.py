@@ -0,0 +1,62 @@
+import json
+import re
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ["thefuzz", "iso639", "chardet", "furl", "requests"]
+
+# Generous enough for slow CI runners; eager registration of every validator
+# costs several times this.
+IMPORT_BUDGET_US = 250_000
+
+STARTUP_SCRIPT = """
+import json, sys
+from curation_validation.cli import parse_args
+from curation_validation.validators import register_all_validators
+from curation_validation.runner import VALIDATORS
+register_all_validators()
+for name in {names!r}:
+    VALIDATORS[name].load()
+print(json.dumps(sorted(m for m in {heavy!r} if m in sys.modules)))
+"""
+
+
+def _run_startup(names):
+    script = STARTUP_SCRIPT.format(names=names, heavy=HEAVY_MODULES)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        capture_output=True, text=True, check=True,
+    )
+    loaded_heavy = json.loads(result.stdout.strip().splitlines()[-1])
+    cumulative = 0
+    after_site = False
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\S+)$", line)
+        if not match:
+            continue
+        if after_site:
+            cumulative += int(match.group(1))
+        elif match.group(2) == "site":
+            after_site = True
+    return loaded_heavy, cumulative
+
+
+class TestStartup:
+    def test_registration_imports_no_heavy_modules(self):
+        loaded_heavy, _ = _run_startup([])
+        assert loaded_heavy == []
+
+    @pytest.mark.parametrize("name", ["leading_trailing", "unprintable-chars", "duplicate_values", "validate_fields"])
+    def test_cheap_validator_imports_no_heavy_modules(self, name):
+        loaded_heavy, _ = _run_startup([name])
+        assert loaded_heavy == []
+
+    def test_selected_validator_imports_its_dependencies(self):
+        loaded_heavy, _ = _run_startup(["in-release-duplicates"])
+        assert "thefuzz" in loaded_heavy
+
+    def test_cheap_validator_import_budget(self):
+        _, cumulative = _run_startup(["leading_trailing"])
+        assert cumulative < IMPORT_BUDGET_US
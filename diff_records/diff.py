@@ -4,7 +4,9 @@ import sys
 import json
 import glob
 import requests
-import jsondiff
+# Run from the directory with the records, so locate the shared differ from here
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../utilities/record_diff'))
+from record_diff import diff_records, format_change
 
 def get_diffs():
 	curr_dir =  os.getcwd()
@@ -19,18 +21,10 @@ def get_diffs():
 		ror_id = json_file['id']
 		api_url  = 'http://localhost:9292/organizations/' + ror_id
 		api_json = requests.get(api_url).json()
-		file_api_diffs = jsondiff.diff(api_json, json_file, syntax='symmetric')
-		if type(file_api_diffs) == list:
-			for diff in file_api_diffs:
-				for key, value in diff.items():
-					with open(outfile, 'a') as f_out:
-						writer = csv.writer(f_out)
-						writer.writerow([ror_id, key, value])
-		else:
-			for key, value in file_api_diffs.items():
-				with open(outfile, 'a') as f_out:
-					writer = csv.writer(f_out)
-					writer.writerow([ror_id, key, value])
+		with open(outfile, 'a') as f_out:
+			writer = csv.writer(f_out)
+			for change in diff_records(api_json, json_file):
+				writer.writerow([ror_id, change['field_path'], format_change(change)])
 
 if __name__ == '__main__':
 	get_diffs()
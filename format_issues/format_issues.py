@@ -1,9 +1,9 @@
 import os
 import re
 import json
-import signal
 import difflib
-from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import httpx
 from google import genai
 from github import Github, GithubException
 import openai
@@ -21,6 +21,10 @@ END_ISSUE_STR = os.environ.get('END_ISSUE')
 DRY_RUN_STR = os.environ.get('DRY_RUN', 'false').lower()
 DRY_RUN = DRY_RUN_STR in ['true', '1', 'yes']
 MODEL = os.environ.get('MODEL', 'gemini').lower()
+# Issues formatted at once
+WORKERS = int(os.environ.get('FORMAT_WORKERS', '4'))
+# Seconds allowed for each model call
+API_TIMEOUT = 120
 
 BOT_COMMENT_SIGNATURE = "\n\n---\n*Issue body was automatically formatted by a ROR curation bot.*"
 ROR_ID_PATTERN = re.compile(r'https://ror\.org/0[a-z0-9]{6}[0-9]{2}')
@@ -45,22 +49,6 @@ def load_prompt_template(file_path):
 GEMINI_PROMPT_TEMPLATE = load_prompt_template(PROMPT_FILE_PATH)
 
 
-class TimeoutError(Exception):
-    pass
-
-
-@contextmanager
-def time_limit(seconds):
-    def signal_handler(signum, frame):
-        raise TimeoutError(f"Process timed out after {seconds} seconds")
-    signal.signal(signal.SIGALRM, signal_handler)
-    signal.alarm(seconds)
-    try:
-        yield
-    finally:
-        signal.alarm(0)
-
-
 def get_issues_to_process(repo, issue_number=None, start_issue=None, end_issue=None):
     issues_to_fetch = []
     if issue_number:
@@ -242,7 +230,8 @@ def call_gemini_to_format_issue(issue_title, issue_body, is_fallback=False):
         return None
 
     try:
-        client = genai.Client(api_key=GEMINI_API_KEY)
+        client = genai.Client(api_key=GEMINI_API_KEY,
+                              http_options={'timeout': API_TIMEOUT * 1000})
     except Exception as e:
         print(f"Error creating Gemini client: {e}")
         return None
@@ -252,21 +241,20 @@ def call_gemini_to_format_issue(issue_title, issue_body, is_fallback=False):
 
     print(f"Sending request to Gemini API for issue: '{issue_title}'...")
     try:
-        with time_limit(120):
-            response = client.models.generate_content(
-                model='gemini-2.5-flash',
-                contents=prompt
-            )
-            formatted_body = response.text
-            if formatted_body.startswith("```markdown\n"):
-                formatted_body = formatted_body[len("```markdown\n"):]
-            if formatted_body.startswith("```\n"):
-                formatted_body = formatted_body[len("```\n"):]
-            if formatted_body.endswith("\n```"):
-                formatted_body = formatted_body[:-len("\n```")]
-            print("Successfully received response from Gemini API.")
-            return formatted_body.strip()
-    except TimeoutError as e:
+        response = client.models.generate_content(
+            model='gemini-2.5-flash',
+            contents=prompt
+        )
+        formatted_body = response.text
+        if formatted_body.startswith("```markdown\n"):
+            formatted_body = formatted_body[len("```markdown\n"):]
+        if formatted_body.startswith("```\n"):
+            formatted_body = formatted_body[len("```\n"):]
+        if formatted_body.endswith("\n```"):
+            formatted_body = formatted_body[:-len("\n```")]
+        print("Successfully received response from Gemini API.")
+        return formatted_body.strip()
+    except httpx.TimeoutException as e:
         print(f"Gemini API call timed out: {e}")
         if not is_fallback:
             print("Attempting OpenAI fallback...")
@@ -300,7 +288,7 @@ def call_openai_to_format_issue(issue_title, issue_body, is_fallback=False):
         return None
 
     try:
-        client = openai.OpenAI(api_key=OPENAI_API_KEY)
+        client = openai.OpenAI(api_key=OPENAI_API_KEY, timeout=API_TIMEOUT)
     except Exception as e:
         print(f"Error creating OpenAI client: {e}")
         return None
@@ -310,31 +298,30 @@ def call_openai_to_format_issue(issue_title, issue_body, is_fallback=False):
 
     print(f"Sending request to OpenAI API (fallback) for issue: '{issue_title}'...")
     try:
-        with time_limit(120):
-            response = client.responses.create(
-                model=OPENAI_MODEL,
-                input=prompt
-            )
-            formatted_body = getattr(response, "output_text", None)
-            if not formatted_body:
-                output_chunks = []
-                for output in getattr(response, "output", []) or []:
-                    for content in getattr(output, "content", []) or []:
-                        if getattr(content, "type", None) == "output_text" and getattr(content, "text", None):
-                            output_chunks.append(content.text)
-                formatted_body = "".join(output_chunks).strip() if output_chunks else None
-            if formatted_body:
-                if formatted_body.startswith("```markdown\n"):
-                    formatted_body = formatted_body[len("```markdown\n"):]
-                if formatted_body.startswith("```\n"):
-                    formatted_body = formatted_body[len("```\n"):]
-                if formatted_body.endswith("\n```"):
-                    formatted_body = formatted_body[:-len("\n```")]
-                print("Successfully received response from OpenAI API (fallback).")
-                return formatted_body.strip()
-            print("OpenAI API returned no text content.")
-            return None
-    except TimeoutError as e:
+        response = client.responses.create(
+            model=OPENAI_MODEL,
+            input=prompt
+        )
+        formatted_body = getattr(response, "output_text", None)
+        if not formatted_body:
+            output_chunks = []
+            for output in getattr(response, "output", []) or []:
+                for content in getattr(output, "content", []) or []:
+                    if getattr(content, "type", None) == "output_text" and getattr(content, "text", None):
+                        output_chunks.append(content.text)
+            formatted_body = "".join(output_chunks).strip() if output_chunks else None
+        if formatted_body:
+            if formatted_body.startswith("```markdown\n"):
+                formatted_body = formatted_body[len("```markdown\n"):]
+            if formatted_body.startswith("```\n"):
+                formatted_body = formatted_body[len("```\n"):]
+            if formatted_body.endswith("\n```"):
+                formatted_body = formatted_body[:-len("\n```")]
+            print("Successfully received response from OpenAI API (fallback).")
+            return formatted_body.strip()
+        print("OpenAI API returned no text content.")
+        return None
+    except openai.APITimeoutError as e:
         print(f"OpenAI API call timed out: {e}")
         if not is_fallback:
             print("Attempting Gemini fallback...")
@@ -497,8 +484,13 @@ def main():
         return
 
     print(f"Found {len(issues)} issue(s) to process.")
-    for issue in issues:
-        process_single_issue(issue)
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        futures = {executor.submit(process_single_issue, issue): issue for issue in issues}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error processing issue #{futures[future].number}: {e}")
 
     print("\nROR Issue Formatting Action finished.")
 
@@ -1,109 +1,136 @@
 import os
 import sys
 import json
+import hashlib
 import logging
 import argparse
+from contextlib import nullcontext
 from datetime import datetime
+from multiprocessing import Pool
 from zipfile import ZipFile, ZIP_DEFLATED
 sys.path.append('../utilities/data_dump_to_csv')
+sys.path.append('../utilities/json_array_writer')
+sys.path.append('../utilities/checksum_manifest')
+sys.path.append('../utilities/dump_delta')
+sys.path.append('../utilities/record_hashes')
 
 import convert_to_csv_v2
+from json_array_writer import JsonArrayWriter, BackgroundWriter, open_zip_entry
+from checksum_manifest import open_hashed, manifest_path, write_manifest
+from dump_delta import DELTA_SUFFIX, dump_info, build_delta, write_delta
+from record_hashes import RecordHashWriter, hashes_path, iter_records
 
 NOW = datetime.now()
 ERROR_LOG = "errors.log"
 INPUT_PATH = "./"
 OUTPUT_PATH = "./"
-TEMP_NEW_UPDATED_RECORDS_CONCAT = "temp-updated-records"
-TEMP_DUMP_UPDATED_RECORDS_REMOVED = "temp-dump-updated-records-removed"
 NEW_DUMP_SUFFIX = "-" + NOW.strftime("%Y-%m-%d") + "-ror-data"
 V2_SUFFIX = "_schema_v2"  # Used only for reading legacy zip files
+BUFFER_SIZE = 1024 * 1024
 
 logging.basicConfig(filename=ERROR_LOG,level=logging.ERROR, filemode='w')
 
 
-def concat_files(filepath):
-    updated_count = 0
-    updated_record_ids = []
+def load_release_records(filepath):
     updated_records = []
     files = [os.path.join(filepath, file) for file in os.listdir(filepath) if file.endswith('.json')]
-    try:
-        for f in files:
+    for f in files:
+        try:
             with open(f) as infile:
-                file_data = json.load(infile)
-                updated_records.append(file_data)
-                ror_id = file_data['id']
-                updated_record_ids.append(ror_id)
-            updated_count += 1
-        filename = TEMP_NEW_UPDATED_RECORDS_CONCAT + '.json'
-        with open(os.path.join(INPUT_PATH, filename), "w") as f:
-            f.write(json.dumps(updated_records, indent=4, separators=(',', ': ')))
-    except Exception as e:
-        logging.error(f"Error concatenating files: {e}")
-
-    print(str(updated_count) + " new/updated records found")
+                updated_records.append(json.load(infile))
+        except Exception as e:
+            logging.error(f"Error reading release file {f}: {e}")
+    updated_record_ids = [record['id'] for record in updated_records]
+    print(str(len(updated_records)) + " new/updated records found")
     print(updated_record_ids)
-    return updated_record_ids
+    return updated_records
 
 
-def remove_existing_records(ror_ids, existing_dump_zip_path):
-    print("Removing existing records from dump")
-    existing_dump_unzipped = ''
-    indexes = []
-    records_to_remove = []
+def load_existing_dump(existing_dump_zip_path):
+    # Returns the name of the dump JSON in the zip. Its records are streamed
+    # from the zip by merge_records when the new dump is written, so the
+    # existing dump is never held in memory.
     with ZipFile(existing_dump_zip_path, "r") as zf:
         json_files = [f for f in zf.namelist() if '.json' in f]
         if len(json_files) == 1:
-            existing_dump_unzipped = zf.extract(json_files[0], INPUT_PATH)
+            dump_file = json_files[0]
         elif len(json_files) == 2:
-            # Legacy zip with both v1 and v2 - extract v2 (has _schema_v2 suffix)
-            v2_dump = [f for f in json_files if V2_SUFFIX in f]
-            existing_dump_unzipped = zf.extract(v2_dump[0], INPUT_PATH)
+            # Legacy zip with both v1 and v2 - read v2 (has _schema_v2 suffix)
+            dump_file = [f for f in json_files if V2_SUFFIX in f][0]
         else:
-            print("Dump zip contains unexpected number of files.")
-            return
-        print(f"Using existing dump {existing_dump_unzipped}")
-    try:
-        f = open(existing_dump_unzipped, 'r')
-        json_data = json.load(f)
-        for i in range(len(json_data)):
-            for ror_id in ror_ids:
-                if json_data[i]["id"] == ror_id:
-                    indexes.append(i)
-                    records_to_remove.append(ror_id)
-                    break
-
-        print(str(len(json_data)) + " records in existing dump " + existing_dump_unzipped)
-        print(str(len(records_to_remove)) + " records to remove")
-        print(records_to_remove)
-        for index in sorted(indexes, reverse=True):
-            del json_data[index]
-        filename = TEMP_DUMP_UPDATED_RECORDS_REMOVED + '.json'
-        with open(os.path.join(INPUT_PATH, filename), "w") as f:
-            f.write(json.dumps(json_data, indent=4, separators=(',', ': ')))
-    except Exception as e:
-        logging.error(f"Error removing existing records: {e}")
-
-def create_zip(release_name):
-    filename = release_name + NEW_DUMP_SUFFIX
-    with ZipFile(OUTPUT_PATH + filename + ".zip", 'w', ZIP_DEFLATED) as myzip:
-        myzip.write(INPUT_PATH + filename + ".json", filename + ".json")
-        myzip.write(INPUT_PATH + filename + ".csv", filename + ".csv")
-
-def create_dump_files(release_name):
-    temp_dump_updated_records_removed = open(os.path.join(INPUT_PATH, TEMP_DUMP_UPDATED_RECORDS_REMOVED + '.json'), 'r')
-    temp_dump_updated_records_removed_json = json.load(temp_dump_updated_records_removed)
-    updated_records = open(os.path.join(INPUT_PATH, TEMP_NEW_UPDATED_RECORDS_CONCAT + '.json'), 'r')
-    updated_records_json = json.load(updated_records)
-    print(str(len(updated_records_json)) + " records added to dump")
-    for i in updated_records_json:
-        temp_dump_updated_records_removed_json.append(i)
-    print(str(len(temp_dump_updated_records_removed_json)) + " records in new dump")
+            logging.error(f"Dump zip {existing_dump_zip_path} contains unexpected number of files: {json_files}")
+            return None
+    print(f"Using existing dump {dump_file}")
+    return dump_file
+
+
+def merge_records(existing_dump_zip_path, dump_file, updated_records, stats=None):
+    # Yields the existing records that are not being replaced, in dump order,
+    # then the updated records. Each call streams the existing dump again, so
+    # the JSON and CSV outputs can each take their own pass. If stats is given,
+    # the existing record count, the replaced IDs and the SHA-256 of the
+    # existing dump JSON are recorded in it.
+    updated_ids = {record['id'] for record in updated_records}
+    existing_count = 0
+    records_removed = []
+    digest = hashlib.sha256() if stats is not None else None
+    for record, _, _ in iter_records(existing_dump_zip_path, dump_file, digest=digest):
+        existing_count += 1
+        if record["id"] in updated_ids:
+            records_removed.append(record["id"])
+        else:
+            yield record
+    if stats is not None:
+        stats['existing'] = existing_count
+        stats['removed'] = records_removed
+        stats['sha256'] = digest.hexdigest()
+    yield from updated_records
 
+
+def print_merge_stats(stats, updated_records, record_count):
+    print("Removing existing records from dump")
+    print(str(stats['existing']) + " records in existing dump")
+    print(str(len(stats['removed'])) + " records to remove")
+    print(stats['removed'])
+    print(str(len(updated_records)) + " records added to dump")
+    print(str(record_count) + " records in new dump")
+
+
+def create_dump_files(release_name, records, csv_records, csv_workers=1, compress_level=None, buffer_size=BUFFER_SIZE):
     filename = release_name + NEW_DUMP_SUFFIX
-    open(INPUT_PATH + filename + ".json", "w").write(
-        json.dumps(temp_dump_updated_records_removed_json, indent=4, separators=(',', ': '))
-    )
-    convert_to_csv_v2.get_all_data(INPUT_PATH + filename + ".json")
+    zip_path = OUTPUT_PATH + filename + ".zip"
+    with Pool(csv_workers) if csv_workers > 1 else nullcontext() as pool:
+        zip_out, zip_hash = open_hashed(zip_path, buffer_size)
+        with zip_out, ZipFile(zip_out, 'w', ZIP_DEFLATED, compresslevel=compress_level) as myzip:
+            json_out, json_hash = open_hashed(INPUT_PATH + filename + ".json", buffer_size, text=True)
+            with json_out, open_zip_entry(myzip, filename + ".json", buffer_size) as zip_entry, \
+                    BackgroundWriter(zip_entry, buffer_size) as zip_writer, \
+                    RecordHashWriter(hashes_path(zip_path)) as hashes, \
+                    JsonArrayWriter(json_out, zip_writer, on_write=hashes.add) as writer:
+                record_count = writer.write_all(records)
+            # The CSV pipeline starts only once the JSON entry is closed, and
+            # keeps a bounded number of chunks in flight across the workers
+            csv_chunks = convert_to_csv_v2.iter_csv(csv_records, pool, csv_workers)
+            csv_out, csv_hash = open_hashed(INPUT_PATH + filename + ".csv", buffer_size, text=True)
+            with csv_out, open_zip_entry(myzip, filename + ".csv", buffer_size) as zip_entry, \
+                    BackgroundWriter(zip_entry, buffer_size) as zip_writer:
+                for chunk in csv_chunks:
+                    csv_out.write(chunk)
+                    zip_writer.write(chunk)
+    hashes.seal(zip_path)
+    manifest = write_manifest(manifest_path(zip_path), zip_hash, [json_hash, csv_hash])
+    print("Archive checksum sha256:" + zip_hash.checksums()['sha256'])
+    return manifest, record_count
+
+
+def create_delta_file(release_name, base, record_count, updated_records, replaced_ids, manifest):
+    filename = release_name + NEW_DUMP_SUFFIX
+    dump_checksums = manifest['files'][0]
+    target = dump_info(dump_checksums['name'], record_count, sha256=dump_checksums['sha256'])
+    delta = build_delta(base, target, updated_records, replaced_ids)
+    write_delta(OUTPUT_PATH + filename + DELTA_SUFFIX, delta)
+    print("Created delta from " + base['name'] + " with " + str(len(delta['changes'])) + " changes")
+
 
 def main():
     parser = argparse.ArgumentParser()
@@ -111,6 +138,9 @@ def main():
     parser.add_argument('-e', '--existingdumpname', type=str, required=True)
     parser.add_argument('-i', '--inputpath', type=str, default='.')
     parser.add_argument('-o', '--outputpath', type=str, default='.')
+    parser.add_argument('-w', '--csvworkers', type=int, default=1)
+    parser.add_argument('-l', '--compresslevel', type=int, choices=range(10), default=None)
+    parser.add_argument('-b', '--buffersize', type=int, default=BUFFER_SIZE)
     args = parser.parse_args()
     global INPUT_PATH
     global OUTPUT_PATH
@@ -121,11 +151,17 @@ def main():
     release_dir = os.path.join(INPUT_PATH, args.releasedirname)
     existing_dump_zip_path = os.path.join(OUTPUT_PATH, args.existingdumpname + ".zip")
     if os.path.exists(release_dir):
-        updated_record_ids = concat_files(release_dir)
-        remove_existing_records(updated_record_ids, existing_dump_zip_path)
-        create_dump_files(args.releasedirname)
-        create_zip(args.releasedirname)
-        print("Created new dump zip")
+        updated_records = load_release_records(release_dir)
+        dump_file = load_existing_dump(existing_dump_zip_path)
+        if dump_file is not None:
+            stats = {}
+            records = merge_records(existing_dump_zip_path, dump_file, updated_records, stats)
+            csv_records = merge_records(existing_dump_zip_path, dump_file, updated_records)
+            manifest, record_count = create_dump_files(args.releasedirname, records, csv_records, args.csvworkers, args.compresslevel, args.buffersize)
+            print_merge_stats(stats, updated_records, record_count)
+            print("Created new dump zip")
+            base = dump_info(dump_file, stats['existing'], sha256=stats['sha256'])
+            create_delta_file(args.releasedirname, base, record_count, updated_records, stats['removed'], manifest)
     else:
         print("Directory " + release_dir + " does not exist. Cannot process files.")
 
@@ -3,97 +3,203 @@ import sys
 import csv
 import json
 import glob
+import time
 import random
 import argparse
 import requests
-from time import sleep
-from deepdiff import DeepDiff
+import threading
+from collections import defaultdict
+from multiprocessing import Pool
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+sys.path.append('../../utilities/checksum_manifest')
+sys.path.append('../../utilities/record_hashes')
+sys.path.append('../../utilities/record_diff')
+from checksum_manifest import load_manifest, verify_file
+from record_hashes import load_hashes, changed_ids, content_hash, read_records, read_entries, iter_records
+from record_diff import diff_records, format_changes
+
+CHUNK_SIZE = 100
+SAMPLE_SIZE = 500
+MAX_PARALLEL_REQUESTS = 10
+RATE_LIMIT_CALLS = 1000
+RATE_LIMIT_PERIOD = 300
+API_URLS = {
+    'stg': 'https://api.staging.ror.org',
+    'prd': 'https://api.ror.org'
+}
 
 
 def get_ror_display_name(json_file):
     return next((name['value'] for name in json_file.get('names', []) if 'ror_display' in name.get('types', [])), None)
 
 
-def release_files_in_data_dump(data_dump_file_path, release_dir, missing_ids_outfile, release_diff_outfile):
-    release_file_ids = []
-    with open(data_dump_file_path, 'r+', encoding='utf8') as f_in:
-        data_dump = json.load(f_in)
-    data_dump_records = {record['id']: record for record in data_dump}
-    print("Total record count in data dump:", len(data_dump))
+def load_release_files(release_dir):
+    release_files = {}
     for file in glob.glob(f'{release_dir}/*.json'):
         with open(file, 'r+', encoding='utf8') as f_in:
             release_file = json.load(f_in)
-        release_file_id = release_file['id']
-        release_file_ids.append(release_file_id)
-        if release_file not in data_dump:
-            ror_display_name = get_ror_display_name(release_file)
-            with open(outfile, 'a') as f_out:
-                writer = csv.writer(f_out)
-                writer.writerow([release_file_id, ror_display_name])
-        record_diff = DeepDiff(
-            release_file, data_dump_records[release_file_id], ignore_order=True)
-        if record_diff:
-            ror_display_name = release_file['name']
-            with open(release_diff_outfile, 'a') as f_out:
-                writer = csv.writer(f_out)
-                writer.writerow(
-                    [release_file_id, ror_display_name, record_diff])
-    return release_file_ids
-
-
-def compare_old_data_dump_new_data_dump(release_ids, data_dump_file_path, old_data_dump_file_path, prod_data_dump_discrepancies_file):
-    with open(data_dump_file_path, 'r+', encoding='utf8') as f_in:
-        data_dump = json.load(f_in)
-    with open(old_data_dump_file_path, 'r+', encoding='utf8') as f_in:
-        old_data_dump = json.load(f_in)
+        release_files[release_file['id']] = release_file
+    return release_files
+
+
+def release_files_in_data_dump(data_dump_file_path, data_dump_index, release_files, missing_ids_outfile, release_diff_outfile):
+    print("Total record count in data dump:", len(data_dump_index))
+    different_ids = [release_file_id for release_file_id, release_file in release_files.items()
+                     if release_file_id in data_dump_index
+                     and content_hash(release_file) != data_dump_index[release_file_id][0]]
+    data_dump_records = read_records(data_dump_file_path, data_dump_index, different_ids)
+    with open(missing_ids_outfile, 'a') as missing_out, open(release_diff_outfile, 'a') as diff_out:
+        missing_writer = csv.writer(missing_out)
+        diff_writer = csv.writer(diff_out)
+        for release_file_id, release_file in release_files.items():
+            if release_file_id not in data_dump_index:
+                missing_writer.writerow([release_file_id, get_ror_display_name(release_file)])
+            elif release_file_id in data_dump_records:
+                record_diff = format_changes(diff_records(
+                    release_file, data_dump_records[release_file_id]))
+                diff_writer.writerow(
+                    [release_file_id, get_ror_display_name(release_file), record_diff])
+    return set(release_files)
+
+
+def diff_changed_records(task):
+    # Runs in a worker process, which reads and parses its own chunk of records
+    old_data_dump_file_path, data_dump_file_path, entries = task
+    old_records = read_entries(old_data_dump_file_path, [(old[1], old[2], key) for key, old, _ in entries])
+    new_records = read_entries(data_dump_file_path, [(new[1], new[2], key) for key, _, new in entries])
+    return [[key, format_changes(diff_records(old_records[key], new_records[key]))] for key, _, _ in entries]
+
+
+def compare_old_data_dump_new_data_dump(release_ids, data_dump_file_path, data_dump_index, old_data_dump_file_path, prod_data_dump_discrepancies_file, workers=1):
+    old_index = load_hashes(old_data_dump_file_path)
     current_dd_minus_release_files = {
-        record["id"]: record for record in data_dump if record["id"] not in release_ids
+        ror_id: entry for ror_id, entry in data_dump_index.items() if ror_id not in release_ids
     }
     old_dd_minus_release_files = {
-        record["id"]: record for record in old_data_dump if record["id"] not in release_ids
+        ror_id: entry for ror_id, entry in old_index.items() if ror_id not in release_ids
     }
     if len(old_dd_minus_release_files) != len(current_dd_minus_release_files):
         print("Data dumps are different lengths with release files removed\nOld:", len(
             old_dd_minus_release_files), '\nNew:', len(current_dd_minus_release_files), '\n')
-    if current_dd_minus_release_files == old_dd_minus_release_files:
+    added, removed, changed = changed_ids(old_dd_minus_release_files, current_dd_minus_release_files)
+    if not (added or removed or changed):
         print('Data dumps match with release files are removed')
-    else:
-        for key, value in old_dd_minus_release_files.items():
-            old_record = value
-            new_record = current_dd_minus_release_files[key]
-            if old_record != new_record:
-                record_diff = DeepDiff(
-                    old_record, new_record, ignore_order=True)
-                with open(prod_data_dump_discrepancies_file, 'a') as f_out:
-                    writer = csv.writer(f_out)
-                    writer.writerow([key, record_diff])
-
-
-def compare_random_data_dump_production_api(release_ids, data_dump_file_path, prod_data_dump_discrepancies_file, schema_version, environment):
-    with open(data_dump_file_path, 'r+', encoding='utf8') as f_in:
-        data_dump = json.load(f_in)
-    minus_release_files = [
-        record for record in data_dump if record["id"] not in release_ids]
-    random_data_dump_records = []
-    for _ in range(500):
-        random_data_dump_records.append(random.choice(minus_release_files))
-    for record in random_data_dump_records:
-        ror_id = record["id"]
-        if environment=="stg":
-            api_url = f"https://api.staging.ror.org/v{schema_version}/organizations/{ror_id}"
-        else:
-            api_url = f"https://api.ror.org/v{schema_version}/organizations/{ror_id}"
-        print("Comparing data dump file and API for", ror_id, "...")
-        api_json = requests.get(api_url).json()
-        record_diff = DeepDiff(record, api_json, ignore_order=True)
-        if not record_diff:
-            print("Randomly chosen data dump file matches API.\n")
+        return
+    entries = [(key, old_index[key], data_dump_index[key]) for key in sorted(changed)]
+    tasks = [(old_data_dump_file_path, data_dump_file_path, entries[i:i + CHUNK_SIZE])
+             for i in range(0, len(entries), CHUNK_SIZE)]
+    with open(prod_data_dump_discrepancies_file, 'a') as f_out:
+        writer = csv.writer(f_out)
+        for key in sorted(removed):
+            writer.writerow([key, 'Record missing from new data dump'])
+        if workers > 1 and len(tasks) > 1:
+            with Pool(min(workers, len(tasks))) as pool:
+                for rows in pool.imap(diff_changed_records, tasks):
+                    writer.writerows(rows)
         else:
-            print("Randomly chosen data dump file does not match API.\n")
-            with open(prod_data_dump_discrepancies_file, 'a') as f_out:
-                writer = csv.writer(f_out)
-                writer.writerow([record['id'], record_diff])
-        sleep(1)
+            for task in tasks:
+                writer.writerows(diff_changed_records(task))
+
+
+class TokenBucket:
+    def __init__(self, capacity, period):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                time.sleep((1 - self.tokens) / self.rate)
+                self.updated = time.monotonic()
+                self.tokens = 1
+            self.tokens -= 1
+
+
+def api_session(workers):
+    retries = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers, max_retries=retries)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def sample_stratum(record):
+    last_modified = record.get('admin', {}).get('last_modified', {}).get('date') or ''
+    return record.get('status'), ','.join(sorted(record.get('types') or [])), last_modified[:4]
+
+
+def stratified_sample(strata, sample_size):
+    # Allocates the sample across strata in proportion to their size, largest
+    # first, giving every stratum at least one record while the sample lasts.
+    remaining = sample_size
+    remaining_total = sum(len(ids) for ids in strata.values())
+    sample = []
+    keys = sorted(strata, key=lambda key: len(strata[key]), reverse=True)
+    for i, key in enumerate(keys):
+        if remaining <= 0:
+            break
+        ids = strata[key]
+        # Leave one record for each smaller stratum still to come
+        share = min(round(remaining * len(ids) / remaining_total), remaining - (len(keys) - i - 1))
+        quota = min(len(ids), remaining, max(1, share))
+        sample.extend(random.sample(ids, quota))
+        remaining -= quota
+        remaining_total -= len(ids)
+    return sample
+
+
+def compare_api_record(session, rate_limiter, api_url, record):
+    rate_limiter.wait()
+    try:
+        response = session.get(f"{api_url}/organizations/{record['id']}", timeout=30)
+        response.raise_for_status()
+        return record['id'], format_changes(diff_records(record, response.json()))
+    except (requests.RequestException, ValueError) as e:
+        return record['id'], f'API request failed: {e}'
+
+
+def compare_random_data_dump_production_api(release_ids, data_dump_file_path, data_dump_index, prod_data_dump_discrepancies_file, schema_version, environment, sample_size=SAMPLE_SIZE, api_url=None, workers=MAX_PARALLEL_REQUESTS):
+    api_url = f"{api_url or API_URLS[environment]}/v{schema_version}"
+    strata = defaultdict(list)
+    for record, _, _ in iter_records(data_dump_file_path):
+        if record['id'] not in release_ids:
+            strata[sample_stratum(record)].append(record['id'])
+    random_ids = stratified_sample(strata, sample_size)
+    random_data_dump_records = read_records(data_dump_file_path, data_dump_index, random_ids)
+    print("Comparing", len(random_ids), "data dump records from", len(strata), "strata with", api_url, "...")
+    rate_limiter = TokenBucket(RATE_LIMIT_CALLS, RATE_LIMIT_PERIOD)
+    mismatches = 0
+    with api_session(workers) as session, ThreadPoolExecutor(workers) as executor, \
+            open(prod_data_dump_discrepancies_file, 'a') as f_out:
+        writer = csv.writer(f_out)
+        futures = [executor.submit(compare_api_record, session, rate_limiter, api_url, record)
+                   for record in random_data_dump_records.values()]
+        for future in as_completed(futures):
+            ror_id, record_diff = future.result()
+            if record_diff:
+                mismatches += 1
+                writer.writerow([ror_id, record_diff])
+    print(len(random_ids) - mismatches, "of", len(random_ids), "randomly chosen data dump records match API.\n")
+
+
+def check_data_dump_checksum(data_dump_file_path, checksums_file):
+    ok, expected, actual = verify_file(data_dump_file_path, load_manifest(checksums_file))
+    if expected is None:
+        print(os.path.basename(data_dump_file_path), "not found in checksum manifest", checksums_file)
+    elif not ok:
+        print("Data dump checksum does not match manifest\nExpected:", expected['sha256'], '\nActual:', actual['sha256'])
+    else:
+        print("Data dump checksum matches manifest")
+    return ok
 
 
 def parse_arguments():
@@ -117,19 +223,36 @@ def parse_arguments():
     parser.add_argument('-e', '--environment', choices=[
                         'stg', 'prd'], default="prd", help='Use staging for tests. stg (staging) or prd (prod). Default is prod.')
     parser.add_argument('-a', '--api-tests', action='store_true', help='Run API tests. Default: False')
+    parser.add_argument('-s', '--sample_size', type=int, default=SAMPLE_SIZE,
+                        help=f'Number of data dump records to compare with the API. Default is {SAMPLE_SIZE}')
+    parser.add_argument('-u', '--api_url',
+                        help='Base API URL to compare against, e.g. a local test server. Overrides --environment')
+    parser.add_argument('-t', '--threads', type=int, default=MAX_PARALLEL_REQUESTS,
+                        help=f'Number of concurrent API requests. Default is {MAX_PARALLEL_REQUESTS}')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(),
+                        help='Number of worker processes for the old/new data dump comparison. Default is the number of CPUs')
+    parser.add_argument('-c', '--checksums_file',
+                        help='Path to the checksum manifest written by generate_dump. Checked against the new data dump file before running tests')
     args = parser.parse_args()
     return args
 
 
 def main():
     args = parse_arguments()
+    if args.checksums_file and not check_data_dump_checksum(args.new_data_dump_file, args.checksums_file):
+        sys.exit(1)
+    # The new dump is indexed once (ID -> hash, offset, length) and shared by
+    # every check; records are only parsed when a check needs them
+    data_dump_index = load_hashes(args.new_data_dump_file)
+    release_files = load_release_files(args.release_dir)
     release_ids = release_files_in_data_dump(
-        args.new_data_dump_file, args.release_dir, args.missing_ids_outfile, args.release_diff_outfile)
+        args.new_data_dump_file, data_dump_index, release_files, args.missing_ids_outfile, args.release_diff_outfile)
     compare_old_data_dump_new_data_dump(
-        release_ids, args.new_data_dump_file, args.old_data_dump_file, args.jsondiff_outfile)
+        release_ids, args.new_data_dump_file, data_dump_index, args.old_data_dump_file, args.jsondiff_outfile, args.workers)
     if args.api_tests:
         compare_random_data_dump_production_api(
-            release_ids, args.new_data_dump_file, args.prod_data_dump_discrepancies_file, args.schema_version, args.environment)
+            release_ids, args.new_data_dump_file, data_dump_index, args.prod_data_dump_discrepancies_file, args.schema_version, args.environment,
+            args.sample_size, args.api_url, args.threads)
 
 
 if __name__ == '__main__':
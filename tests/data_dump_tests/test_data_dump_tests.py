@@ -0,0 +1,175 @@
+import os
+import sys
+import csv
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+
+# data_dump_tests adds the utilities to sys.path relative to the working
+# directory, so add them relative to this file for runs from elsewhere
+UTILITIES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'utilities')
+for utility in ['checksum_manifest', 'record_hashes', 'record_diff']:
+    sys.path.append(os.path.join(UTILITIES_DIR, utility))
+
+from record_hashes import load_hashes
+from data_dump_tests import TokenBucket, stratified_sample, compare_random_data_dump_production_api
+
+
+def make_record(number, status='active', types=('education',), year='2024'):
+    return {
+        'id': f'https://ror.org/0{number:07d}',
+        'status': status,
+        'types': list(types),
+        'names': [{'value': f'Organization {number}', 'types': ['ror_display'], 'lang': None}],
+        'admin': {'last_modified': {'date': f'{year}-01-01', 'schema_version': '2.0'}}
+    }
+
+
+class StubApi:
+    # Serves records by ID like the ROR API, recording the highest number of
+    # requests handled at once
+    def __init__(self, records, delay=0.05):
+        self.records = {record['id'].rsplit('/', 1)[1]: record for record in records}
+        self.delay = delay
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with stub.lock:
+                    stub.requests.append(self.path)
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                time.sleep(stub.delay)
+                with stub.lock:
+                    stub.active -= 1
+                record = stub.records.get(self.path.rsplit('/', 1)[1])
+                if record is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                body = json.dumps(record).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TestTokenBucket:
+    def test_allows_burst_up_to_capacity(self):
+        bucket = TokenBucket(5, 10)
+        start = time.monotonic()
+        for _ in range(5):
+            bucket.wait()
+        assert time.monotonic() - start < 0.1
+
+    def test_waits_for_tokens_beyond_capacity(self):
+        bucket = TokenBucket(5, 0.5)
+        start = time.monotonic()
+        for _ in range(10):
+            bucket.wait()
+        assert time.monotonic() - start >= 0.4
+
+    def test_shared_across_threads(self):
+        bucket = TokenBucket(4, 0.4)
+        start = time.monotonic()
+        threads = [threading.Thread(target=bucket.wait) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert time.monotonic() - start >= 0.3
+
+
+class TestStratifiedSample:
+    def test_every_stratum_represented(self):
+        strata = {'large': list(range(1000)), 'medium': list(range(1000, 1100)), 'small': [2000]}
+        sample = stratified_sample(strata, 50)
+        assert len(sample) == 50
+        assert 2000 in sample
+        assert any(1000 <= ror_id < 1100 for ror_id in sample)
+
+    def test_allocation_is_proportional(self):
+        strata = {'a': list(range(900)), 'b': list(range(900, 1000))}
+        sample = stratified_sample(strata, 100)
+        assert sum(1 for ror_id in sample if ror_id < 900) == 90
+        assert sum(1 for ror_id in sample if ror_id >= 900) == 10
+
+    def test_no_duplicates(self):
+        strata = {'a': list(range(10)), 'b': list(range(10, 20))}
+        sample = stratified_sample(strata, 15)
+        assert len(sample) == len(set(sample)) == 15
+
+    def test_sample_larger_than_population(self):
+        strata = {'a': [1, 2], 'b': [3]}
+        assert sorted(stratified_sample(strata, 10)) == [1, 2, 3]
+
+    def test_more_strata_than_sample(self):
+        strata = {key: [key] for key in range(10)}
+        assert len(stratified_sample(strata, 3)) == 3
+
+
+class TestCompareWithApi:
+    @pytest.fixture
+    def data_dump(self, tmp_path):
+        records = [make_record(i, status='inactive' if i % 5 == 0 else 'active',
+                               year='2023' if i % 2 else '2024') for i in range(40)]
+        path = tmp_path / 'v2.0-ror-data.json'
+        path.write_text(json.dumps(records, indent=4))
+        return str(path), records
+
+    def test_reports_only_mismatched_and_failed_records(self, data_dump, tmp_path):
+        dump_path, records = data_dump
+        api_records = [dict(record) for record in records]
+        api_records[3]['status'] = 'withdrawn'
+        del api_records[7]
+        release_ids = {records[0]['id']}
+        outfile = str(tmp_path / 'discrepancies.csv')
+        with StubApi(api_records) as api:
+            compare_random_data_dump_production_api(
+                release_ids, dump_path, load_hashes(dump_path, save=False), outfile, '2', 'prd',
+                sample_size=len(records), api_url=api.url, workers=4)
+        with open(outfile) as f_in:
+            rows = {row[0]: row[1] for row in csv.reader(f_in)}
+        assert set(rows) == {records[3]['id'], records[7]['id']}
+        assert 'status' in rows[records[3]['id']]
+        assert rows[records[7]['id']].startswith('API request failed')
+        assert len(api.requests) == len(records) - 1
+        assert all(path.startswith('/v2/organizations/') for path in api.requests)
+        assert not any(path.endswith(records[0]['id'].rsplit('/', 1)[1]) for path in api.requests)
+
+    def test_requests_run_concurrently(self, data_dump, tmp_path):
+        dump_path, records = data_dump
+        outfile = str(tmp_path / 'discrepancies.csv')
+        with StubApi(records, delay=0.1) as api:
+            start = time.monotonic()
+            compare_random_data_dump_production_api(
+                set(), dump_path, load_hashes(dump_path, save=False), outfile, '2', 'prd',
+                sample_size=20, api_url=api.url, workers=5)
+            elapsed = time.monotonic() - start
+        assert len(api.requests) == 20
+        assert api.max_active > 1
+        assert elapsed < 20 * 0.1
+        assert os.path.getsize(outfile) == 0
@@ -4,23 +4,7 @@ import json
 import argparse
 import re
 
-
-def flatten_json(j):
-    flattened = {}
-
-    def flatten(obj, name=''):
-        if type(obj) is dict:
-            for item in obj:
-                flatten(obj[item], name + item + '_')
-        elif type(obj) is list:
-            i = 0
-            for item in obj:
-                flatten(item, name + str(i) + '_')
-                i += 1
-        else:
-            flattened[name[:-1]] = obj
-    flatten(j)
-    return flattened
+from curation_validation.core.projection import RecordProjection
 
 
 def should_ignore_duplicate(field1, field2, value):
@@ -66,7 +50,7 @@ def check_duplicate_values(input_dir, output_file):
         with open(file, 'r+', encoding='utf8') as f_in:
             json_file = json.load(f_in)
         ror_id = json_file['id']
-        flattened = flatten_json(json_file)
+        flattened = RecordProjection(json_file).flattened
         seen = {}
         for key, value in flattened.items():
             if isinstance(value, str):
@@ -4,48 +4,10 @@ import sys
 import csv
 import json
 import argparse
-from urllib.parse import unquote, quote
+from urllib.parse import unquote
 
-
-def normalize_wikipedia_url(url):
-    if not url or not url.startswith('https://'):
-        return url
-    base = url[:url.rfind('/') + 1]
-    path = url[url.rfind('/') + 1:]
-    normalized_path = quote(unquote(path))
-    return base + normalized_path
-
-
-def simplify_json(j):
-    simplified = {}
-    name_types = ['ror_display', 'alias', 'label', 'acronym']
-    link_types = ['wikipedia', 'website']
-    external_id_types = ['isni', 'fundref', 'wikidata']
-    simplified['status'] = [j.get('status', [])]
-    simplified['types'] = j.get('types', [])
-    simplified['established'] = [j.get('established', [])]
-    simplified['locations.geonames_id'] = [location['geonames_id']
-                                           for location in j.get('locations', [])]
-    for name_type in name_types:
-        simplified[f'names.types.{name_type}'] = [name['value'] for name in j.get('names', []) if name_type in name.get('types', [])]
-    for link_type in link_types:
-        values = [link['value']
-                  for link in j.get('links', []) if link.get('type') == link_type]
-        if link_type == 'wikipedia':
-            values = [normalize_wikipedia_url(v) for v in values]
-        simplified[f'links.type.{link_type}'] = values
-    for id_type in external_id_types:
-        ids_of_type = [ext_id for ext_id in j.get(
-            'external_ids', []) if ext_id.get('type') == id_type]
-        simplified[f'external_ids.type.{id_type}.preferred'] = [ext_id['preferred'] for ext_id in ids_of_type]
-        all_id_values = [ext_id.get('all', []) for ext_id in ids_of_type]
-        simplified[f'external_ids.type.{id_type}.all'] = sum(all_id_values, []) if all(isinstance(v, list) for v in all_id_values) else []
-    all_values = []
-    for key, value in simplified.items():
-        all_values += value
-    all_values = [value for value in all_values if value]
-    simplified['all'] = all_values
-    return simplified
+from curation_validation.core.normalize import normalize_wikipedia_url
+from curation_validation.core.projection import RecordProjection
 
 
 def check_in_json(input_file, json_directory, output_file):
@@ -79,7 +41,7 @@ def check_in_json(input_file, json_directory, output_file):
 
             with open(json_file_path, 'r+', encoding='utf8') as f_in:
                 json_file = json.load(f_in)
-                simplified_json = simplify_json(json_file)
+                simplified_json = RecordProjection(json_file).simplified
 
             for field in ror_data_fields:
                 if row[field]:
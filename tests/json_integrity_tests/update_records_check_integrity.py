@@ -6,6 +6,8 @@ import json
 import argparse
 from collections import defaultdict
 
+from curation_validation.core.projection import RecordProjection
+
 
 def parse_update_field(update_str):
     updates = {}
@@ -72,37 +74,6 @@ def parse_record_updates_file(input_file):
     return record_updates
 
 
-def simplify_and_invert_json(j):
-    simplified = {}
-    name_types = ['ror_display', 'alias', 'label', 'acronym']
-    link_types = ['wikipedia', 'website']
-    external_id_types = ['isni', 'fundref', 'wikidata']
-    simplified['status'] = [j.get('status', [])]
-    simplified['types'] = j.get('types', [])
-    simplified['established'] = [j.get('established', [])]
-    simplified['locations.geonames_id'] = [location['geonames_id']
-                                           for location in j.get('locations', [])]
-    for name_type in name_types:
-        simplified[f'names.types.{name_type}'] = [name['value'] for name in j.get('names', []) if name_type in name.get('types', [])]
-    for link_type in link_types:
-        simplified[f'links.type.{link_type}'] = [link['value'] for link in j.get('links', []) if link.get('type') == link_type]
-    for id_type in external_id_types:
-        ids_of_type = [ext_id for ext_id in j.get(
-            'external_ids', []) if ext_id.get('type') == id_type]
-        simplified[f'external_ids.type.{id_type}.preferred'] = [ext_id['preferred'] for ext_id in ids_of_type]
-        all_id_values = [ext_id.get('all', []) for ext_id in ids_of_type]
-        simplified[f'external_ids.type.{id_type}.all'] = sum(all_id_values, []) if all(isinstance(v, list) for v in all_id_values) else []
-    all_values = []
-    inverted = {}
-    for key, values in simplified.items():
-        for value in values:
-            if value:
-                all_values.append(value)
-                inverted.setdefault(value, []).append(key)
-    simplified['all'] = all_values
-    return simplified, inverted
-
-
 def check_if_updates_applied(input_file, json_directory, output_file):
     record_updates = parse_record_updates_file(input_file)
     header = ['html_url', 'ror_id', 'field',
@@ -115,7 +86,9 @@ def check_if_updates_applied(input_file, json_directory, output_file):
         json_file_path = os.path.join(json_directory, f'{ror_id_file_prefix}.json')
         with open(json_file_path, 'r+', encoding='utf8') as f_in:
             json_file = json.load(f_in)
-        simplified_json, inverted_json = simplify_and_invert_json(json_file)
+        projection = RecordProjection(json_file, normalize_wikipedia=False)
+        simplified_json = projection.simplified
+        inverted_json = projection.inverted
         additions = ['add', 'replace']
         deletions = ['delete']
         for update in updates:
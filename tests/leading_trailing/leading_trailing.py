@@ -3,22 +3,7 @@ import json
 import glob
 import argparse
 
-
-def flatten_json(j):
-    flattened = {}
-    def flatten(obj, name=''):
-        if type(obj) is dict:
-            for item in obj:
-                flatten(obj[item], name + item + '_')
-        elif type(obj) is list:
-            i = 0
-            for item in obj:
-                flatten(item, name + str(i) + '_')
-                i += 1
-        else:
-            flattened[name[:-1]] = obj
-    flatten(j)
-    return flattened
+from curation_validation.core.projection import RecordProjection
 
 
 def check_leading_trailing(input_dir, output_file):
@@ -30,7 +15,7 @@ def check_leading_trailing(input_dir, output_file):
         with open(file, 'r+') as f_in:
             record = json.load(f_in)
         ror_id = record['id']
-        flattened = flatten_json(record)
+        flattened = RecordProjection(record).flattened
         for key, value in flattened.items():
             if value and isinstance(value, str):
                 first_char = value[0]
@@ -1,4 +1,6 @@
+import os
 import re
+import sys
 import csv
 import json
 import glob
@@ -12,10 +14,14 @@ import time
 import logging
 import multiprocessing
 from functools import partial
+sys.path.append('../../utilities/checkpoint_journal')
+from checkpoint_journal import CheckpointJournal, journal_path
 
 MAX_PARALLEL_REQUESTS = 5
 RATE_LIMIT_CALLS = 1000
 RATE_LIMIT_PERIOD = 300
+RETRY_ROUNDS = 2
+RETRY_DELAY = 10
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
@@ -78,8 +84,9 @@ def ror_search(org_name, record_country_code, rate_limiter):
     ror_matches = []
     for params in all_params:
         rate_limiter.wait()
-        r = requests.get(base_url, params=params)
+        r = requests.get(base_url, params=params, timeout=30)
         print(r.url)
+        r.raise_for_status()
         api_response = r.json()
         if api_response['number_of_results'] != 0:
             results = api_response['items']
@@ -101,24 +108,68 @@ def ror_search(org_name, record_country_code, rate_limiter):
     return ror_matches
 
 
-def check_duplicates(input_dir, output_file):
+def is_transient_error(error):
+    # Connection errors, timeouts and retries exhausted on 429/5xx responses
+    # may succeed later. Other errors, e.g. a 404 or invalid JSON, are final.
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                          requests.exceptions.ChunkedEncodingError, requests.exceptions.RetryError)):
+        return True
+    response = getattr(error, 'response', None)
+    return response is not None and (response.status_code == 429 or response.status_code >= 500)
+
+
+def check_duplicates(input_dir, output_file, checkpoint_file=None, resume=False):
     header = ["ror_id", "name", "matched_ror_id",
               "matched_name", "match_ratio"]
-    with open(output_file, 'w') as f_out:
-        writer = csv.writer(f_out)
-        writer.writerow(header)
     files = glob.glob(f"{input_dir}/*.json")
     shared_rate_limiter = init_shared_rate_limiter()
     pool = multiprocessing.Pool(MAX_PARALLEL_REQUESTS)
     process_file_partial = partial(
         process_file, rate_limiter=shared_rate_limiter)
-    for result in pool.imap_unordered(process_file_partial, files):
-        if result:
-            with open(output_file, 'a') as f_out:
-                writer = csv.writer(f_out)
+    # The journal is keyed by the path relative to the input directory, so a
+    # resume from another working directory still matches
+    keys = {file: os.path.relpath(file, input_dir) for file in files}
+    final_errors = {}
+    with CheckpointJournal(checkpoint_file or journal_path(output_file), resume) as journal, \
+            open(output_file, 'w') as f_out:
+        writer = csv.writer(f_out)
+        writer.writerow(header)
+        # Matches from an earlier run are written out again so the output
+        # file is complete. Journal entries for files no longer in the input
+        # directory are skipped.
+        checked = [file for file in files if keys[file] in journal]
+        for file in checked:
+            result = journal.results[keys[file]]
+            if isinstance(result, dict):
+                final_errors[keys[file]] = result['error']
+            else:
                 writer.writerows(result)
+        pending = [file for file in files if keys[file] not in journal]
+        if checked:
+            logging.info(f"Resuming with {len(checked)} files already checked.")
+        for attempt in range(RETRY_ROUNDS + 1):
+            failed = []
+            for file, results, error in pool.imap_unordered(process_file_partial, pending):
+                if error is not None:
+                    final_errors[keys[file]] = error
+                    journal.record(keys[file], {'error': error})
+                    continue
+                if results is None:
+                    failed.append(file)
+                    continue
+                writer.writerows(results)
+                journal.record(keys[file], results)
+            if not failed or attempt == RETRY_ROUNDS:
+                break
+            logging.warning(f"Retrying {len(failed)} files after transient API errors...")
+            time.sleep(RETRY_DELAY)
+            pending = failed
     pool.close()
     pool.join()
+    if final_errors:
+        logging.error(f"Searches failed with errors that will not be retried for {len(final_errors)} files: {final_errors}")
+    if failed:
+        logging.error(f"Searches failed for {len(failed)} files: {failed}. Run again with --resume to retry them.")
 
 
 def process_file(file, rate_limiter):
@@ -128,14 +179,20 @@ def process_file(file, rate_limiter):
     record_country_code = get_country_code(json_file)
     record_names = get_all_names(json_file)
     results = []
-    for record_name in record_names:
-        print("Searching", ror_id, "-", record_name, "...")
-        ror_matches = ror_search(
-            record_name, record_country_code, rate_limiter)
-        if ror_matches:
-            for match in ror_matches:
-                results.append([ror_id, record_name] + match)
-    return results
+    try:
+        for record_name in record_names:
+            print("Searching", ror_id, "-", record_name, "...")
+            ror_matches = ror_search(
+                record_name, record_country_code, rate_limiter)
+            if ror_matches:
+                for match in ror_matches:
+                    results.append([ror_id, record_name] + match)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logging.warning(f"Search failed for {ror_id}: {e}")
+        if isinstance(e, requests.exceptions.RequestException) and is_transient_error(e):
+            return file, None, None
+        return file, None, str(e)
+    return file, results, None
 
 
 def parse_arguments():
@@ -145,12 +202,17 @@ def parse_arguments():
                         help="Input directory path.")
     parser.add_argument("-o", "--output_file",
                         default="on_production_duplicates.csv", help="Output CSV file path.")
+    parser.add_argument("-c", "--checkpoint_file",
+                        help="Checkpoint journal path. Default is <output file>.checkpoint.jsonl")
+    parser.add_argument("--resume", action="store_true",
+                        help="Resume from the checkpoint journal, skipping files already checked.")
     return parser.parse_args()
 
 
 def main():
     args = parse_arguments()
-    check_duplicates(args.input_dir, args.output_file)
+    check_duplicates(args.input_dir, args.output_file,
+                     args.checkpoint_file, args.resume)
 
 
 if __name__ == '__main__':
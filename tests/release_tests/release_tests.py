@@ -1,56 +1,87 @@
 import os
 import re
+import sys
 import csv
 import json
 import glob
 import time
 import random
+import asyncio
 import logging
 import argparse
 import requests
-import multiprocessing
-from functools import partial
-from deepdiff import DeepDiff
+from collections import deque
+from statistics import NormalDist
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+sys.path.append('../../utilities/record_diff')
+sys.path.append('../../utilities/checkpoint_journal')
+sys.path.append('../../utilities/record_hashes')
+from record_diff import diff_records, format_changes
+from checkpoint_journal import CheckpointJournal, journal_path
+from record_hashes import content_hash
 
 MAX_PARALLEL_REQUESTS = 5
 RATE_LIMIT_CALLS = 1000
 RATE_LIMIT_PERIOD = 300
+RETRY_ROUNDS = 2
+RETRY_DELAY = 10
+PROD_API_URL = "https://api.ror.org"
+COMPARE_BATCH_SIZE = 50
+MAX_COMPARE_SAMPLE = 2000
+MAX_CHANGE_RATE = 0.01
+CONFIDENCE = 0.95
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
-def init_shared_rate_limiter():
-    manager = multiprocessing.Manager()
-    shared_calls = manager.list()
-    shared_lock = manager.Lock()
-    return GlobalRateLimiter(RATE_LIMIT_CALLS, RATE_LIMIT_PERIOD, shared_calls, shared_lock)
-
-
-class GlobalRateLimiter:
-    def __init__(self, max_calls, period, shared_calls, shared_lock):
+class RateLimiter:
+    def __init__(self, max_calls, period):
         self.max_calls = max_calls
         self.period = period
-        self.calls = shared_calls
-        self.lock = shared_lock
-
-    def wait(self):
-        with self.lock:
-            now = time.time()
-            self.calls[:] = [t for t in self.calls if now - t < self.period]
+        self.calls = deque()
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self.lock:
+            now = time.monotonic()
+            while self.calls and now - self.calls[0] >= self.period:
+                self.calls.popleft()
             if len(self.calls) >= self.max_calls:
-                sleep_time = self.period - (now - self.calls[0])
-                time.sleep(max(sleep_time, 0))
-            self.calls.append(now)
-
-
-def rate_limited_request(url, params=None, rate_limiter=None):
-    if rate_limiter:
-        rate_limiter.wait()
-    response = requests.get(url, params=params)
-    if response.status_code == 404:
-        return response
-    response.raise_for_status()
-    return response
+                await asyncio.sleep(self.period - (now - self.calls.popleft()))
+            self.calls.append(time.monotonic())
+
+
+class ApiClient:
+    # One pooled session shared by every check. Requests run on a thread pool
+    # so the event loop can keep up to max_requests of them in flight, all
+    # through the same rate limiter.
+    def __init__(self, max_requests=MAX_PARALLEL_REQUESTS):
+        retries = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
+        adapter = HTTPAdapter(pool_maxsize=max_requests, max_retries=retries)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_requests)
+        self.semaphore = asyncio.Semaphore(max_requests)
+        self.rate_limiter = RateLimiter(RATE_LIMIT_CALLS, RATE_LIMIT_PERIOD)
+
+    async def get(self, url, params=None):
+        async with self.semaphore:
+            await self.rate_limiter.wait()
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, lambda: self.session.get(url, params=params, timeout=30))
+
+    async def get_hash(self, url, validators):
+        async with self.semaphore:
+            await self.rate_limiter.wait()
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, fetch_hash, self.session, url, validators)
+
+    def close(self):
+        self.executor.shutdown()
+        self.session.close()
 
 
 def get_ror_display_name(json_file, version):
@@ -59,65 +90,61 @@ def get_ror_display_name(json_file, version):
     return next((name['value'] for name in json_file.get('names', []) if 'ror_display' in name.get('types', [])), None)
 
 
-def retrieve_api(args):
-    ror_id, rate_limiter, base_url, version = args
-    api_url = f"{base_url}/v{version}/organizations/{ror_id}"
-    r = rate_limited_request(api_url, rate_limiter=rate_limiter)
-    return ror_id, "retrieved" if r.status_code == 200 else "failed"
+def retrieve_check(response):
+    if isinstance(response, Exception):
+        return "failed"
+    return "retrieved" if response.status_code == 200 else "failed"
 
 
-def compare_api(args):
-    ror_id, json_file, rate_limiter, base_url, version = args
-    api_url = f"{base_url}/v{version}/organizations/{ror_id}"
+def compare_check(response, json_file):
+    if isinstance(response, requests.exceptions.RequestException):
+        return "api_error", f"Request error: {str(response)}"
+    if isinstance(response, Exception):
+        return "api_error", f"Unexpected error: {str(response)}"
     try:
-        response = rate_limited_request(api_url, rate_limiter=rate_limiter)
         response.raise_for_status()
-        if not response.content.strip():
-            return ror_id, "api_error", "Empty response received"
-        try:
-            api_json = response.json()
-        except requests.exceptions.JSONDecodeError as e:
-            return ror_id, "api_error", f"Invalid JSON response: {str(e)}"
-            
-        diff = DeepDiff(api_json, json_file, ignore_order=True)
-        return ror_id, "different" if diff else "same", diff or None
-        
     except requests.exceptions.RequestException as e:
-        return ror_id, "api_error", f"Request error: {str(e)}"
-    except Exception as e:
-        return ror_id, "api_error", f"Unexpected error: {str(e)}"
+        return "api_error", f"Request error: {str(e)}"
+    if not response.content.strip():
+        return "api_error", "Empty response received"
+    try:
+        api_json = response.json()
+    except requests.exceptions.JSONDecodeError as e:
+        return "api_error", f"Invalid JSON response: {str(e)}"
+    diff = format_changes(diff_records(api_json, json_file))
+    return "different" if diff else "same", diff or None
 
 
-def search_name_api(args):
-    ror_id, org_name, rate_limiter, base_url, version = args
+async def search_name_api(client, org_name, base_url, version):
+    # Returns the check result and whether it came from an error worth retrying
     api_url = f'{base_url}/v{version}/organizations'
     params = {'query': f'"{org_name}"', 'all_status': 'True'}
     try:
-        r = rate_limited_request(api_url, params=params, rate_limiter=rate_limiter)
+        r = await client.get(api_url, params=params)
         if r.status_code == 404:
-            return ror_id, org_name, "not_found"
+            return "not_found", False
+        r.raise_for_status()
         if not r.content.strip():
-            return ror_id, org_name, "empty_response"
-            
+            return "empty_response", False
+
         try:
             results = r.json()["items"]
         except (KeyError, requests.exceptions.JSONDecodeError) as e:
-            return ror_id, org_name, f"invalid_response: {str(e)}"
-            
+            return f"invalid_response: {str(e)}", False
+
         for result in results:
             ror_display = get_ror_display_name(result, version)
             if ror_display == org_name:
-                return ror_id, org_name, "retrieved"
-        return ror_id, org_name, "failed"
-        
+                return "retrieved", False
+        return "failed", False
+
     except requests.exceptions.RequestException as e:
-        return ror_id, org_name, f"request_error: {str(e)}"
+        return f"request_error: {str(e)}", is_transient_error(e)
     except Exception as e:
-        return ror_id, org_name, f"unexpected_error: {str(e)}"
+        return f"unexpected_error: {str(e)}", False
 
 
-def process_file(args):
-    file_path, version = args
+def process_file(file_path, version):
     with open(file_path, 'r', encoding='utf8') as f_in:
         json_file = json.load(f_in)
     ror_id = re.sub('https://ror.org/', '', json_file["id"])
@@ -125,91 +152,212 @@ def process_file(args):
     return ror_id, org_name, json_file
 
 
-def compare_single(args):
-    ror_id, rate_limiter, base_url, version = args
-    prod_api_url = f"https://api.ror.org/v{version}/organizations/{ror_id}"
-    staging_api_url = f"{base_url}/v{version}/organizations/{ror_id}"
-    prod_response = rate_limited_request(
-        prod_api_url, rate_limiter=rate_limiter).json()
-    staging_response = rate_limited_request(
-        staging_api_url, rate_limiter=rate_limiter).json()
-    return ror_id if prod_response != staging_response else None
-
-
-def compare_random(compare_ids, shared_rate_limiter, base_url, version):
-    pool = multiprocessing.Pool(MAX_PARALLEL_REQUESTS)
-    results = pool.map(compare_single, [
-                       (ror_id, shared_rate_limiter, base_url, version) for ror_id in compare_ids])
-    pool.close()
-    pool.join()
-    return [ror_id for ror_id in results if ror_id is not None]
-
-
-def check_release_files(release_directory, all_ror_ids_file, release_tests_outfile, jsondiff_outfile, shared_rate_limiter, base_url, version):
+def is_transient_status(status_code):
+    return status_code == 429 or status_code >= 500
+
+
+def is_transient_error(error):
+    # Connection errors, timeouts and retries exhausted on 429/5xx responses
+    # may succeed later. Other errors, e.g. a 404, are final.
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                          requests.exceptions.ChunkedEncodingError, requests.exceptions.RetryError)):
+        return True
+    response = getattr(error, 'response', None)
+    return response is not None and is_transient_status(response.status_code)
+
+
+def is_transient(response):
+    if isinstance(response, Exception):
+        return is_transient_error(response)
+    return is_transient_status(response.status_code)
+
+
+async def check_release_file(client, ror_id, org_name, json_file, base_url, version):
+    # The record is fetched once and the response is used for both the
+    # retrieve and compare checks, while the name search runs alongside it.
+    response, search = await asyncio.gather(
+        client.get(f"{base_url}/v{version}/organizations/{ror_id}"),
+        search_name_api(client, org_name, base_url, version),
+        return_exceptions=True)
+    search_result, search_transient = (search, False) if isinstance(search, Exception) else search
+    compare_result, diff = compare_check(response, json_file)
+    row = [ror_id, org_name, retrieve_check(response), compare_result, str(search_result)]
+    return row, diff, is_transient(response) or search_transient
+
+
+def fetch_hash(session, url, validators):
+    # Returns the canonical content hash of the record at url. The ETag and
+    # Last-Modified validators saved with the hash on an earlier run are sent
+    # back, and a 304 reuses the saved hash without downloading the record.
+    cached = validators.get(url)
+    headers = {}
+    if cached:
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+    with session.get(url, headers=headers, timeout=30, stream=True) as response:
+        if response.status_code == 304 and cached:
+            return cached['hash']
+        response.raise_for_status()
+        digest = content_hash(response.json())
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+    if etag or last_modified:
+        validators[url] = {'etag': etag, 'last_modified': last_modified, 'hash': digest}
+    return digest
+
+
+def load_validators(path):
+    if path and os.path.exists(path):
+        with open(path) as f_in:
+            return json.load(f_in)
+    return {}
+
+
+def save_validators(path, validators):
+    if path:
+        with open(path + '.tmp', 'w') as f_out:
+            json.dump(validators, f_out)
+        os.replace(path + '.tmp', path)
+
+
+def change_rate_bounds(changed, checked, confidence):
+    # One-sided Wilson score bounds on the proportion of changed records
+    z = NormalDist().inv_cdf(confidence)
+    p = changed / checked
+    centre = (p + z * z / (2 * checked)) / (1 + z * z / checked)
+    margin = z * ((p * (1 - p) + z * z / (4 * checked)) / checked) ** 0.5 / (1 + z * z / checked)
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+async def compare_single(client, ror_id, base_url, version, validators):
+    # Returns 'changed', 'error' or None. A record that cannot be fetched or
+    # parsed in either environment is reported as an error rather than
+    # stopping the comparison.
+    hashes = await asyncio.gather(
+        client.get_hash(f"{PROD_API_URL}/v{version}/organizations/{ror_id}", validators),
+        client.get_hash(f"{base_url}/v{version}/organizations/{ror_id}", validators),
+        return_exceptions=True)
+    errors = [str(result) for result in hashes if isinstance(result, Exception)]
+    if errors:
+        logging.error(f"Could not compare {ror_id}: {'; '.join(errors)}")
+        return 'error'
+    return 'changed' if hashes[0] != hashes[1] else None
+
+
+async def compare_random(client, candidate_ids, base_url, version, validators, seed=None, max_change_rate=MAX_CHANGE_RATE, confidence=CONFIDENCE):
+    # Compares random records in batches until the change rate is known to be
+    # below (or above) max_change_rate at the given confidence, or the sample
+    # limit is reached. Records that could not be compared are left out of
+    # the change rate and returned separately.
+    candidate_ids = random.Random(seed).sample(sorted(candidate_ids), min(MAX_COMPARE_SAMPLE, len(candidate_ids)))
+    changed_ids = []
+    errored_ids = []
+    sampled = 0
+    checked = 0
+    lower, upper = 0.0, 1.0
+    while sampled < len(candidate_ids):
+        batch = candidate_ids[sampled:sampled + COMPARE_BATCH_SIZE]
+        results = await asyncio.gather(*[compare_single(client, ror_id, base_url, version, validators) for ror_id in batch])
+        for ror_id, result in zip(batch, results):
+            if result == 'error':
+                errored_ids.append(ror_id)
+            elif result == 'changed':
+                changed_ids.append(ror_id)
+        sampled += len(batch)
+        checked = sampled - len(errored_ids)
+        if not checked:
+            continue
+        lower, upper = change_rate_bounds(len(changed_ids), checked, confidence)
+        if upper < max_change_rate or lower > max_change_rate:
+            break
+    if checked:
+        logging.info(f"Compared {checked} random records, {len(changed_ids)} changed. "
+                     f"Change rate is between {lower:.2%} and {upper:.2%} at {confidence:.0%} confidence.")
+    if errored_ids:
+        logging.warning(f"Could not compare {len(errored_ids)} random records: {errored_ids}")
+    return changed_ids, errored_ids
+
+
+async def check_release_files(release_directory, all_ror_ids_file, release_tests_outfile, jsondiff_outfile, base_url, version, max_requests=MAX_PARALLEL_REQUESTS, checkpoint_file=None, resume=False, validators_file=None, max_change_rate=MAX_CHANGE_RATE):
     if not os.path.exists(release_directory):
         logging.error(f"Release directory '{release_directory}' does not exist.")
         exit(1)
     json_files = glob.glob(os.path.join(release_directory, "**", "*.json"), recursive=True)
     total_files = len(json_files)
     logging.info(f"Found {total_files} JSON files to process.")
-    pool = multiprocessing.Pool(MAX_PARALLEL_REQUESTS)
-    with open(release_tests_outfile, 'w') as f_out:
-        writer = csv.writer(f_out)
-        writer.writerow(["ror_id", "org_name", "retrieve_check", "compare_check", "search_name_api_check"])
-    with open(jsondiff_outfile, 'w') as f_out:
-        writer = csv.writer(f_out)
-        writer.writerow(["ror_id", "diff"])
-    processed_ids = set()
-    chunk_size = 100
-
-    for i in range(0, total_files, chunk_size):
-        chunk = json_files[i:i+chunk_size]
-        logging.info(f"Processing chunk {i//chunk_size + 1} of {(total_files-1)//chunk_size + 1}")
-        
-        logging.info("Processing files...")
-        file_data = pool.map(process_file, [(file_path, version) for file_path in chunk])
-        ror_ids = [data[0] for data in file_data]
-        org_names = [data[1] for data in file_data]
-        json_files_data = [data[2] for data in file_data]
-
-        logging.info("Performing retrieve API checks...")
-        retrieve_results = pool.map(retrieve_api, [(ror_id, shared_rate_limiter, base_url, version) for ror_id in ror_ids])
-        
-        logging.info("Performing compare API checks...")
-        compare_results = pool.map(compare_api, [(ror_id, json_file, shared_rate_limiter, base_url, version) for ror_id, json_file in zip(ror_ids, json_files_data)])
-        
-        logging.info("Performing search name API checks...")
-        search_results = pool.map(search_name_api, [(ror_id, org_name, shared_rate_limiter, base_url, version) for ror_id, org_name in zip(ror_ids, org_names)])
-
-        logging.info("Writing results to files...")
-        with open(release_tests_outfile, 'a') as f_out:
-            writer = csv.writer(f_out)
-            for i, ror_id in enumerate(ror_ids):
-                writer.writerow([ror_id, org_names[i], retrieve_results[i][1], compare_results[i][1], search_results[i][2]])
-
-        with open(jsondiff_outfile, 'a') as f_out:
-            writer = csv.writer(f_out)
-            for result in compare_results:
-                if result[2]:
-                    writer.writerow([result[0], result[2]])
-
-        processed_ids.update(ror_ids)
-        logging.info(f"Processed {len(processed_ids)} out of {total_files} files.")
-
-    pool.close()
-    pool.join()
-
-    logging.info("Reading all ROR IDs for unprocessed IDs and random selection...")
-    with open(all_ror_ids_file) as f_in:
-        all_ror_ids = set(re.sub('https://ror.org/', '', line.strip()).lower() for line in f_in)
-    unprocessed_ids = list(all_ror_ids - set(ror_id.lower() for ror_id in processed_ids))
-    random_ids = random.sample(unprocessed_ids, min(500, len(unprocessed_ids)))
-    logging.info(f"Selected {len(random_ids)} random unprocessed IDs for comparison.")
-
-    logging.info("Performing random comparison checks...")
-    compare_random_check = compare_random(random_ids, shared_rate_limiter, base_url, version)
+    release_files = [process_file(file_path, version) for file_path in json_files]
+    client = ApiClient(max_requests)
+    journal = CheckpointJournal(checkpoint_file or journal_path(release_tests_outfile), resume)
+    try:
+        with open(release_tests_outfile, 'w') as tests_out, open(jsondiff_outfile, 'w') as diff_out:
+            tests_writer = csv.writer(tests_out)
+            tests_writer.writerow(["ror_id", "org_name", "retrieve_check", "compare_check", "search_name_api_check"])
+            diff_writer = csv.writer(diff_out)
+            diff_writer.writerow(["ror_id", "diff"])
+
+            def write_result(row, diff):
+                tests_writer.writerow(row)
+                if diff:
+                    diff_writer.writerow([row[0], diff])
+
+            # Results from an earlier run are written out again so the output
+            # files are complete
+            for ror_id, _, _ in release_files:
+                if ror_id in journal:
+                    write_result(*journal.results[ror_id])
+            pending = {ror_id: (org_name, json_file) for ror_id, org_name, json_file in release_files
+                       if ror_id not in journal}
+            if journal:
+                logging.info(f"Resuming with {len(journal)} records already checked.")
+            checked = 0
+            to_check = pending
+            for attempt in range(RETRY_ROUNDS + 1):
+                retry = {}
+                tasks = [asyncio.create_task(check_release_file(client, ror_id, org_name, json_file, base_url, version))
+                         for ror_id, (org_name, json_file) in to_check.items()]
+                for task in asyncio.as_completed(tasks):
+                    row, diff, transient = await task
+                    ror_id = row[0]
+                    if transient and attempt < RETRY_ROUNDS:
+                        retry[ror_id] = to_check[ror_id]
+                        continue
+                    write_result(row, diff)
+                    # Records that still fail are left out of the journal so a
+                    # resumed run checks them again
+                    if not transient:
+                        journal.record(ror_id, [row, diff])
+                    checked += 1
+                    if checked % 100 == 0:
+                        logging.info(f"Processed {total_files - len(pending) + checked} out of {total_files} files.")
+                if not retry:
+                    break
+                logging.warning(f"Retrying {len(retry)} records after transient API errors...")
+                await asyncio.sleep(RETRY_DELAY)
+                to_check = retry
+        logging.info(f"Processed {total_files} files, {len(journal)} recorded in checkpoint {journal.path}.")
+
+        logging.info("Reading all ROR IDs for unprocessed IDs and random selection...")
+        with open(all_ror_ids_file) as f_in:
+            all_ror_ids = set(re.sub('https://ror.org/', '', line.strip()).lower() for line in f_in)
+        unprocessed_ids = list(all_ror_ids - set(ror_id.lower() for ror_id, _, _ in release_files))
+
+        logging.info(f"Performing random comparison checks on up to {min(MAX_COMPARE_SAMPLE, len(unprocessed_ids))} of {len(unprocessed_ids)} unprocessed IDs...")
+        validators = load_validators(validators_file)
+        # The sample is seeded by the release, so a rerun for the same release
+        # compares the same records and their saved validators can be reused
+        release_seed = content_hash(sorted(ror_id for ror_id, _, _ in release_files))
+        compare_random_check, compare_random_errors = await compare_random(
+            client, unprocessed_ids, base_url, version, validators, release_seed, max_change_rate)
+        save_validators(validators_file, validators)
+    finally:
+        journal.close()
+        client.close()
     if compare_random_check:
         logging.warning(f"The following IDs have changed: {compare_random_check}. Investigate integrity of ROR dataset.")
+    elif compare_random_errors:
+        logging.warning("No changes detected in random comparison checks, but some records could not be compared.")
     else:
         logging.info("No changes detected in random comparison checks.")
 
@@ -230,26 +378,40 @@ def parse_arguments():
                         'prd', 'stg'], default='prd', help='Choose between production and staging environments')
     parser.add_argument('-v', '--version', type=int, choices=[1, 2], default=2,
                         help='API version to use (1 or 2)')
+    parser.add_argument('-u', '--api_url',
+                        help='Base API URL to test, e.g. a local test server. Overrides --environment')
+    parser.add_argument('-w', '--max_requests', type=int, default=MAX_PARALLEL_REQUESTS,
+                        help=f'Maximum number of concurrent API requests. Default is {MAX_PARALLEL_REQUESTS}')
+    parser.add_argument('-c', '--checkpoint_file',
+                        help='Path to the checkpoint journal. Default is <release tests outfile>.checkpoint.jsonl')
+    parser.add_argument('-k', '--validators_file', default='compare_validators.json',
+                        help='Path to the cache of ETag/Last-Modified validators and record hashes used by the random comparison')
+    parser.add_argument('-m', '--max_change_rate', type=float, default=MAX_CHANGE_RATE,
+                        help=f'Random comparison samples until the rate of changed records is known to be below or above this rate. Default is {MAX_CHANGE_RATE}')
+    parser.add_argument('--resume', action='store_true',
+                        help='Resume from the checkpoint journal, skipping records already checked')
     return parser.parse_args()
 
 
 def main():
     start_time = time.time()
     args = parse_arguments()
-    shared_rate_limiter = init_shared_rate_limiter()
     base_domain = "api.ror.org" if args.environment == 'prd' else "api.staging.ror.org"
-    base_url = f"https://{base_domain}"
-    check_release_files(
+    base_url = args.api_url or f"https://{base_domain}"
+    asyncio.run(check_release_files(
         args.release_directory,
         args.all_ror_ids_file,
         args.release_tests_outfile,
         args.jsondiff_outfile,
-        shared_rate_limiter,
         base_url,
-        args.version
-    )
-
-    end_time = time.time
+        args.version,
+        args.max_requests,
+        args.checkpoint_file,
+        args.resume,
+        args.validators_file,
+        args.max_change_rate
+    ))
+    logging.info(f"Finished in {time.time() - start_time:.1f} seconds.")
 
 
 if __name__ == '__main__':
@@ -4,22 +4,7 @@ import glob
 import argparse
 from string import printable
 
-
-def flatten_json(j):
-    flattened = {}
-    def flatten(obj, name=''):
-        if type(obj) is dict:
-            for item in obj:
-                flatten(obj[item], name + item + '_')
-        elif type(obj) is list:
-            i = 0
-            for item in obj:
-                flatten(item, name + str(i) + '_')
-                i += 1
-        else:
-            flattened[name[:-1]] = obj
-    flatten(j)
-    return flattened
+from curation_validation.core.projection import RecordProjection
 
 
 def check_unprintable(input_dir, output_file):
@@ -31,7 +16,7 @@ def check_unprintable(input_dir, output_file):
         with open(file, 'r+') as f_in:
             json_file = json.load(f_in)
         ror_id = json_file['id']
-        flattened = flatten_json(json_file)
+        flattened = RecordProjection(json_file).flattened
         for key, value in flattened.items():
             if value is not None:
                 if any([ch.isprintable() == False for ch in str(value)]):
@@ -0,0 +1,49 @@
+import time
+import contextvars
+from contextlib import contextmanager
+
+# Seconds allowed for triaging one issue
+ISSUE_TIMEOUT = 300
+
+_deadline = contextvars.ContextVar('deadline', default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+@contextmanager
+def time_limit(seconds):
+    # Sets a deadline for the work done in this context, including work in
+    # threads started with submit(). Unlike SIGALRM this works in any thread,
+    # so issues can be triaged concurrently, but it is cooperative: requests
+    # and waits are cut short at the deadline (see remaining()), and callers
+    # check it with check_deadline() before acting on a result.
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining(default=None):
+    deadline = _deadline.get()
+    if deadline is None:
+        return default
+    left = deadline - time.monotonic()
+    return max(left, 0) if default is None else max(min(left, default), 0)
+
+
+def check_deadline():
+    if remaining() == 0:
+        raise DeadlineExceeded("Process timed out")
+
+
+def submit(executor, func, *args):
+    # Runs func in the executor with the caller's deadline
+    context = contextvars.copy_context()
+    return executor.submit(context.run, func, *args)
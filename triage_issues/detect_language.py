@@ -1,17 +1,139 @@
-import fasttext
+import os
+import csv
+import threading
 
+# Optional fastText first pass, used when the package and the lid.176.bin model
+# are available. Its prediction is kept only above FASTTEXT_MIN_CONFIDENCE;
+# anything less certain goes to Lingua.
+FASTTEXT_MODEL_PATH = os.environ.get('TRIAGE_FASTTEXT_MODEL', 'lid.176.bin')
+FASTTEXT_MIN_CONFIDENCE = 0.9
+# CSV from update_data_dump/add_languages_to_data_dump/most_common_languages,
+# mapping country codes to the languages common in ROR records for that
+# country. When set, detection for an issue is limited to its country's
+# languages plus English, which many organizations use whatever the country.
+LANGUAGES_FILE = os.environ.get('TRIAGE_LANGUAGES_FILE')
+# Restricted detectors kept for reuse across the issues of a run
+MAX_DETECTORS = 16
 
-MODEL_PATH = "lid.176.bin"
-# Suppress erroneous error message on loading model that Meta never fixed
-# https://github.com/facebookresearch/fastText/issues/1067
-fasttext.FastText.eprint = lambda x: None
-detector = fasttext.load_model(MODEL_PATH)
+_lock = threading.Lock()
+_fasttext_model = None
+_fasttext_loaded = False
+_lingua_detectors = {}
+_lingua_available = None
+_common_languages = None
 
 
-def detect_language(label):
+def load_common_languages(file_path):
+    common_languages = {}
+    with open(file_path, 'r', encoding='utf-8') as file:
+        reader = csv.DictReader(file)
+        for row in reader:
+            country, languages = row['Country'], row['Most Common Languages']
+            common_languages[country.strip().upper()] = [lang.strip()
+                                                         for lang in languages.split(';') if lang.strip()]
+    return common_languages
+
+
+def country_languages(country_code):
+    global _common_languages
+    if not LANGUAGES_FILE or not country_code:
+        return None
+    with _lock:
+        if _common_languages is None:
+            try:
+                _common_languages = load_common_languages(LANGUAGES_FILE)
+            except (OSError, KeyError) as e:
+                print(f"Could not load languages file {LANGUAGES_FILE}: {e}. Detecting from all languages.")
+                _common_languages = {}
+    languages = _common_languages.get(country_code.strip().upper())
+    if not languages:
+        return None
+    return languages if 'en' in languages else languages + ['en']
+
+
+def get_fasttext_model():
+    global _fasttext_model, _fasttext_loaded
+    with _lock:
+        if not _fasttext_loaded:
+            _fasttext_loaded = True
+            if os.path.exists(FASTTEXT_MODEL_PATH):
+                try:
+                    import fasttext
+                    # Suppress erroneous error message on loading model that Meta never fixed
+                    # https://github.com/facebookresearch/fastText/issues/1067
+                    fasttext.FastText.eprint = lambda x: None
+                    _fasttext_model = fasttext.load_model(FASTTEXT_MODEL_PATH)
+                except Exception as e:
+                    print(f"fastText model not loaded: {e}. Using Lingua only.")
+        return _fasttext_model
+
+
+def get_lingua_detector(languages=None):
+    # Built on first use rather than at import, so runs that never detect a
+    # language do not pay for it. Lingua loads each language's models as it
+    # first needs them, so a detector limited to a few languages is far
+    # smaller than one over all of them.
+    global _lingua_available
+    key = frozenset(languages) if languages else None
+    with _lock:
+        if key in _lingua_detectors:
+            return _lingua_detectors[key]
+        if _lingua_available is False:
+            return None
+        try:
+            from lingua import Language, LanguageDetectorBuilder
+            _lingua_available = True
+            if key is None:
+                detector = LanguageDetectorBuilder.from_all_spoken_languages().build()
+            else:
+                supported = {language.iso_code_639_1.name.lower(): language for language in Language.all()}
+                selected = [supported[code] for code in sorted(key) if code in supported]
+                if len(selected) < 2:
+                    return None
+                detector = LanguageDetectorBuilder.from_languages(*selected).build()
+        except Exception as e:
+            print(f"CRITICAL: Failed to initialize Lingua Language Detector: {e}. Language detection will not work.")
+            _lingua_available = False
+            return None
+        if len(_lingua_detectors) >= MAX_DETECTORS:
+            _lingua_detectors.pop(next(cached for cached in _lingua_detectors if cached is not None), None)
+        _lingua_detectors[key] = detector
+        return detector
+
+
+def detect_language_fasttext(label):
+    model = get_fasttext_model()
+    if model is None:
+        return None
     try:
-        predictions = detector.predict(label, k=1)
-        detected_language = predictions[0][0].split("__label__")[1]
-        return detected_language
-    except Exception as e:
+        labels, scores = model.predict(label.replace('\n', ' '), k=1)
+        return labels[0].split("__label__")[1], float(scores[0])
+    except Exception:
+        return None
+
+
+def detect_language_lingua(label, languages=None):
+    detector = get_lingua_detector(languages)
+    if detector is None and languages:
+        # Fewer than two of the languages are supported by Lingua
+        detector = get_lingua_detector()
+    if detector is None:
         return None
+    try:
+        detected_language = detector.detect_language_of(label)
+        if detected_language:
+            return detected_language.iso_code_639_1.name.lower()
+    except Exception as e:
+        print(f"Error during Lingua language detection for '{label}': {e}.")
+    return None
+
+
+def detect_language(label, languages=None):
+    # Returns an ISO 639-1 code, or None if no language could be detected.
+    # With languages given, only those languages are considered.
+    prediction = detect_language_fasttext(label)
+    if prediction:
+        language, confidence = prediction
+        if confidence >= FASTTEXT_MIN_CONFIDENCE and (not languages or language in languages):
+            return language
+    return detect_language_lingua(label, languages)
@@ -0,0 +1,96 @@
+import threading
+import requests
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from deadline import remaining
+
+USER_AGENT = 'ROROrgTriageBot/1.0 (ror.org, mailto:support@ror.org)'
+# (connect, read) seconds for every request
+TIMEOUT = (5, 20)
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+BACKOFF_JITTER = 0.5
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+# Maximum concurrent requests per host, so the triage fan-out does not trip
+# a source's rate limit
+HOST_LIMITS = {
+    'api.ror.org': 4,
+    'www.wikidata.org': 4,
+    'api.openalex.org': 4,
+    'isni.ringgold.com': 2,
+    'api.crossref.org': 2,
+    'pub.orcid.org': 2,
+    'api.geonames.org': 2
+}
+DEFAULT_HOST_LIMIT = 4
+
+_lock = threading.Lock()
+_session = None
+_host_semaphores = {}
+
+
+class DeadlineRetry(Retry):
+    # Stops retrying, and shortens backoff, once the caller's deadline passes
+    def is_exhausted(self):
+        return remaining() == 0 or super().is_exhausted()
+
+    def get_backoff_time(self):
+        return remaining(super().get_backoff_time())
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else remaining(retry_after)
+
+
+def get_session():
+    # One session for the process: connections to each host are kept alive and
+    # reused, and 429/5xx responses and connection errors are retried with
+    # jittered exponential backoff (honouring Retry-After).
+    global _session
+    with _lock:
+        if _session is None:
+            retries = DeadlineRetry(total=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR, backoff_jitter=BACKOFF_JITTER,
+                                    status_forcelist=RETRY_STATUSES, raise_on_status=False)
+            adapter = HTTPAdapter(pool_connections=len(HOST_LIMITS) + 4,
+                                  pool_maxsize=max(HOST_LIMITS.values()), max_retries=retries)
+            session = requests.Session()
+            session.headers['User-Agent'] = USER_AGENT
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+
+def _host_semaphore(host):
+    with _lock:
+        if host not in _host_semaphores:
+            _host_semaphores[host] = threading.BoundedSemaphore(HOST_LIMITS.get(host, DEFAULT_HOST_LIMIT))
+        return _host_semaphores[host]
+
+
+def clip_timeout(timeout, left):
+    if isinstance(timeout, tuple):
+        return tuple(min(value, left) for value in timeout)
+    return min(timeout, left)
+
+
+def http_get(url, params=None, headers=None, timeout=TIMEOUT, **kwargs):
+    # Within a deadline (see deadline.time_limit), the wait for a connection
+    # slot and the request itself are cut short when the deadline passes
+    session = get_session()
+    semaphore = _host_semaphore(urlparse(url).hostname)
+    left = remaining()
+    if left is None:
+        semaphore.acquire()
+    elif left == 0 or not semaphore.acquire(timeout=left):
+        raise requests.exceptions.Timeout(f"Deadline passed before request to {url}")
+    try:
+        if left is not None:
+            left = remaining()
+            if left == 0:
+                raise requests.exceptions.Timeout(f"Deadline passed before request to {url}")
+            timeout = clip_timeout(timeout, left)
+        return session.get(url, params=params, headers=headers, timeout=timeout, **kwargs)
+    finally:
+        semaphore.release()
@@ -0,0 +1,167 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+import functools
+import contextvars
+from collections import defaultdict
+
+# Set TRIAGE_CACHE_PATH to an empty string to turn the cache off. In a GitHub
+# Action, restore and save this file with actions/cache to share it between
+# runs.
+CACHE_PATH = os.environ.get('TRIAGE_CACHE_PATH', 'triage_cache.sqlite')
+MAX_ENTRIES = int(os.environ.get('TRIAGE_CACHE_MAX_ENTRIES', '20000'))
+DAY = 24 * 60 * 60
+# How long a lookup result stays fresh, by source
+SOURCE_TTLS = {
+    'wikidata': 3 * DAY,
+    'wikidata_claims': 14 * DAY,
+    'isni': 30 * DAY,
+    'funder_registry': 30 * DAY,
+    'orcid': 7 * DAY,
+    'openalex': 7 * DAY,
+    'geonames': 90 * DAY
+}
+DEFAULT_TTL = DAY
+
+
+def normalize_query(value):
+    # Whitespace only: some results echo the query, so case is kept
+    if isinstance(value, str):
+        return re.sub(r'\s+', ' ', value).strip()
+    if isinstance(value, (list, tuple)):
+        return [normalize_query(item) for item in value]
+    return value
+
+
+class LookupCache:
+    # SQLite table of lookup results keyed by (source, normalized query). Rows
+    # past their source's TTL are treated as misses, and the least recently
+    # used rows are evicted once the table holds more than max_entries.
+    def __init__(self, path, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.stats = defaultdict(lambda: {'hits': 0, 'misses': 0})
+        self._lock = threading.Lock()
+        self._connection = None
+        self._size = 0
+
+    def _connect(self):
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS lookups (source TEXT, query TEXT, value TEXT, '
+                               'created REAL, accessed REAL, PRIMARY KEY (source, query))')
+            connection.execute('CREATE INDEX IF NOT EXISTS lookups_accessed ON lookups (accessed)')
+            self._size = connection.execute('SELECT COUNT(*) FROM lookups').fetchone()[0]
+            self._connection = connection
+        return self._connection
+
+    def get(self, source, query):
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute('SELECT value, created FROM lookups WHERE source = ? AND query = ?',
+                                     (source, query)).fetchone()
+            if row is None or now - row[1] > SOURCE_TTLS.get(source, DEFAULT_TTL):
+                self.stats[source]['misses'] += 1
+                return False, None
+            connection.execute('UPDATE lookups SET accessed = ? WHERE source = ? AND query = ?',
+                               (now, source, query))
+            connection.commit()
+            self.stats[source]['hits'] += 1
+        stored = json.loads(row[0])
+        value = stored['value']
+        return True, tuple(value) if stored['tuple'] else value
+
+    def put(self, source, query, value):
+        now = time.time()
+        stored = json.dumps({'tuple': isinstance(value, tuple), 'value': value})
+        with self._lock:
+            connection = self._connect()
+            replaced = connection.execute('SELECT 1 FROM lookups WHERE source = ? AND query = ?',
+                                          (source, query)).fetchone()
+            connection.execute('INSERT OR REPLACE INTO lookups VALUES (?, ?, ?, ?, ?)',
+                               (source, query, stored, now, now))
+            if not replaced:
+                self._size += 1
+            if self._size > self.max_entries:
+                # Evict the least recently used tenth, so this runs rarely
+                evict = self._size - self.max_entries + self.max_entries // 10
+                connection.execute('DELETE FROM lookups WHERE rowid IN '
+                                   '(SELECT rowid FROM lookups ORDER BY accessed LIMIT ?)', (evict,))
+                self._size = connection.execute('SELECT COUNT(*) FROM lookups').fetchone()[0]
+            connection.commit()
+
+    def log_stats(self):
+        if not self.stats:
+            return
+        hits = sum(counts['hits'] for counts in self.stats.values())
+        misses = sum(counts['misses'] for counts in self.stats.values())
+        per_source = ', '.join(f"{source} {counts['hits']}/{counts['hits'] + counts['misses']}"
+                               for source, counts in sorted(self.stats.items()))
+        print(f"Lookup cache {self.path}: {hits} hits, {misses} misses ({per_source}), {self._size} entries")
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+_cache = LookupCache(CACHE_PATH) if CACHE_PATH else None
+_failures = contextvars.ContextVar('lookup_failures', default=None)
+
+
+def note_lookup_failure():
+    # Called when a lookup swallows a failed request, so that a result built
+    # without it (often an empty one) is not cached
+    failures = _failures.get()
+    if failures is not None:
+        failures.append(True)
+
+
+def cached(source):
+    # Caches a lookup's return value by its normalized arguments. Exceptions
+    # pass through uncached, so apply this beneath catch_requests_exceptions
+    # to keep failed lookups out of the cache. Results of lookups that caught
+    # a failed request themselves (see note_lookup_failure) are not cached
+    # either.
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args):
+            if _cache is None:
+                return func(*args)
+            query = json.dumps(normalize_query(list(args)), ensure_ascii=False)
+            try:
+                hit, value = _cache.get(source, query)
+            except sqlite3.Error as e:
+                print(f"Lookup cache read failed for {source}: {e}")
+                return func(*args)
+            if hit:
+                return value
+            failures = []
+            token = _failures.set(failures)
+            try:
+                value = func(*args)
+            finally:
+                _failures.reset(token)
+            if failures:
+                # Also keeps an enclosing cached lookup from storing its result
+                note_lookup_failure()
+                print(f"Lookup cache: not storing {source} result, a request failed")
+                return value
+            try:
+                _cache.put(source, query, value)
+            except (sqlite3.Error, TypeError) as e:
+                print(f"Lookup cache write failed for {source}: {e}")
+            return value
+        return wrapper
+    return decorator
+
+
+def log_cache_stats():
+    if _cache is not None:
+        _cache.log_stats()
@@ -0,0 +1,116 @@
+import os
+import json
+import time
+import zipfile
+import threading
+from collections import defaultdict
+from rapidfuzz import process, fuzz
+
+# ROR data dump (the release ZIP or its _schema_v2.json file). When set, ROR
+# matching in triage is answered from this dump instead of the ROR API. Use
+# the latest release, since records created after it will not be found.
+ROR_DUMP_PATH = os.environ.get('TRIAGE_ROR_DUMP')
+# Lower than the 90 triage requires, as triage re-scores candidates with
+# thefuzz, which rounds
+NAME_SCORE_CUTOFF = 89
+
+_lock = threading.Lock()
+_index = None
+_index_loaded = False
+
+
+def load_dump(dump_path):
+    if dump_path.endswith('.zip'):
+        with zipfile.ZipFile(dump_path, 'r') as zip_ref:
+            json_files = [f for f in zip_ref.namelist() if f.endswith('_schema_v2.json')]
+            if not json_files:
+                raise ValueError("No '_schema_v2.json' file found in the ZIP archive")
+            with zip_ref.open(json_files[0]) as json_file:
+                return json.load(json_file)
+    with open(dump_path, 'r', encoding='utf8') as json_file:
+        return json.load(json_file)
+
+
+def slim_record(record):
+    # Only the fields triage reads, to keep the index small
+    return {
+        'id': record.get('id'),
+        'names': [{'value': name.get('value'), 'types': name.get('types', [])}
+                  for name in record.get('names', []) if name.get('value')],
+        'links': record.get('links', []),
+        'domains': record.get('domains', []),
+        'locations': [{'geonames_details': location.get('geonames_details', {})}
+                      for location in record.get('locations', [])],
+        'external_ids': record.get('external_ids', [])
+    }
+
+
+class RorIndex:
+    # In-memory lookups over a ROR dump, keyed the same way triage compares
+    # API results: normalized names, website hosts and domains, and external
+    # IDs. Withdrawn records are left out, as in API searches.
+    def __init__(self, records, normalize_name, normalize_host, normalize_external_id):
+        self.organizations = []
+        self.names = []
+        self.name_organizations = []
+        self.hosts = defaultdict(list)
+        self.external_ids = defaultdict(list)
+        for record in records:
+            if record.get('status') == 'withdrawn':
+                continue
+            position = len(self.organizations)
+            organization = slim_record(record)
+            self.organizations.append(organization)
+            for name in {normalize_name(name['value']) for name in organization['names']}:
+                if name:
+                    self.names.append(name)
+                    self.name_organizations.append(position)
+            hosts = {normalize_host(link.get('value') if isinstance(link, dict) else link)
+                     for link in organization['links']}
+            hosts.update(normalize_host(domain) for domain in organization['domains'])
+            for host in hosts:
+                if host:
+                    self.hosts[host].append(position)
+            external_ids = set()
+            for external_id in organization['external_ids']:
+                values = external_id.get('all', [])
+                external_ids.update(values if isinstance(values, list) else [values])
+                if external_id.get('preferred'):
+                    external_ids.add(external_id['preferred'])
+            for external_id in external_ids:
+                normalized_id = normalize_external_id(external_id)
+                if normalized_id:
+                    self.external_ids[normalized_id].append(position)
+
+    def _organizations(self, positions):
+        return [self.organizations[position] for position in sorted(set(positions))]
+
+    def search_name(self, normalized_name):
+        matches = process.extract(normalized_name, self.names, scorer=fuzz.ratio,
+                                  score_cutoff=NAME_SCORE_CUTOFF, limit=None)
+        return self._organizations(self.name_organizations[i] for _, _, i in matches)
+
+    def search_host(self, normalized_host):
+        return self._organizations(self.hosts.get(normalized_host, []))
+
+    def search_external_id(self, normalized_external_id):
+        return self._organizations(self.external_ids.get(normalized_external_id, []))
+
+
+def get_ror_index(normalize_name, normalize_host, normalize_external_id):
+    # Loaded on first use and shared by every issue in the run. Returns None
+    # when no dump is configured or it cannot be read, so callers fall back
+    # to the ROR API.
+    global _index, _index_loaded
+    with _lock:
+        if not _index_loaded and ROR_DUMP_PATH:
+            _index_loaded = True
+            start = time.monotonic()
+            try:
+                _index = RorIndex(load_dump(ROR_DUMP_PATH), normalize_name,
+                                  normalize_host, normalize_external_id)
+                print(f"Loaded ROR index from {ROR_DUMP_PATH}: {len(_index.organizations)} records "
+                      f"in {time.monotonic() - start:.1f} seconds")
+            except (OSError, ValueError, zipfile.BadZipFile) as e:
+                print(f"Could not load ROR dump {ROR_DUMP_PATH}: {e}. Using the ROR API.")
+        return _index
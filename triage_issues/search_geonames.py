@@ -1,5 +1,7 @@
 import requests
 import json
+from http_client import http_get
+from lookup_cache import cached
 
 
 def catch_requests_exceptions(func):
@@ -12,6 +14,7 @@ def catch_requests_exceptions(func):
 
 
 @catch_requests_exceptions
+@cached('geonames')
 def query_geonames_api(place_name, username='roradmin'):
     url = "http://api.geonames.org/searchJSON"
     params = {
@@ -19,8 +22,13 @@ def query_geonames_api(place_name, username='roradmin'):
         'maxRows': 10,
         'username': username
     }
-    response = requests.get(url, params=params)
-    return response.json()
+    response = http_get(url, params=params)
+    response.raise_for_status()
+    api_response = response.json()
+    if 'status' in api_response:
+        # Error payload, e.g. the hourly limit being exceeded; not cached
+        raise requests.exceptions.RequestException(api_response['status'].get('message'))
+    return api_response
 
 
 def parse_response(response):
@@ -30,6 +38,13 @@ def parse_response(response):
     return best_match["name"], best_match["geonameId"]
 
 
+def geonames_country_code(place_name):
+    response = query_geonames_api(place_name)
+    if response and response.get("geonames"):
+        return response["geonames"][0].get("countryCode")
+    return None
+
+
 def search_geonames(place_name):
     response = query_geonames_api(place_name)
     if response:
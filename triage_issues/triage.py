@@ -1,25 +1,38 @@
 import os
 import re
+import time
 import string
 import itertools
 import requests
 from urllib.parse import urlparse
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from github import Github
 from thefuzz import fuzz
 from bs4 import BeautifulSoup
-from lingua import LanguageDetectorBuilder, Language
-from search_geonames import search_geonames
+from search_geonames import search_geonames, geonames_country_code
+from detect_language import detect_language, country_languages, LANGUAGES_FILE
+from http_client import http_get
+from lookup_cache import cached, note_lookup_failure
+from deadline import remaining, submit
+from ror_index import get_ror_index
 
 USER = os.environ.get('GITHUB_USER')
 TOKEN = os.environ.get('GITHUB_TOKEN')
 
-try:
-    LINGUA_DETECTOR = LanguageDetectorBuilder.from_all_spoken_languages().build()
-except Exception as e:
-    print(f"CRITICAL: Failed to initialize Lingua Language Detector: {e}. Language detection will not work.")
-    LINGUA_DETECTOR = None
-
+# Seconds each source may take, counted from the start of the fan-out. Sources
+# that make several requests get longer than a single request's timeout.
+SOURCE_DEADLINES = {
+    'Wikidata': 60,
+    'ISNI': 45,
+    'Funder Registry': 30,
+    'OpenAlex': 120,
+    'ORCID': 45,
+    'ROR': 60,
+    'ROR by URL': 90,
+    'ROR by External ID': 60,
+    'Geonames': 30
+}
 
 def catch_requests_exceptions(func):
     def wrapper(*args, **kwargs):
@@ -27,6 +40,7 @@ def catch_requests_exceptions(func):
             return func(*args, **kwargs)
         except requests.exceptions.RequestException as e:
             print(f"DEBUG: RequestException in {func.__name__}: {e}")
+            note_lookup_failure()
             return None
     return wrapper
 
@@ -46,9 +60,12 @@ def format_funder_id_with_hyperlink(funder_id):
     return f"[{funder_id}](https://api.crossref.org/funders/{funder_id})"
 
 
+PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)
+
+
 def normalize_text(text):
     text = re.sub('-', ' ', text)
-    return ''.join(ch for ch in re.sub(r'[^\w\s-]', '', text.lower()) if ch not in set(string.punctuation))
+    return re.sub(r'[^\w\s-]', '', text.lower()).translate(PUNCTUATION_TABLE)
 
 
 def normalize_country_value(country):
@@ -134,7 +151,7 @@ def escape_for_advanced_query(value):
 def perform_ror_advanced_query(query_string, headers, page=1):
     base_url = "https://api.ror.org/v2/organizations"
     params = {'query.advanced': query_string, 'page': page}
-    response = requests.get(base_url, params=params, headers=headers, timeout=10)
+    response = http_get(base_url, params=params, headers=headers)
     response.raise_for_status()
     api_response = response.json()
     return api_response.get('items', []) or []
@@ -158,42 +175,30 @@ def get_display_name_for_organization(organization):
 
 
 @catch_requests_exceptions
-def search_wikidata(all_names):
+@cached('wikidata')
+def search_wikidata(all_names, languages=None):
     best_match_ratio = 0
     wikidata_id_match = None
     wikidata_label_match = None
 
-    if LINGUA_DETECTOR is None:
-        print(
-            "Lingua detector not available. Skipping language detection in search_wikidata.")
-
     for name in all_names:
         if not name:
             continue
 
-        language_code_for_api = 'en'
-        if LINGUA_DETECTOR:
-            try:
-                detected_language_obj = LINGUA_DETECTOR.detect_language_of(
-                    name)
-                if detected_language_obj:
-                    iso_code_obj = detected_language_obj.iso_code_639_1
-                    if iso_code_obj and hasattr(iso_code_obj, 'name'):
-                        language_code_for_api = iso_code_obj.name.lower()
-            except Exception as e:
-                print(f"Error during Lingua language detection for '{name}': {e}. Defaulting to 'en'.")
+        language_code_for_api = detect_language(name, languages) or 'en'
 
         params = {"action": "wbsearchentities", "search": name,
                   "language": language_code_for_api, "format": "json", "uselang": language_code_for_api}
         headers = {
             'User-Agent': 'ROROrgTriageBot/1.0 (ror.org, mailto:support@ror.org)'}
         try:
-            r = requests.get("https://www.wikidata.org/w/api.php",
-                             params=params, headers=headers, timeout=10)
+            r = http_get("https://www.wikidata.org/w/api.php",
+                         params=params, headers=headers)
             r.raise_for_status()
             api_response = r.json()
         except requests.exceptions.RequestException as e:
             print(f"Wikidata API request failed for name '{name}': {e}")
+            note_lookup_failure()
             continue
 
         search_results = api_response.get('search', [])
@@ -224,8 +229,10 @@ def get_location_entity(wikidata_id):
     params = {'ids': wikidata_id, 'format': 'json'}
     headers = {
         'User-Agent': 'ROROrgTriageBot/1.0 (ror.org, mailto:support@ror.org)'}
-    api_response = requests.get(
-        url, params=params, headers=headers, timeout=10).json()
+    response = http_get(
+        url, params=params, headers=headers)
+    response.raise_for_status()
+    api_response = response.json()
 
     entity = api_response.get('entities', {}).get(wikidata_id)
     if not entity:
@@ -259,8 +266,10 @@ def get_wikipedia_url(wikidata_id):
     params = {'props': 'sitelinks/urls', 'ids': wikidata_id, 'format': 'json'}
     headers = {
         'User-Agent': 'ROROrgTriageBot/1.0 (ror.org, mailto:support@ror.org)'}
-    api_response = requests.get(
-        url, params=params, headers=headers, timeout=10).json()
+    response = http_get(
+        url, params=params, headers=headers)
+    response.raise_for_status()
+    api_response = response.json()
 
     entity = api_response.get('entities', {}).get(wikidata_id)
     if not entity:
@@ -283,13 +292,16 @@ def get_wikipedia_url(wikidata_id):
 
 
 @catch_requests_exceptions
+@cached('wikidata_claims')
 def get_wikidata_claims(org_name, wikidata_id, match_ratio):
     org_metadata = {"Wikidata Name": org_name, "Wikidata ID": wikidata_id,
                     "Wikidata name match ratio": match_ratio}
     url = f"https://www.wikidata.org/w/api.php?action=wbgetentities&ids={wikidata_id}&format=json"
     headers = {
         'User-Agent': 'ROROrgTriageBot/1.0 (ror.org, mailto:support@ror.org)'}
-    api_response = requests.get(url, headers=headers, timeout=10).json()
+    response = http_get(url, headers=headers)
+    response.raise_for_status()
+    api_response = response.json()
 
     if 'entities' not in api_response or wikidata_id not in api_response['entities']:
         return org_metadata
@@ -352,6 +364,10 @@ def get_wikidata_claims(org_name, wikidata_id, match_ratio):
     return {k: v for k, v in org_metadata.items() if v is not None}
 
 
+def load_ror_index():
+    return get_ror_index(normalize_text, normalize_url_host, normalize_external_id_for_comparison)
+
+
 @catch_requests_exceptions
 def search_ror(all_names, record):
     headers = {
@@ -374,41 +390,50 @@ def search_ror(all_names, record):
     all_matches = set()
     match_outputs = []
 
+    ror_index = load_ror_index()
+
     for original_name, normalized_name in unique_names:
-        request_variants = set()
-        request_variants.add(('query', original_name))
-        request_variants.add(('affiliation', original_name))
-        if original_name != normalized_name:
-            request_variants.add(('query', normalized_name))
-            request_variants.add(('affiliation', normalized_name))
-
-        for param_key, param_value in request_variants:
-            params = {param_key: param_value}
-            api_response = requests.get(
-                base_url, params=params, headers=headers, timeout=10).json()
-            results = api_response.get('items', [])
-            for result in results:
-                organization = result.get('organization') or result
-                if not isinstance(organization, dict):
+        if ror_index is not None:
+            results = ror_index.search_name(normalized_name)
+        else:
+            results = []
+            request_variants = set()
+            request_variants.add(('query', original_name))
+            request_variants.add(('affiliation', original_name))
+            if original_name != normalized_name:
+                request_variants.add(('query', normalized_name))
+                request_variants.add(('affiliation', normalized_name))
+
+            for param_key, param_value in request_variants:
+                params = {param_key: param_value}
+                response = http_get(
+                    base_url, params=params, headers=headers)
+                response.raise_for_status()
+                api_response = response.json()
+                results.extend(api_response.get('items', []))
+
+        for result in results:
+            organization = result.get('organization') or result
+            if not isinstance(organization, dict):
+                continue
+            ror_id = organization.get('id')
+            if not ror_id:
+                continue
+            for name_entry in organization.get('names', []):
+                name_value = name_entry.get('value')
+                if not name_value:
                     continue
-                ror_id = organization.get('id')
-                if not ror_id:
+                name_match_ratio = fuzz.ratio(
+                    normalized_name, normalize_text(name_value))
+                if name_match_ratio < 90:
                     continue
-                for name_entry in organization.get('names', []):
-                    name_value = name_entry.get('value')
-                    if not name_value:
-                        continue
-                    name_match_ratio = fuzz.ratio(
-                        normalized_name, normalize_text(name_value))
-                    if name_match_ratio < 90:
-                        continue
 
-                    name_types_list = name_entry.get('types', [])
-                    name_type = name_types_list[0] if name_types_list else 'N/A'
-                    match_tuple = (ror_id, name_value, name_type)
-                    if match_tuple in all_matches:
-                        continue
-                    all_matches.add(match_tuple)
+                name_types_list = name_entry.get('types', [])
+                name_type = name_types_list[0] if name_types_list else 'N/A'
+                match_tuple = (ror_id, name_value, name_type)
+                if match_tuple in all_matches:
+                    continue
+                all_matches.add(match_tuple)
 
     if not all_matches:
         return None
@@ -424,6 +449,7 @@ def search_ror(all_names, record):
 
 
 @catch_requests_exceptions
+@cached('isni')
 def search_isni(all_names):
     headers = {
         'User-Agent': 'ROROrgTriageBot/1.0 (ror.org, mailto:support@ror.org)'}
@@ -435,8 +461,7 @@ def search_isni(all_names):
         query_url = 'https://isni.ringgold.com/api/stable/search'
         params = {'q': normalized_name_query}
 
-        response = requests.get(query_url, params=params,
-                                headers=headers, timeout=15)
+        response = http_get(query_url, params=params, headers=headers)
         response.raise_for_status()
         api_response = response.json()
 
@@ -478,28 +503,7 @@ def search_isni(all_names):
     return None
 
 
-@catch_requests_exceptions
-def search_ror_by_url(record):
-    if not isinstance(record, dict):
-        return None
-
-    website_url = record.get('url')
-    if not website_url:
-        body = record.get('body')
-        if isinstance(body, str):
-            url_match = re.search(r'https?://[^\s)]+', body)
-            if url_match:
-                website_url = url_match.group(0)
-
-    normalized_host = normalize_url_host(website_url)
-    if not normalized_host:
-        return None
-
-    headers = {
-        'User-Agent': 'ROROrgTriageBot/1.0 (ror.org, mailto:support@ror.org)'}
-
-    matches = defaultdict(set)
-
+def query_ror_by_host(normalized_host, headers):
     host_variants = {normalized_host}
     if normalized_host.startswith('www.'):
         host_variants.add(normalized_host[4:])
@@ -523,13 +527,45 @@ def search_ror_by_url(record):
         query_strings.add(f"links.value:\"{escaped_http_full}\"")
         query_strings.add(f"links.value:*{escaped_http_full}*")
 
+    result_sets = []
     for query_string in query_strings:
         try:
-            results = perform_ror_advanced_query(query_string, headers)
+            result_sets.append(perform_ror_advanced_query(query_string, headers))
         except requests.exceptions.RequestException as exc:
             print(f"DEBUG: search_ror_by_url failed for query '{query_string}': {exc}")
-            continue
+            note_lookup_failure()
+    return result_sets
 
+
+@catch_requests_exceptions
+def search_ror_by_url(record):
+    if not isinstance(record, dict):
+        return None
+
+    website_url = record.get('url')
+    if not website_url:
+        body = record.get('body')
+        if isinstance(body, str):
+            url_match = re.search(r'https?://[^\s)]+', body)
+            if url_match:
+                website_url = url_match.group(0)
+
+    normalized_host = normalize_url_host(website_url)
+    if not normalized_host:
+        return None
+
+    headers = {
+        'User-Agent': 'ROROrgTriageBot/1.0 (ror.org, mailto:support@ror.org)'}
+
+    matches = defaultdict(set)
+
+    ror_index = load_ror_index()
+    if ror_index is not None:
+        result_sets = [ror_index.search_host(normalized_host)]
+    else:
+        result_sets = query_ror_by_host(normalized_host, headers)
+
+    for results in result_sets:
         for result in results:
             organization = result.get('organization') or result
             if not isinstance(organization, dict):
@@ -680,17 +716,22 @@ def search_ror_by_external_ids(record):
     normalized_issue_country = normalize_country_value(record.get('country'))
 
     matches = {}
+    ror_index = load_ror_index()
 
     for external_id in extracted_ids:
-        escaped_external_id = escape_for_advanced_query(external_id)
-        query_string = f'(external_ids.all:"{escaped_external_id}" OR external_ids.preferred:"{escaped_external_id}")'
-        try:
-            results = perform_ror_advanced_query(query_string, headers)
-        except requests.exceptions.RequestException as exc:
-            print(f"DEBUG: search_ror_by_external_ids failed for '{external_id}': {exc}")
-            continue
-
         normalized_target_id = normalize_external_id_for_comparison(external_id)
+        if ror_index is not None:
+            results = ror_index.search_external_id(normalized_target_id)
+        else:
+            escaped_external_id = escape_for_advanced_query(external_id)
+            query_string = f'(external_ids.all:"{escaped_external_id}" OR external_ids.preferred:"{escaped_external_id}")'
+            try:
+                results = perform_ror_advanced_query(query_string, headers)
+            except requests.exceptions.RequestException as exc:
+                print(f"DEBUG: search_ror_by_external_ids failed for '{external_id}': {exc}")
+                note_lookup_failure()
+                continue
+
         for result in results:
             organization = result.get('organization') or result
             if not isinstance(organization, dict):
@@ -720,6 +761,7 @@ def search_ror_by_external_ids(record):
 
 
 @catch_requests_exceptions
+@cached('funder_registry')
 def search_funder_registry(all_names):
     headers = {
         'User-Agent': 'ROROrgTriageBot/1.0 (ror.org, mailto:support@ror.org)'}
@@ -728,8 +770,10 @@ def search_funder_registry(all_names):
             continue
         base_url = 'https://api.crossref.org/funders'
         params = {'query': org_name, 'mailto': 'support@ror.org'}
-        api_response = requests.get(
-            base_url, params=params, headers=headers, timeout=10).json()
+        response = http_get(
+            base_url, params=params, headers=headers)
+        response.raise_for_status()
+        api_response = response.json()
         funders = api_response.get('message', {}).get('items', [])
         if funders:
             for funder in funders:
@@ -749,6 +793,7 @@ def search_funder_registry(all_names):
 
 
 @catch_requests_exceptions
+@cached('orcid')
 def search_orcid(all_names):
     headers = {
         'User-Agent': 'ROROrgTriageBot/1.0 (ror.org, mailto:support@ror.org)'}
@@ -757,7 +802,7 @@ def search_orcid(all_names):
             continue
         orcid_urls = []
         search_url = f"https://pub.orcid.org/v3.0/expanded-search/?q=affiliation-org-name:\"{org_name}\"&fl=orcid,current-institution-affiliation-name,past-institution-affiliation-name"
-        response = requests.get(search_url, headers=headers, timeout=15)
+        response = http_get(search_url, headers=headers)
         response.raise_for_status()
         soup = BeautifulSoup(response.text, 'lxml')
         expanded_search = soup.find('expanded-search:expanded-search')
@@ -787,6 +832,34 @@ def generate_substring_permutations(org_name, limit=6):
         return [org_name]
 
 
+def compile_substring_matcher(substrings):
+    # Finds which of many substrings occur in a string with one pass per
+    # distinct length (all word permutations of a name share one length),
+    # looking up each window of the string instead of testing every
+    # substring. Returns the first matching substring in list order, like
+    # testing them one by one.
+    first_index = {}
+    for i, substring in enumerate(substrings):
+        first_index.setdefault(substring, i)
+    lengths = sorted({len(substring) for substring in first_index})
+    # Words in every substring: if one is missing from the text, none match
+    required_words = set.intersection(*(set(substring.split(' ')) for substring in first_index)) - {''}
+
+    def match(text):
+        if any(word not in text for word in required_words):
+            return None
+        best = None
+        for length in lengths:
+            for start in range(len(text) - length + 1):
+                i = first_index.get(text[start:start + length])
+                if i is not None and (best is None or i < best):
+                    best = i
+                    if best == 0:
+                        return substrings[0]
+        return substrings[best] if best is not None else None
+    return match
+
+
 def all_affiliation_usage_to_string(result_dict):
     print(f"DEBUG: all_affiliation_usage_to_string received result_dict: {result_dict}")
     csv_compatible = []
@@ -809,6 +882,7 @@ def all_affiliation_usage_to_string(result_dict):
 
 
 @catch_requests_exceptions
+@cached('openalex')
 def search_openalex(org_name):
     print(f"DEBUG: search_openalex called with org_name: '{org_name}'")
     if not org_name:
@@ -828,8 +902,10 @@ def search_openalex(org_name):
 
     headers = {
         'User-Agent': 'ROROrgTriageBot/1.0 (ror.org, mailto:support@ror.org)'}
-    api_response_json = requests.get(
-        base_url, params=params, headers=headers, timeout=20).json()
+    response = http_get(
+        base_url, params=params, headers=headers)
+    response.raise_for_status()
+    api_response_json = response.json()
 
     results = api_response_json.get('results')
     if not results:
@@ -839,6 +915,7 @@ def search_openalex(org_name):
 
     substring_permutations = generate_substring_permutations(org_name)
     print(f"DEBUG: search_openalex: Substring permutations for '{org_name}': {substring_permutations}")
+    match_substring = compile_substring_matcher(substring_permutations)
     match_dict = defaultdict(set)
     author_count_dict = defaultdict(set)
 
@@ -871,14 +948,13 @@ def search_openalex(org_name):
                     normalized_name, normalized_affiliation)
                 max_ratio = max(partial_ratio, token_set_ratio)
 
-                for substring in substring_permutations:
-                    if substring in normalized_affiliation:
-                        doi_or_id = work.get("doi") or work.get('id')
-                        if doi_or_id:
-                            match_dict[substring].add(doi_or_id)
-                        if author_name:
-                            author_count_dict[substring].add(author_name)
-                        break
+                substring = match_substring(normalized_affiliation)
+                if substring is not None:
+                    doi_or_id = work.get("doi") or work.get('id')
+                    if doi_or_id:
+                        match_dict[substring].add(doi_or_id)
+                    if author_name:
+                        author_count_dict[substring].add(author_name)
 
                 if fuzz.ratio(normalized_name, normalized_affiliation) >= 90:
                     doi_or_id = work.get("doi") or work.get('id')
@@ -969,6 +1045,41 @@ def get_publication_affiliation_usage(record, all_names):
     return final_pub_affiliation_usage, final_author_count_usage, final_affiliation_aliases_str
 
 
+def lookup_wikidata(all_names, location=None):
+    languages = None
+    if LANGUAGES_FILE and location:
+        languages = country_languages(geonames_country_code(location))
+        print(f"DEBUG: lookup_wikidata: Detecting languages of names from {languages or 'all languages'}")
+    wikidata_name, wikidata_id, best_match_ratio = search_wikidata(all_names, languages) or (None, None, None)
+    if wikidata_id:
+        return get_wikidata_claims(wikidata_name, wikidata_id, best_match_ratio)
+    return None
+
+
+def run_sources(sources, deadlines=SOURCE_DEADLINES):
+    # Runs every source lookup at once. Each result is collected until that
+    # source's deadline; a source that misses it is reported as timed out and
+    # left running in the background rather than holding up the others.
+    executor = ThreadPoolExecutor(max_workers=len(sources))
+    start = time.monotonic()
+    futures = {name: submit(executor, lookup) for name, lookup in sources.items()}
+    results = {}
+    timed_out = []
+    for name in sorted(futures, key=lambda name: deadlines[name]):
+        # Also stop waiting at the deadline of the whole issue, if one is set
+        wait = remaining(max(start + deadlines[name] - time.monotonic(), 0))
+        try:
+            results[name] = futures[name].result(timeout=wait)
+        except FuturesTimeoutError:
+            print(f"DEBUG: triage: {name} lookup did not finish within {deadlines[name]} seconds.")
+            timed_out.append(name)
+        except Exception as e:
+            print(f"Error in {name} lookup: {e}")
+    executor.shutdown(wait=False, cancel_futures=True)
+    print(f"DEBUG: triage: Source lookups finished in {time.monotonic() - start:.1f} seconds.")
+    return results, [name for name in sources if name in timed_out]
+
+
 def triage(record):
     print(f"DEBUG: triage: Starting triage for record (keys: {record.keys() if isinstance(record, dict) else type(record)})")
     org_metadata = {}
@@ -999,19 +1110,31 @@ def triage(record):
         print("DEBUG: triage: No organization name or aliases found. Returning early.")
         return org_metadata
 
-    wikidata_name, wikidata_id, best_match_ratio = search_wikidata(all_names)
-    if wikidata_id:
-        wikidata_claims_data = get_wikidata_claims(
-            wikidata_name, wikidata_id, best_match_ratio)
-        if wikidata_claims_data:
-            org_metadata.update(wikidata_claims_data)
+    location = None
+    if record.get('city') and record.get('country'):
+        location = f"{record['city']}, {record['country']}"
+    sources = {
+        'Wikidata': lambda: lookup_wikidata(all_names, location),
+        'ISNI': lambda: search_isni(all_names),
+        'Funder Registry': lambda: search_funder_registry(all_names),
+        'OpenAlex': lambda: get_publication_affiliation_usage(record, all_names),
+        'ORCID': lambda: search_orcid(all_names),
+        'ROR': lambda: search_ror(all_names, record),
+        'ROR by URL': lambda: search_ror_by_url(record),
+        'ROR by External ID': lambda: search_ror_by_external_ids(record)
+    }
+    if location:
+        sources['Geonames'] = lambda: search_geonames(location)
+    results, timed_out = run_sources(sources)
 
-    org_metadata['ISNI'] = search_isni(all_names)
-    org_metadata['Funder ID'] = search_funder_registry(all_names)
+    wikidata_claims_data = results.get('Wikidata')
+    if wikidata_claims_data:
+        org_metadata.update(wikidata_claims_data)
 
-    print("DEBUG: triage: About to call get_publication_affiliation_usage.")
-    affiliation_result = get_publication_affiliation_usage(record, all_names)
-    
+    org_metadata['ISNI'] = results.get('ISNI')
+    org_metadata['Funder ID'] = results.get('Funder Registry')
+
+    affiliation_result = results.get('OpenAlex')
     if isinstance(affiliation_result, tuple) and len(affiliation_result) == 3:
         pub_usage, author_count_usage, potential_als = affiliation_result
         print(f"DEBUG: triage: Received from get_publication_affiliation_usage - pub_usage: '{pub_usage}', author_count_usage: '{author_count_usage}', potential_als: '{potential_als}'")
@@ -1028,21 +1151,14 @@ def triage(record):
         org_metadata['Publication affiliation usage'] = pub_usage
         org_metadata['Potential aliases'] = potential_als
 
-    org_metadata['ORCID affiliation usage'] = search_orcid(all_names)
-    org_metadata['Possible ROR matches'] = search_ror(all_names, record)
-    org_metadata['Possible ROR matches by URL'] = search_ror_by_url(record)
-    org_metadata['Possible ROR matches by External ID'] = search_ror_by_external_ids(record)
-
-    if record.get('city') and record.get('country'):
-        location = f"{record['city']}, {record['country']}"
-        try:
-            geonames_result = search_geonames(location)
-            if geonames_result:
-                org_metadata['Geonames match'] = geonames_result
-        except NameError:
-            print("Warning: search_geonames function is not defined.")
-        except Exception as e:
-            print(f"Error in search_geonames: {e}")
+    org_metadata['ORCID affiliation usage'] = results.get('ORCID')
+    org_metadata['Possible ROR matches'] = results.get('ROR')
+    org_metadata['Possible ROR matches by URL'] = results.get('ROR by URL')
+    org_metadata['Possible ROR matches by External ID'] = results.get('ROR by External ID')
+    if results.get('Geonames'):
+        org_metadata['Geonames match'] = results['Geonames']
+    if timed_out:
+        org_metadata['Sources timed out'] = ', '.join(timed_out)
 
     print(f"DEBUG: triage: org_metadata before final filtering: {org_metadata}")
     filtered_metadata = {k: v for k,
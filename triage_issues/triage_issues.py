@@ -1,29 +1,19 @@
 import os
 import re
 import random
-import signal
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from github import Github
-from triage import triage
-from contextlib import contextmanager
+from triage import triage, load_ror_index
+from lookup_cache import log_cache_stats
+from deadline import time_limit, check_deadline, ISSUE_TIMEOUT
 from encode_updates import encode_update
 from validate_encoding import validate_encoding
 
 TOKEN = os.environ.get('GITHUB_TOKEN')
-
-
-def timeout_handler(signum, frame):
-    raise TimeoutError
-
-
-@contextmanager
-def time_limit(seconds):
-    signal.signal(signal.SIGALRM, timeout_handler)
-    signal.alarm(seconds)
-    try:
-        yield
-    finally:
-        signal.alarm(0)
+# Issues triaged at once. Requests to each source are still limited per host
+# by http_client, whatever the number of workers.
+WORKERS = 4
 
 
 def get_matched_value(pattern, text):
@@ -99,7 +89,38 @@ def add_comment_to_issue(repo_path, issue_number, comment_text):
     print(f'Added comment to issue #{issue_number}')
 
 
-def triage_requests(start_number=None, end_number=None, issue_number=None):
+def triage_new_record(repo_path, record):
+    # Load the ROR dump, if one is configured, before the issue's time starts
+    load_ror_index()
+    try:
+        with time_limit(ISSUE_TIMEOUT):
+            print(f'Triaging new record request - issue #{record["issue_number"]}...')
+            triaged_record = triage(record)
+            check_deadline()
+            triaged_comment = convert_dict_to_comment(triaged_record)
+            if triaged_comment:
+                add_comment_to_issue(
+                    repo_path, record['issue_number'], triaged_comment)
+    except TimeoutError:
+        print(f'Timed out while processing new record issue #{record["issue_number"]}')
+
+
+def triage_update_record(repo_path, record):
+    try:
+        with time_limit(ISSUE_TIMEOUT):
+            print(f'Triaging update record request - issue #{record["issue_number"]}...')
+            update = encode_update(record['ror_id'], record['change'])
+            check_deadline()
+            if update:
+                update = validate_encoding(update)
+                if update:
+                    add_comment_to_issue(
+                        repo_path, record['issue_number'], update)
+    except TimeoutError:
+        print(f'Timed out while processing update record issue #{record["issue_number"]}')
+
+
+def triage_requests(start_number=None, end_number=None, issue_number=None, workers=WORKERS):
     repo_path = 'ror-community/ror-updates'
     label = 'triage needed'
 
@@ -110,30 +131,14 @@ def triage_requests(start_number=None, end_number=None, issue_number=None):
     update_records = [
         record for record in records if record['type'] == 'update']
 
-    for record in new_records:
-        try:
-            with time_limit(300):
-                print(f'Triaging new record request - issue #{record["issue_number"]}...')
-                triaged_record = triage(record)
-                triaged_comment = convert_dict_to_comment(triaged_record)
-                if triaged_comment:
-                    add_comment_to_issue(
-                        repo_path, record['issue_number'], triaged_comment)
-        except TimeoutError:
-            print(f'Timed out while processing new record issue #{record["issue_number"]}')
-
-    for record in update_records:
-        try:
-            with time_limit(300):
-                print(f'Triaging update record request - issue #{record["issue_number"]}...')
-                update = encode_update(record['ror_id'], record['change'])
-                if update:
-                    update = validate_encoding(update)
-                    if update:
-                        add_comment_to_issue(
-                            repo_path, record['issue_number'], update)
-        except TimeoutError:
-            print(f'Timed out while processing update record issue #{record["issue_number"]}')
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(triage_new_record, repo_path, record) for record in new_records]
+        futures += [executor.submit(triage_update_record, repo_path, record) for record in update_records]
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f'Error while processing issue: {e}')
 
 
 def parse_arguments():
@@ -145,6 +150,8 @@ def parse_arguments():
                        help='Specific issue number to process')
     parser.add_argument('-e', '--end', type=int, 
                        help='End issue number (inclusive) when using --start')
+    parser.add_argument('-w', '--workers', type=int, default=WORKERS,
+                       help='Number of issues to triage at once')
     args = parser.parse_args()
     if args.end is not None and args.issue is not None:
         parser.error("--end can only be used with --start")
@@ -156,6 +163,7 @@ def parse_arguments():
 if __name__ == '__main__':
     args = parse_arguments()
     if args.start:
-        triage_requests(start_number=args.start, end_number=args.end)
+        triage_requests(start_number=args.start, end_number=args.end, workers=args.workers)
     elif args.issue:
-        triage_requests(issue_number=args.issue)
\ No newline at end of file
+        triage_requests(issue_number=args.issue, workers=args.workers)
+    log_cache_stats()
\ No newline at end of file
@@ -1,17 +1,20 @@
 import os
 import re
-import signal
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from github import Github, GithubException
-from triage import triage
+from triage import triage, load_ror_index
+from lookup_cache import log_cache_stats
 from encode_updates import encode_update
 from validate_encoding import validate_encoding
-from contextlib import contextmanager
+from deadline import time_limit, check_deadline, ISSUE_TIMEOUT
 from prioritize import prioritize_issue, ensure_labels_exist
 
 TOKEN = os.environ.get('GITHUB_TOKEN')
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
 OPENALEX_API_KEY = os.environ.get('OPENALEX_API_KEY')
 BOT_NAME = "ror-curator-bot"
+# Issues processed at once when triaging a range
+WORKERS = int(os.environ.get('TRIAGE_WORKERS', '4'))
 
 ALL_MAJOR_SECTION_HEADERS = [
     "Summary of request:",
@@ -22,20 +25,6 @@ ALL_MAJOR_SECTION_HEADERS = [
 ]
 
 
-def timeout_handler(signum, frame):
-    raise TimeoutError("Process timed out")
-
-
-@contextmanager
-def time_limit(seconds):
-    signal.signal(signal.SIGALRM, timeout_handler)
-    signal.alarm(seconds)
-    try:
-        yield
-    finally:
-        signal.alarm(0)
-
-
 def get_matched_value(pattern, text):
     if text is None:
         return None
@@ -301,7 +290,9 @@ def process_single_issue(issue_object, repo_path_str, skip_commented=True, opena
     if processed_details:
         try:
             if processed_details['type'] == 'new record':
-                with time_limit(300):
+                # Load the ROR dump, if one is configured, before the issue's time starts
+                load_ror_index()
+                with time_limit(ISSUE_TIMEOUT):
                     print(f'Triaging new record request - issue #{processed_details["issue_number"]}...')
                     triage_input_data = {
                         k: v for k, v in processed_details.items() if k != 'issue_object'}
@@ -310,6 +301,7 @@ def process_single_issue(issue_object, repo_path_str, skip_commented=True, opena
                         triage_input_data['body'] = processed_details['body']
 
                     triaged_record = triage(triage_input_data)
+                    check_deadline()
                     if triaged_record:
                         triaged_comment = convert_dict_to_comment(triaged_record)
                         if triaged_comment:
@@ -321,7 +313,7 @@ def process_single_issue(issue_object, repo_path_str, skip_commented=True, opena
                         print(f"Triage returned no data for new record issue #{issue_object.number}")
 
             elif processed_details['type'] == 'update record':
-                with time_limit(300):
+                with time_limit(ISSUE_TIMEOUT):
                     print(f'Triaging update record request - issue #{processed_details["issue_number"]}...')
                     if not OPENAI_API_KEY:
                         print("Error: OPENAI_API_KEY is not set. Cannot encode update.")
@@ -329,6 +321,7 @@ def process_single_issue(issue_object, repo_path_str, skip_commented=True, opena
 
                     update_encoding = encode_update(
                         processed_details['ror_id'], processed_details['change'])
+                    check_deadline()
                     if update_encoding:
                         validated_update = validate_encoding(update_encoding)
                         if validated_update:
@@ -366,6 +359,12 @@ def process_single_issue(issue_object, repo_path_str, skip_commented=True, opena
             print(f"Warning: Prioritization failed for issue #{issue_object.number}: {e}")
 
 
+def process_issue(issue, repo_path_str, skip_commented):
+    print(f"\n--- Processing issue #{issue.number}: {issue.title} ---")
+    process_single_issue(issue, repo_path_str, skip_commented,
+                         openalex_api_key=OPENALEX_API_KEY)
+
+
 def get_issues_to_process(repo, issue_number=None, start_issue=None, end_issue=None):
     """Get list of issues to process based on parameters"""
     issues = []
@@ -461,11 +460,15 @@ def main():
             
         print(f"Found {len(issues)} issue(s) to process")
         
-        for issue in issues:
-            print(f"\n--- Processing issue #{issue.number}: {issue.title} ---")
-            process_single_issue(issue, repo_path_str, skip_commented,
-                                openalex_api_key=OPENALEX_API_KEY)
-            
+        with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+            futures = {executor.submit(process_issue, issue, repo_path_str, skip_commented): issue
+                       for issue in issues}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Error processing issue #{futures[future].number}: {e}")
+
         print(f"\nCompleted processing {len(issues)} issue(s)")
         
     except Exception as e:
@@ -476,4 +479,5 @@ def main():
 if __name__ == '__main__':
     print("Starting enhanced issue triage process...")
     main()
+    log_cache_stats()
     print("Enhanced issue triage process finished.")
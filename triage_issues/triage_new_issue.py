@@ -1,11 +1,11 @@
 import os
 import re
-import signal
 from github import Github, GithubException
-from triage import triage
+from triage import triage, load_ror_index
+from lookup_cache import log_cache_stats
 from encode_updates import encode_update
 from validate_encoding import validate_encoding
-from contextlib import contextmanager
+from deadline import time_limit, check_deadline, ISSUE_TIMEOUT
 
 TOKEN = os.environ.get('GITHUB_TOKEN')
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
@@ -20,20 +20,6 @@ ALL_MAJOR_SECTION_HEADERS = [
 ]
 
 
-def timeout_handler(signum, frame):
-    raise TimeoutError("Process timed out")
-
-
-@contextmanager
-def time_limit(seconds):
-    signal.signal(signal.SIGALRM, timeout_handler)
-    signal.alarm(seconds)
-    try:
-        yield
-    finally:
-        signal.alarm(0)
-
-
 def get_matched_value(pattern, text):
     if text is None:
         return None
@@ -293,7 +279,9 @@ def process_single_issue(issue_object, repo_path_str):
 
     try:
         if processed_details['type'] == 'new':
-            with time_limit(300):
+            # Load the ROR dump, if one is configured, before the issue's time starts
+            load_ror_index()
+            with time_limit(ISSUE_TIMEOUT):
                 print(f'Triaging new record request - issue #{processed_details["issue_number"]}...')
                 triage_input_data = {
                     k: v for k, v in processed_details.items() if k != 'issue_object'}
@@ -302,6 +290,7 @@ def process_single_issue(issue_object, repo_path_str):
                     triage_input_data['body'] = processed_details['body']
 
                 triaged_record = triage(triage_input_data)
+                check_deadline()
                 if triaged_record:
                     triaged_comment = convert_dict_to_comment(triaged_record)
                     if triaged_comment:
@@ -313,7 +302,7 @@ def process_single_issue(issue_object, repo_path_str):
                     print(f"Triage returned no data for new record issue #{issue_object.number}")
 
         elif processed_details['type'] == 'update':
-            with time_limit(300):
+            with time_limit(ISSUE_TIMEOUT):
                 print(f'Triaging update record request - issue #{processed_details["issue_number"]}...')
                 if not OPENAI_API_KEY:
                     print("Error: OPENAI_API_KEY is not set. Cannot encode update.")
@@ -321,6 +310,7 @@ def process_single_issue(issue_object, repo_path_str):
 
                 update_encoding = encode_update(
                     processed_details['ror_id'], processed_details['change'])
+                check_deadline()
                 if update_encoding:
                     validated_update = validate_encoding(update_encoding)
                     if validated_update:
@@ -379,4 +369,5 @@ def main():
 if __name__ == '__main__':
     print("Starting issue triage process via GitHub Action trigger...")
     main()
+    log_cache_stats()
     print("Issue triage process finished.")
@@ -1,11 +1,14 @@
 import argparse
 import os
+import sys
 import json
 import logging
 import copy
 from datetime import datetime
 from zipfile import ZipFile, ZIP_DEFLATED
 import update_address
+sys.path.append('../utilities/json_array_writer')
+from json_array_writer import JsonArrayWriter
 
 
 RECORDS_PATH = "."
@@ -58,7 +61,6 @@ def update_record_locations(json_data, version):
 
 def update_addresses_dump(dump_zip_path, version):
     dump_unzipped = ''
-    updated_records = []
     with ZipFile(dump_zip_path, "r") as zf:
         print(zf.namelist())
         json_files_count = sum('.json' in s for s in zf.namelist())
@@ -71,16 +73,17 @@ def update_addresses_dump(dump_zip_path, version):
             print("Dump zip contains multiple json files. Something is wrong.")
 
     #try:
-    f = open(dump_unzipped, 'r')
-    records = json.load(f)
+    with open(dump_unzipped, 'r') as f:
+        records = json.load(f)
     print(str(len(records)) + f" records in v{version} dump")
-    for record in records:
-        print("processing dump record " + str(record['id']))
-        updated_record = update_record_locations(record, version)
-        updated_records.append(updated_record)
-    open(dump_unzipped, "w").write(
-        json.dumps(updated_records, ensure_ascii=False, indent=4, separators=(',', ': '))
-    )
+    # Records are written as they are updated, so write beside the dump and
+    # only replace it once every record has succeeded.
+    updated_dump = dump_unzipped + ".updating"
+    with open(updated_dump, "w") as f_out, JsonArrayWriter(f_out, ensure_ascii=False) as writer:
+        for record in records:
+            print("processing dump record " + str(record['id']))
+            writer.write(update_record_locations(record, version))
+    os.replace(updated_dump, dump_unzipped)
     #except:
     #    logging.error(f"Error creating v{output_schema_version} dump file: {e}")
 
@@ -1,8 +1,19 @@
-import json
+import os
+import sys
 import csv
 import argparse
-from deepdiff import DeepDiff
-from deepdiff.model import PrettyOrderedSet
+import tempfile
+from multiprocessing import Pool
+sys.path.append('../../utilities/record_hashes')
+sys.path.append('../../utilities/record_diff')
+from record_hashes import load_hashes, changed_ids, read_records, iter_hash_rows, sort_hash_rows, merge_join, sort_json_rows, iter_entries
+from record_diff import diff_records
+
+FIELDNAMES = ['id', 'change_type', 'field_path', 'old_value', 'new_value']
+CHUNK_SIZE = 50
+STREAM_BATCH_SIZE = 500
+# Rows per spilled run when sorting entries that carry a parsed record
+RECORD_RUN_SIZE = 1000
 
 
 def parse_arguments():
@@ -14,14 +25,22 @@ def parse_arguments():
                         help='Path to the second JSON file')
     parser.add_argument('-o', '--output', default='diff.csv',
                         help='Path to the output CSV file')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(),
+                        help='Number of worker processes for diffing changed records')
+    parser.add_argument('-s', '--streaming', action='store_true',
+                        help='Stream both dumps and merge-join them by ID with bounded memory')
     return parser.parse_args()
 
 
 def load_json_files(file1, file2):
-    with open(file1) as f1, open(file2) as f2:
-        dd_1_records = {record['id']: record for record in json.load(f1)}
-        dd_2_records = {record['id']: record for record in json.load(f2)}
-        return dd_1_records, dd_2_records
+    # Record hash sidecars tell which records differ, so only those are parsed
+    hashes_1 = load_hashes(file1)
+    hashes_2 = load_hashes(file2)
+    added, removed, changed = changed_ids(hashes_1, hashes_2)
+    print(f"{len(added)} added, {len(removed)} removed, {len(changed)} changed records")
+    dd_1_records = read_records(file1, hashes_1, removed | changed)
+    dd_2_records = read_records(file2, hashes_2, added | changed)
+    return dd_1_records, dd_2_records
 
 
 def compare_records(dd_1_records, dd_2_records):
@@ -40,116 +59,104 @@ def compare_records(dd_1_records, dd_2_records):
             'change_type': 'record_added',
             'diff': None
         })
-    # Check for changes in existing records
-    for record_id in dd_1_records.keys() & dd_2_records.keys():
-        diff = DeepDiff(dd_1_records[record_id], dd_2_records[record_id], ignore_order=True)
-        if diff:
-            differences.append({
-                'id': record_id,
-                'change_type': 'record_changed',
-                'diff': dict(diff)
-            })
     return differences
 
 
-def parse_diff(diff):
-    changes = []
-    for change_type, change_data in diff.items():
-        if isinstance(change_data, list):
-            for item in change_data:
-                if isinstance(item, str):
-                    field_path = item
-                    values = None
-                else:
-                    field_path, values = next(iter(item.items()))
-                changes.append(parse_change(change_type, field_path, values))
-        elif isinstance(change_data, dict):
-            for field_path, values in change_data.items():
-                changes.append(parse_change(change_type, field_path, values))
-    return changes
-
-
-def parse_change(change_type, field_path, values):
-    if change_type == 'dictionary_item_removed':
-        return {
-            'field_path': str(field_path),
-            'change_type': 'item_removed',
-            'old_value': 'Present',
-            'new_value': 'Removed'
-        }
-    elif change_type == 'type_changes':
-        return {
-            'field_path': str(field_path),
-            'change_type': 'type_change',
-            'old_value': str(values['old_value']),
-            'new_value': str(values['new_value'])
-        }
-    elif change_type == 'values_changed':
-        return {
-            'field_path': str(field_path),
-            'change_type': 'value_change',
-            'old_value': str(values['old_value']),
-            'new_value': str(values['new_value'])
-        }
-    elif change_type in ['iterable_item_added', 'dictionary_item_added']:
-        return {
-            'field_path': str(field_path),
-            'change_type': 'item_added',
-            'old_value': 'Not present',
-            'new_value': 'Added'
-        }
-    elif change_type in ['iterable_item_removed']:
-        return {
-            'field_path': str(field_path),
-            'change_type': 'item_removed',
-            'old_value': str(values),
-            'new_value': 'Removed'
-        }
-    else:
-        raise ValueError(f"Unhandled change_type: {change_type} for field_path: {field_path} and values: {values}")
-
-
-def write_differences_to_csv(differences, output_file):
+def chunk_changed_records(dd_1_records, dd_2_records, chunk_size=CHUNK_SIZE):
+    chunk = []
+    for record_id in sorted(dd_1_records.keys() & dd_2_records.keys()):
+        chunk.append((record_id, dd_1_records[record_id], dd_2_records[record_id]))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def diff_chunk(chunk):
+    rows = []
+    for record_id, old_record, new_record in chunk:
+        for change in diff_records(old_record, new_record):
+            rows.append({'id': record_id, **change})
+    return rows
+
+
+def difference_rows(diff):
+    return [{
+        'id': diff['id'],
+        'change_type': diff['change_type'],
+        'field_path': 'entire_record',
+        'old_value': 'Present' if diff['change_type'] == 'record_removed' else 'Not present',
+        'new_value': 'Removed' if diff['change_type'] == 'record_removed' else 'Added'
+    }]
+
+
+def write_differences_to_csv(differences, dd_1_records, dd_2_records, output_file, workers=1):
     with open(output_file, 'w') as csvfile:
-        fieldnames = ['id', 'change_type', 'field_path', 'old_value', 'new_value']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
         writer.writeheader()
         for diff in differences:
-            if diff['change_type'] in ['record_added', 'record_removed']:
-                writer.writerow({
-                    'id': diff['id'],
-                    'change_type': diff['change_type'],
-                    'field_path': 'entire_record',
-                    'old_value': 'Present' if diff['change_type'] == 'record_removed' else 'Not present',
-                    'new_value': 'Removed' if diff['change_type'] == 'record_removed' else 'Added'
-                })
-            elif diff['change_type'] == 'record_changed':
-                for change_type, change_data in diff['diff'].items():
-                    if isinstance(change_data, (list, PrettyOrderedSet)):
-                        for item in change_data:
-                            change = parse_change(change_type, item, None)
-                            writer.writerow({
-                                'id': diff['id'],
-                                **change
-                            })
-                    elif isinstance(change_data, dict):
-                        for field_path, values in change_data.items():
-                            change = parse_change(change_type, field_path, values)
-                            writer.writerow({
-                                'id': diff['id'],
-                                **change
-                            })
-                    else:
-                        raise ValueError(f"Unexpected change_data type: {type(change_data)} for diff: {diff}")
-            else:
-                raise ValueError(f"Unhandled change_type: {diff['change_type']} for diff: {diff}")
+            writer.writerows(difference_rows(diff))
+        chunks = chunk_changed_records(dd_1_records, dd_2_records)
+        if workers > 1:
+            with Pool(workers) as pool:
+                for rows in pool.imap(diff_chunk, chunks):
+                    writer.writerows(rows)
+        else:
+            for chunk in chunks:
+                writer.writerows(diff_chunk(chunk))
+
+
+def changed_record_pairs(file1, file2, changed_entries, tmp_dir):
+    # changed_entries are (old offset, old length, id, new offset, new length).
+    # Old records are read in old dump order and spilled with their new
+    # offsets, then new records are read in new dump order, so each dump is
+    # read front to back once.
+    old_sorted = sort_json_rows(changed_entries, tmp_dir)
+    with_old_records = ((entry[3], entry[4], entry[2], old_record)
+                        for entry, old_record in iter_entries(file1, old_sorted))
+    new_sorted = sort_json_rows(with_old_records, tmp_dir, RECORD_RUN_SIZE)
+    for entry, new_record in iter_entries(file2, new_sorted):
+        yield entry[2], entry[3], new_record
+
+
+def stream_differences_to_csv(file1, file2, output_file, batch_size=STREAM_BATCH_SIZE):
+    # Hash rows from both dumps are sorted by ID through temp files and
+    # merge-joined, so neither dump nor its hashes are held in memory. Added
+    # and removed records are written as they are found. The offsets of
+    # changed records are sorted through temp files too, and the records are
+    # then read in a single pass over each dump and diffed a batch at a time.
+    with tempfile.TemporaryDirectory() as tmp_dir, open(output_file, 'w') as csvfile:
+        old_rows = sort_hash_rows(iter_hash_rows(file1), tmp_dir)
+        new_rows = sort_hash_rows(iter_hash_rows(file2), tmp_dir)
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+        writer.writeheader()
+
+        def changed_entries():
+            for status, ror_id, old_row, new_row in merge_join(old_rows, new_rows):
+                if status == 'changed':
+                    yield old_row[2], old_row[3], ror_id, new_row[2], new_row[3]
+                else:
+                    writer.writerows(difference_rows({'id': ror_id, 'change_type': 'record_' + status}))
+
+        batch = []
+        for pair in changed_record_pairs(file1, file2, changed_entries(), tmp_dir):
+            batch.append(pair)
+            if len(batch) == batch_size:
+                writer.writerows(diff_chunk(batch))
+                batch = []
+        if batch:
+            writer.writerows(diff_chunk(batch))
 
 
 def main():
     args = parse_arguments()
+    if args.streaming:
+        stream_differences_to_csv(args.file1, args.file2, args.output)
+        return
     dd_1_records, dd_2_records = load_json_files(args.file1, args.file2)
     differences = compare_records(dd_1_records, dd_2_records)
-    write_differences_to_csv(differences, args.output)
+    write_differences_to_csv(differences, dd_1_records, dd_2_records, args.output, args.workers)
 
 
 if __name__ == '__main__':
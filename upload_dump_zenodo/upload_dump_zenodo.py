@@ -4,6 +4,8 @@ import os
 import logging
 import requests
 import sys
+sys.path.append('../utilities/checksum_manifest')
+from checksum_manifest import manifest_path, load_manifest
 
 ZENODO_API_URL_SANDBOX = "https://sandbox.zenodo.org/api/"
 ZENODO_API_URL_PROD = "https://zenodo.org/api/"
@@ -19,7 +21,7 @@ HEADERS = {"Content-Type": "application/json"}
 def get_dump_file(release):
     print("Getting dump filename")
     for file in os.listdir(DUMP_FILE_DIR):
-        if file.split("-", 1)[0] == release:
+        if file.split("-", 1)[0] == release and file.endswith(".zip"):
             return file
     return None
 
@@ -170,6 +172,20 @@ def upload_new_file(version_url, release_data):
         raise SystemExit(e)
 
 
+def check_uploaded_file(new_file, release_data):
+    manifest_file = manifest_path(DUMP_FILE_DIR + release_data['filename'])
+    if not os.path.exists(manifest_file):
+        print("No checksum manifest found for " + release_data['filename'] + ", skipping checksum check")
+        return True
+    expected_md5 = load_manifest(manifest_file)['archive']['md5']
+    uploaded_md5 = new_file['checksum'].replace("md5:", "")
+    if uploaded_md5 == expected_md5:
+        print("Uploaded file checksum matches manifest")
+        return True
+    print("Uploaded file checksum " + uploaded_md5 + " does not match manifest checksum " + expected_md5)
+    return False
+
+
 def delete_existing_files(version_url):
     print("Deleting existing files")
     try:
@@ -213,6 +229,8 @@ def create_zenodo_version(release_data):
             if len(existing_files) == 0:
                 new_file = upload_new_file(new_version_url, release_data)
                 if new_file['filename'] == release_data['filename']:
+                    if not check_uploaded_file(new_file, release_data):
+                        raise SystemExit("Uploaded dump file is corrupt, version not published")
                     update_metadata(new_version_url, release_data)
                     publish_version(new_version_url)
     except requests.exceptions.HTTPError as e:
@@ -0,0 +1,55 @@
+import os
+import json
+
+JOURNAL_SUFFIX = '.checkpoint.jsonl'
+
+
+def journal_path(output_file):
+    return os.path.splitext(output_file)[0] + JOURNAL_SUFFIX
+
+
+class CheckpointJournal:
+    # Append-only JSON lines file of finished items and their results. Each
+    # entry is flushed as soon as it is recorded, so an interrupted run can be
+    # resumed from the last finished item.
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.results = {}
+        if resume and os.path.exists(path):
+            self._load()
+            self._file = open(path, 'a', encoding='utf8')
+        else:
+            self._file = open(path, 'w', encoding='utf8')
+
+    def _load(self):
+        valid_size = 0
+        with open(self.path, 'rb') as f_in:
+            for line in f_in:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Partial last line from an interrupted write
+                    break
+                self.results[entry['id']] = entry['result']
+                valid_size += len(line)
+        os.truncate(self.path, valid_size)
+
+    def __contains__(self, key):
+        return key in self.results
+
+    def __len__(self):
+        return len(self.results)
+
+    def record(self, key, result):
+        self._file.write(json.dumps({'id': key, 'result': result}, ensure_ascii=False) + '\n')
+        self._file.flush()
+        self.results[key] = result
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,97 @@
+import io
+import os
+import json
+import hashlib
+
+ALGORITHMS = ('md5', 'sha256')
+CHUNK_SIZE = 1024 * 1024
+
+
+class HashingWriter(io.RawIOBase):
+    # Passes bytes through to a binary output (if any) while hashing them. It
+    # is not seekable, so a ZipFile writing through it streams each entry with
+    # a data descriptor instead of seeking back to patch headers that were
+    # already hashed.
+    def __init__(self, output, name):
+        self.output = output
+        self.name = name
+        self.size = 0
+        self._hashes = {algorithm: hashlib.new(algorithm) for algorithm in ALGORITHMS}
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        for digest in self._hashes.values():
+            digest.update(data)
+        self.size += len(data)
+        if self.output is not None:
+            self.output.write(data)
+        return len(data)
+
+    def flush(self):
+        if not self.closed and self.output is not None:
+            self.output.flush()
+
+    def close(self):
+        if not self.closed:
+            super().close()
+            if self.output is not None:
+                self.output.close()
+
+    def checksums(self):
+        checksums = {'name': self.name, 'size': self.size}
+        for algorithm, digest in self._hashes.items():
+            checksums[algorithm] = digest.hexdigest()
+        return checksums
+
+
+def open_hashed(path, buffer_size=io.DEFAULT_BUFFER_SIZE, text=False):
+    hasher = HashingWriter(open(path, 'wb', buffering=0), os.path.basename(path))
+    stream = io.BufferedWriter(hasher, buffer_size)
+    if text:
+        stream = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    return stream, hasher
+
+
+def file_checksums(path, chunk_size=CHUNK_SIZE):
+    hasher = HashingWriter(None, os.path.basename(path))
+    with open(path, 'rb') as f_in:
+        for chunk in iter(lambda: f_in.read(chunk_size), b''):
+            hasher.write(chunk)
+    return hasher.checksums()
+
+
+def manifest_path(archive_path):
+    return os.path.splitext(archive_path)[0] + '.checksums.json'
+
+
+def write_manifest(path, archive, files):
+    manifest = {
+        'archive': archive.checksums(),
+        'files': [f.checksums() for f in files]
+    }
+    with open(path, 'w') as f_out:
+        json.dump(manifest, f_out, indent=4)
+    return manifest
+
+
+def load_manifest(path):
+    with open(path) as f_in:
+        return json.load(f_in)
+
+
+def find_checksums(manifest, name):
+    for checksums in [manifest['archive']] + manifest['files']:
+        if checksums['name'] == name:
+            return checksums
+    return None
+
+
+def verify_file(path, manifest, algorithm='sha256'):
+    expected = find_checksums(manifest, os.path.basename(path))
+    if expected is None:
+        return False, None, None
+    actual = file_checksums(path)
+    ok = actual['size'] == expected['size'] and actual[algorithm] == expected[algorithm]
+    return ok, expected, actual
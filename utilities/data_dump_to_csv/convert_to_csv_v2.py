@@ -1,137 +1,181 @@
 import os
-import re
+import io
 import csv
-import sys
 import json
+import argparse
+from itertools import chain
+from collections import deque
+from zipfile import ZipFile
+from multiprocessing import Pool
 
 EXT_ID_TYPES = ['fundref', 'grid', 'isni', 'wikidata']
+NAME_TYPES = ['acronym', 'alias', 'label', 'ror_display']
+V2_SUFFIX = '_schema_v2'
+CHUNK_SIZE = 2000
+# Chunks handed to the pool per worker ahead of the one being written
+PENDING_CHUNKS_PER_WORKER = 2
+
+HEADER = ['id', 'admin.created.date', 'admin.created.schema_version', 'admin.last_modified.date', 'admin.last_modified.schema_version',
+          'domains', 'established', 'external_ids.type.fundref.all', 'external_ids.type.fundref.preferred',
+          'external_ids.type.grid.all', 'external_ids.type.grid.preferred', 'external_ids.type.isni.all', 'external_ids.type.isni.preferred',
+          'external_ids.type.wikidata.all', 'external_ids.type.wikidata.preferred', 'links.type.website', 'links.type.wikipedia',
+          'locations.geonames_id', 'locations.geonames_details.continent_code', 'locations.geonames_details.continent_name',
+          'locations.geonames_details.country_code', 'locations.geonames_details.country_name',
+          'locations.geonames_details.country_subdivision_code', 'locations.geonames_details.country_subdivision_name',
+          'locations.geonames_details.lat', 'locations.geonames_details.lng', 'locations.geonames_details.name',
+          'names.types.acronym', 'names.types.alias', 'names.types.label', 'names.types.ror_display', 'ror_display_lang', 'relationships', 'status', 'types']
+
+
+def format_grouped(grouped):
+    return "; ".join(key + ": " + ", ".join(values) for key, values in grouped.items()).rstrip('; ')
+
 
 def format_names(names_list):
     names_dict = {}
-    lang_codes = []
-    if len(names_list) > 0:
-        #for code in lang_codes:
-        #    names_dict[code] = []
-        for name in names_list:
-            code = None
-            if name['lang']:
-                code = name['lang']
-            else:
-                code = 'no_lang_code'
-            if code in names_dict:
-                names_dict[code].append(name['value'])
-            else:
-                names_dict[code] = [name['value']]
-    names_str = str()
-    for code in names_dict:
-        names_str += code + ": " + ", ".join(names_dict[code]) + "; "
-    names_str = names_str.rstrip('; ')
-    return names_str
+    for name in names_list:
+        code = name['lang'] if name['lang'] else 'no_lang_code'
+        names_dict.setdefault(code, []).append(name['value'])
+    return format_grouped(names_dict)
+
 
 def get_all_ext_ids(ext_ids):
-    all_ext_ids = {}
-    for ext_id_type in EXT_ID_TYPES:
-        all = "".join([";".join(id['all']) for id in ext_ids if id['type']==ext_id_type])
-        if all:
-            all_ext_ids[ext_id_type] = all
-        else:
-            all_ext_ids[ext_id_type] = None
-    return all_ext_ids
+    all_ext_ids = {ext_id_type: [] for ext_id_type in EXT_ID_TYPES}
+    for id in ext_ids:
+        if id['type'] in all_ext_ids:
+            all_ext_ids[id['type']].append(";".join(id['all']))
+    return {ext_id_type: "".join(values) or None for ext_id_type, values in all_ext_ids.items()}
+
 
 def get_preferred_ext_ids(ext_ids):
-    preferred_ids = {}
-    for ext_id_type in EXT_ID_TYPES:
-        preferred = [id['preferred'] for id in ext_ids if id['type']==ext_id_type]
-        if len(preferred) > 0:
-            preferred_ids[ext_id_type] = preferred[0]
-        else:
-            preferred_ids[ext_id_type] = None
+    preferred_ids = dict.fromkeys(EXT_ID_TYPES)
+    seen = set()
+    for id in ext_ids:
+        if id['type'] in preferred_ids and id['type'] not in seen:
+            preferred_ids[id['type']] = id['preferred']
+            seen.add(id['type'])
     return preferred_ids
 
-def get_all_data(f):
-    outfile = f.split('.json')[0]+ '.csv'
-    with open(outfile, 'w') as f_out:
-        writer = csv.writer(f_out)
-        writer.writerow(['id', 'admin.created.date', 'admin.created.schema_version', 'admin.last_modified.date', 'admin.last_modified.schema_version',
-                        'domains', 'established', 'external_ids.type.fundref.all', 'external_ids.type.fundref.preferred',
-                        'external_ids.type.grid.all', 'external_ids.type.grid.preferred', 'external_ids.type.isni.all', 'external_ids.type.isni.preferred',
-                        'external_ids.type.wikidata.all', 'external_ids.type.wikidata.preferred', 'links.type.website', 'links.type.wikipedia',
-                        'locations.geonames_id', 'locations.geonames_details.continent_code', 'locations.geonames_details.continent_name',
-                        'locations.geonames_details.country_code', 'locations.geonames_details.country_name',
-                        'locations.geonames_details.country_subdivision_code', 'locations.geonames_details.country_subdivision_name',
-                        'locations.geonames_details.lat', 'locations.geonames_details.lng', 'locations.geonames_details.name',
-                        'names.types.acronym', 'names.types.alias', 'names.types.label', 'names.types.ror_display', 'ror_display_lang', 'relationships', 'status', 'types'])
+
+def record_to_row(record):
+    admin = record['admin']
+    domains = ";".join(record['domains']) if record['domains'] != [] else None
+    # external IDs
+    ext_ids = record['external_ids']
+    preferred_ids = get_preferred_ext_ids(ext_ids)
+    all_ids = get_all_ext_ids(ext_ids)
+    # links
+    links = {'website': [], 'wikipedia': []}
+    for link in record['links']:
+        if link['type'] in links:
+            links[link['type']].append(link['value'])
+    # locations
+    location = record['locations'][0]
+    geonames_details = location['geonames_details']
+    # names
+    names_by_type = {name_type: [] for name_type in NAME_TYPES}
+    for name in record['names']:
+        for name_type in set(name['types']):
+            if name_type in names_by_type:
+                names_by_type[name_type].append(name)
+    ror_display = names_by_type['ror_display'][0]
+    # relationships
+    relationships_dict = {}
+    for rel in record['relationships']:
+        relationships_dict.setdefault(rel['type'], []).append(rel['id'])
+    types = '; '.join(record['types']) if record['types'] != [] else None
+
+    return [record['id'], admin['created']['date'], admin['created']['schema_version'],
+            admin['last_modified']['date'], admin['last_modified']['schema_version'], domains, record['established'],
+            all_ids['fundref'], preferred_ids['fundref'], all_ids['grid'], preferred_ids['grid'],
+            all_ids['isni'], preferred_ids['isni'], all_ids['wikidata'], preferred_ids['wikidata'],
+            ";".join(links['website']), ";".join(links['wikipedia']), location['geonames_id'],
+            geonames_details['continent_code'], geonames_details['continent_name'],
+            geonames_details['country_code'], geonames_details['country_name'],
+            geonames_details['country_subdivision_code'], geonames_details['country_subdivision_name'],
+            geonames_details['lat'], geonames_details['lng'], geonames_details['name'],
+            format_names(names_by_type['acronym']), format_names(names_by_type['alias']),
+            format_names(names_by_type['label']), ror_display['value'],
+            ror_display['lang'] or 'no_lang_code', format_grouped(relationships_dict),
+            record['status'], types]
+
+
+def format_rows(records):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(record_to_row(record) for record in records)
+    return buffer.getvalue()
+
+
+def format_header():
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(HEADER)
+    return buffer.getvalue()
+
+
+def chunk_records(records, chunk_size=CHUNK_SIZE):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def load_records(f):
+    if f.endswith('.zip'):
+        with ZipFile(f) as zf:
+            json_files = [name for name in zf.namelist() if name.endswith('.json')]
+            v2_files = [name for name in json_files if V2_SUFFIX in name]
+            with zf.open((v2_files or json_files)[0]) as f_in:
+                return json.load(f_in)
     with open(f, 'r+', encoding='utf8') as f_in:
-        json_file = json.load(f_in)
-    for record in json_file:
-        ror_id = record['id']
-        created_date = record['admin']['created']['date']
-        created_schema = record['admin']['created']['schema_version']
-        last_mod_date = record['admin']['last_modified']['date']
-        last_mod_schema = record['admin']['last_modified']['schema_version']
-        domains = ";".join(record['domains']) if record['domains'] != [] else None
-        established = record['established']
-        # external IDs
-        ext_ids = record['external_ids']
-        preferred_ids = get_preferred_ext_ids(ext_ids)
-        all_ids = get_all_ext_ids(ext_ids)
-        # links
-        links = record['links']
-        links_website = ";".join([link['value'] for link in links if link['type']=='website'])
-        links_wikipedia = ";".join([link['value'] for link in links if link['type']=='wikipedia'])
-        #locations
-        geonames_id = record['locations'][0]['geonames_id']
-        geonames_name = record['locations'][0]['geonames_details']['name']
-        geonames_continent_code = record['locations'][0]['geonames_details']['continent_code']
-        geonames_continent_name = record['locations'][0]['geonames_details']['continent_name']
-        geonames_country_code = record['locations'][0]['geonames_details']['country_code']
-        geonames_country_name = record['locations'][0]['geonames_details']['country_name']
-        geonames_country_subdivision_code = record['locations'][0]['geonames_details']['country_subdivision_code']
-        geonames_country_subdivision_name = record['locations'][0]['geonames_details']['country_subdivision_name']
-        geonames_lat = record['locations'][0]['geonames_details']['lat']
-        geonames_lng = record['locations'][0]['geonames_details']['lng']
-        # names
-        names = record['names']
-        acronyms_list = [name for name in names if 'acronym' in name['types']]
-        aliases_list = [name for name in names if 'alias' in name['types']]
-        labels_list = [name for name in names if 'label' in name['types']]
-        ror_display_list = [name for name in names if 'ror_display' in name['types']]
-        acronyms_str = format_names(acronyms_list)
-        aliases_str = format_names(aliases_list)
-        labels_str = format_names(labels_list)
-        ror_display_str = ror_display_list[0]['value']
-        ror_display_lang = ror_display_list[0]['lang']
-        if not ror_display_lang:
-            ror_display_lang = 'no_lang_code'
-        #relationships
-        relationships = record['relationships']
-        relationships_dict = {}
-        if len(relationships) > 0:
-            rel_types = [rel['type'] for rel in relationships]
-            for rel_type in rel_types:
-                relationships_dict[rel_type] = []
-                for rel in relationships:
-                    if rel['type'] == rel_type:
-                        relationships_dict[rel_type].append(rel['id'])
-        rels_str = str()
-        for rel_type in relationships_dict:
-            rels_str += rel_type + ": " + ", ".join(relationships_dict[rel_type]) + "; "
-        rels_str = rels_str.rstrip('; ')
-        #status
-        status = record['status']
-        #types
-        types = '; '.join(record['types']) if record['types'] != [] else None
-
-        with open(outfile, 'a') as f_out:
-            writer = csv.writer(f_out)
-            writer.writerow([ror_id, created_date, created_schema, last_mod_date, last_mod_schema, domains, established,
-                            all_ids['fundref'], preferred_ids['fundref'], all_ids['grid'], preferred_ids['grid'],
-                            all_ids['isni'], preferred_ids['isni'], all_ids['wikidata'], preferred_ids['wikidata'],
-                            links_website, links_wikipedia, geonames_id, geonames_continent_code, geonames_continent_name,
-                            geonames_country_code, geonames_country_name, geonames_country_subdivision_code, geonames_country_subdivision_name,
-                            geonames_lat, geonames_lng, geonames_name, acronyms_str, aliases_str, labels_str, ror_display_str,
-                            ror_display_lang, rels_str, status, types])
+        return json.load(f_in)
+
+
+def imap_bounded(pool, func, items, max_pending):
+    # Like pool.imap, keeping order, but only max_pending items are submitted
+    # ahead of the consumer. pool.imap reads its whole input at once and keeps
+    # every result until it is consumed, so memory would grow with the dump.
+    pending = deque()
+    for item in items:
+        pending.append(pool.apply_async(func, (item,)))
+        if len(pending) >= max_pending:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def iter_csv(records, pool=None, workers=1):
+    # Rows are produced in dump order. Nothing is formatted until the first
+    # chunk is consumed.
+    if pool is not None:
+        chunks = imap_bounded(pool, format_rows, chunk_records(records), workers * PENDING_CHUNKS_PER_WORKER)
+    else:
+        chunks = map(format_rows, chunk_records(records))
+    return chain([format_header()], chunks)
+
+
+def get_all_data(f, records=None, workers=1):
+    outfile = os.path.splitext(f)[0] + '.csv'
+    if records is None:
+        records = load_records(f)
+    with open(outfile, 'w') as f_out:
+        if workers > 1:
+            with Pool(workers) as pool:
+                f_out.writelines(iter_csv(records, pool, workers))
+        else:
+            f_out.writelines(iter_csv(records))
+    return outfile
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Convert a v2 ROR data dump JSON or zip file to CSV")
+    parser.add_argument('input_file', help="Path to data dump JSON or zip file")
+    parser.add_argument('-w', '--workers', type=int, default=1, help="Number of worker processes (default: 1)")
+    return parser.parse_args()
 
 
 if __name__ == '__main__':
-	get_all_data(sys.argv[1])
+    args = parse_arguments()
+    get_all_data(args.input_file, workers=args.workers)
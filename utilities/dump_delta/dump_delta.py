@@ -0,0 +1,129 @@
+import os
+import sys
+import json
+import hashlib
+import argparse
+from zipfile import ZipFile
+sys.path.append('../json_array_writer')
+sys.path.append('../checksum_manifest')
+sys.path.append('../record_hashes')
+
+from json_array_writer import JsonArrayWriter
+from checksum_manifest import open_hashed
+from record_hashes import content_hash
+
+V2_SUFFIX = '_schema_v2'
+DELTA_SUFFIX = '.delta.json'
+
+
+def read_dump(path):
+    # Returns the records and the name, size and SHA-256 of the dump JSON, read
+    # straight out of the zip when given one.
+    if path.endswith('.zip'):
+        with ZipFile(path) as zf:
+            json_files = [name for name in zf.namelist() if name.endswith('.json')]
+            v2_files = [name for name in json_files if V2_SUFFIX in name]
+            name = (v2_files or json_files)[0]
+            data = zf.read(name)
+    else:
+        name = os.path.basename(path)
+        with open(path, 'rb') as f_in:
+            data = f_in.read()
+    records = json.loads(data)
+    return records, dump_info(name, records, data)
+
+
+def dump_info(name, records, data=None, sha256=None):
+    # records is the list of records or just their count
+    return {
+        'name': name,
+        'records': records if isinstance(records, int) else len(records),
+        'sha256': sha256 if sha256 is not None else hashlib.sha256(data).hexdigest()
+    }
+
+
+def build_delta(base, target, appended_records, replaced_ids, removed_ids=()):
+    # appended_records are the records added to the end of the base dump in
+    # order, replaced_ids the base records they replace.
+    replaced_ids = set(replaced_ids)
+    changes = []
+    for record in appended_records:
+        changes.append({
+            'id': record['id'],
+            'action': 'updated' if record['id'] in replaced_ids else 'added',
+            'hash': content_hash(record),
+            'record': record
+        })
+    return {
+        'base': base,
+        'target': target,
+        'removed': sorted(removed_ids),
+        'changes': changes
+    }
+
+
+def write_delta(path, delta):
+    with open(path, 'w') as f_out:
+        json.dump(delta, f_out, separators=(',', ':'))
+
+
+def load_delta(path):
+    with open(path) as f_in:
+        return json.load(f_in)
+
+
+def mismatched_changes(delta):
+    return [change['id'] for change in delta['changes'] if content_hash(change['record']) != change['hash']]
+
+
+def apply_delta(base_records, delta):
+    dropped = set(delta['removed'])
+    dropped.update(change['id'] for change in delta['changes'] if change['action'] == 'updated')
+    for record in base_records:
+        if record['id'] not in dropped:
+            yield record
+    for change in delta['changes']:
+        yield change['record']
+
+
+def rebuild_dump(base_path, delta, output_path):
+    base_records, base = read_dump(base_path)
+    if base['sha256'] != delta['base']['sha256']:
+        print("Base dump " + base['name'] + " does not match delta base " + delta['base']['name'])
+        return False
+    mismatched = mismatched_changes(delta)
+    if mismatched:
+        print("Delta records do not match their hashes: " + ", ".join(mismatched))
+        return False
+    tmp_path = output_path + '.tmp'
+    json_out, json_hash = open_hashed(tmp_path, text=True)
+    with json_out, JsonArrayWriter(json_out) as writer:
+        writer.write_all(apply_delta(base_records, delta))
+    target = delta['target']
+    if writer.count != target['records'] or json_hash.checksums()['sha256'] != target['sha256']:
+        os.remove(tmp_path)
+        print("Rebuilt dump does not match delta target " + target['name'])
+        return False
+    os.replace(tmp_path, output_path)
+    print("Rebuilt " + target['name'] + " with " + str(writer.count) + " records")
+    return True
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Rebuild a ROR data dump from the previous dump and a release delta")
+    parser.add_argument('-b', '--basedump', required=True, help="Path to the base data dump zip or JSON file")
+    parser.add_argument('-d', '--delta', required=True, help="Path to the release delta file")
+    parser.add_argument('-o', '--output', help="Path to write the rebuilt dump JSON. Defaults to the target name from the delta")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    delta = load_delta(args.delta)
+    output = args.output or delta['target']['name']
+    if not rebuild_dump(args.basedump, delta, output):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+import io
+import json
+import queue
+import threading
+
+INDENT = 4
+SEPARATORS = (',', ': ')
+
+
+class JsonArrayWriter:
+    # Writes a JSON array one record at a time, producing the same bytes as
+    # json.dumps(records, indent=4, separators=(',', ': ')) without holding
+    # the whole list or its serialized string in memory.
+    # on_write, if given, is called with each record and the byte offset and
+    # length of its text in the output.
+    def __init__(self, *outputs, ensure_ascii=True, on_write=None):
+        self.outputs = outputs
+        self.ensure_ascii = ensure_ascii
+        self.on_write = on_write
+        self.count = 0
+        self.position = 0
+
+    def _byte_len(self, text):
+        return len(text) if self.ensure_ascii else len(text.encode('utf-8'))
+
+    def _emit(self, text):
+        for output in self.outputs:
+            output.write(text)
+
+    def write(self, record):
+        item = json.dumps(record, ensure_ascii=self.ensure_ascii, indent=INDENT, separators=SEPARATORS)
+        prefix = (",\n" if self.count else "[\n") + " " * INDENT
+        item = item.replace("\n", "\n" + " " * INDENT)
+        self._emit(prefix + item)
+        offset = self.position + len(prefix)
+        length = self._byte_len(item)
+        self.position = offset + length
+        if self.on_write is not None:
+            self.on_write(record, offset, length)
+        self.count += 1
+
+    def write_all(self, records):
+        for record in records:
+            self.write(record)
+        return self.count
+
+    def close(self):
+        self._emit("\n]" if self.count else "[]")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+
+
+class BackgroundWriter:
+    # Collects text into chunks of buffer_size and writes them to output from a
+    # separate thread. zlib and the hash functions release the GIL, so a zip
+    # entry behind this compresses while the caller serializes the next records.
+    def __init__(self, output, buffer_size=io.DEFAULT_BUFFER_SIZE, max_pending=4):
+        self.output = output
+        self.buffer_size = buffer_size
+        self._parts = []
+        self._pending = 0
+        self._error = None
+        self._queue = queue.Queue(max_pending)
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+        self._thread.start()
+
+    def _drain(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                return
+            if self._error is None:
+                try:
+                    self.output.write(chunk)
+                except BaseException as e:
+                    self._error = e
+
+    def _submit(self):
+        if self._error is not None:
+            raise self._error
+        self._queue.put(''.join(self._parts))
+        self._parts = []
+        self._pending = 0
+
+    def write(self, text):
+        self._parts.append(text)
+        self._pending += len(text)
+        if self._pending >= self.buffer_size:
+            self._submit()
+
+    def close(self):
+        try:
+            if self._parts and self._error is None:
+                self._submit()
+        finally:
+            self._queue.put(None)
+            self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def open_zip_entry(zip_file, name, buffer_size=io.DEFAULT_BUFFER_SIZE):
+    # Dumps can exceed 2 GiB uncompressed and the size is not known up front.
+    raw = zip_file.open(name, 'w', force_zip64=True)
+    return io.TextIOWrapper(io.BufferedWriter(raw, buffer_size), encoding='utf-8', newline='')
+
+
+def write_json_array(path, records, ensure_ascii=True):
+    with open(path, 'w', encoding='utf-8') as f_out, JsonArrayWriter(f_out, ensure_ascii=ensure_ascii) as writer:
+        return writer.write_all(records)
@@ -0,0 +1,226 @@
+import json
+from collections import defaultdict
+
+# Fields of a v2 record whose items are matched by a key rather than by
+# position, so reordering them is not a change.
+NAME_KEY = ('value', 'lang')
+LINK_KEY = ('type', 'value')
+RELATIONSHIP_KEY = ('id', 'type')
+
+
+def _canonical(value):
+    return json.dumps(value, sort_keys=True, ensure_ascii=False)
+
+
+def _change(field_path, change_type, old_value=None, new_value=None):
+    return {
+        'field_path': field_path,
+        'change_type': change_type,
+        'old_value': old_value,
+        'new_value': new_value
+    }
+
+
+def _keyed(items, key_fields):
+    keyed = {}
+    for item in items or []:
+        keyed[tuple(item.get(field) for field in key_fields)] = item
+    return keyed
+
+
+def _all_dicts(*lists):
+    return all(isinstance(item, dict) for items in lists for item in items or [])
+
+
+def _diff_name_types(value, old_types, new_types):
+    changes = []
+    for name_type in sorted(new_types - old_types):
+        changes.append(_change('names.' + name_type, name_type + ' added', None, value))
+    for name_type in sorted(old_types - new_types):
+        changes.append(_change('names.' + name_type, name_type + ' removed', value, None))
+    return changes
+
+
+def diff_names(old_names, new_names):
+    changes = []
+    old_keyed = _keyed(old_names, NAME_KEY)
+    new_keyed = _keyed(new_names, NAME_KEY)
+    # The same value can be added in several languages, so keep every key
+    added = defaultdict(list)
+    for key in new_keyed:
+        if key not in old_keyed:
+            added[key[0]].append(key)
+    for key in old_keyed:
+        old_types = set(old_keyed[key].get('types') or [])
+        if key in new_keyed:
+            new_types = set(new_keyed[key].get('types') or [])
+            changes.extend(_diff_name_types(key[0], old_types, new_types))
+        elif added.get(key[0]):
+            # Same value with a different lang. Each removed key pairs with
+            # at most one added key; the rest are reported as added.
+            new_key = added[key[0]].pop(0)
+            changes.append(_change('names.lang', 'name language changed',
+                                   f"{key[0]} ({key[1]})", f"{new_key[0]} ({new_key[1]})"))
+            new_types = set(new_keyed[new_key].get('types') or [])
+            changes.extend(_diff_name_types(key[0], old_types, new_types))
+        else:
+            changes.extend(_diff_name_types(key[0], old_types, set()))
+    for keys in added.values():
+        for key in keys:
+            changes.extend(_diff_name_types(key[0], set(), set(new_keyed[key].get('types') or [])))
+    return changes
+
+
+def diff_links(old_links, new_links):
+    changes = []
+    old_keyed = _keyed(old_links, LINK_KEY)
+    new_keyed = _keyed(new_links, LINK_KEY)
+    for link_type, value in sorted(new_keyed.keys() - old_keyed.keys(), key=str):
+        changes.append(_change('links.' + str(link_type), str(link_type) + ' link added', None, value))
+    for link_type, value in sorted(old_keyed.keys() - new_keyed.keys(), key=str):
+        changes.append(_change('links.' + str(link_type), str(link_type) + ' link removed', value, None))
+    return changes
+
+
+def _group_external_ids(external_ids):
+    # A record can have several entries of one type, so merge them by type
+    grouped = defaultdict(lambda: {'all': [], 'preferred': []})
+    for external_id in external_ids or []:
+        group = grouped[external_id.get('type')]
+        for value in external_id.get('all') or []:
+            if value not in group['all']:
+                group['all'].append(value)
+        preferred = external_id.get('preferred')
+        if preferred is not None and preferred not in group['preferred']:
+            group['preferred'].append(preferred)
+    return grouped
+
+
+def _preferred_value(preferred):
+    if not preferred:
+        return None
+    return preferred[0] if len(preferred) == 1 else preferred
+
+
+def diff_external_ids(old_ids, new_ids):
+    changes = []
+    old_grouped = _group_external_ids(old_ids)
+    new_grouped = _group_external_ids(new_ids)
+    for key in sorted(old_grouped.keys() | new_grouped.keys(), key=str):
+        id_type = str(key)
+        path = 'external_ids.' + id_type
+        old_id = old_grouped.get(key) or {'all': [], 'preferred': []}
+        new_id = new_grouped.get(key) or {'all': [], 'preferred': []}
+        old_all, new_all = old_id['all'], new_id['all']
+        old_set, new_set = set(old_all), set(new_all)
+        for value in [value for value in new_all if value not in old_set]:
+            changes.append(_change(path + '.all', id_type + ' added', None, value))
+        for value in [value for value in old_all if value not in new_set]:
+            changes.append(_change(path + '.all', id_type + ' removed', value, None))
+        if set(old_id['preferred']) != set(new_id['preferred']):
+            changes.append(_change(path + '.preferred', 'preferred ' + id_type + ' changed',
+                                   _preferred_value(old_id['preferred']),
+                                   _preferred_value(new_id['preferred'])))
+    return changes
+
+
+def diff_relationships(old_relationships, new_relationships):
+    changes = []
+    old_keyed = _keyed(old_relationships, RELATIONSHIP_KEY)
+    new_keyed = _keyed(new_relationships, RELATIONSHIP_KEY)
+    for key in sorted(old_keyed.keys() | new_keyed.keys(), key=str):
+        related_id, relationship_type = key
+        path = 'relationships.' + str(relationship_type)
+        if key not in old_keyed:
+            changes.append(_change(path, str(relationship_type) + ' relationship added', None, related_id))
+        elif key not in new_keyed:
+            changes.append(_change(path, str(relationship_type) + ' relationship removed', related_id, None))
+        elif old_keyed[key].get('label') != new_keyed[key].get('label'):
+            changes.append(_change(path + '.label', 'relationship label changed',
+                                   old_keyed[key].get('label'), new_keyed[key].get('label')))
+    return changes
+
+
+def diff_locations(old_locations, new_locations):
+    changes = []
+    old_keyed = _keyed(old_locations, ('geonames_id',))
+    new_keyed = _keyed(new_locations, ('geonames_id',))
+    for key in sorted(old_keyed.keys() | new_keyed.keys(), key=str):
+        geonames_id = key[0]
+        if key not in old_keyed:
+            changes.append(_change('locations', 'location added', None, geonames_id))
+        elif key not in new_keyed:
+            changes.append(_change('locations', 'location removed', geonames_id, None))
+        else:
+            old_details = old_keyed[key].get('geonames_details') or {}
+            new_details = new_keyed[key].get('geonames_details') or {}
+            for detail in sorted(old_details.keys() | new_details.keys()):
+                if old_details.get(detail) != new_details.get(detail):
+                    changes.append(_change('locations.' + str(geonames_id) + '.' + detail,
+                                           'location ' + detail + ' changed',
+                                           old_details.get(detail), new_details.get(detail)))
+    return changes
+
+
+def diff_values(path, old_value, new_value):
+    # Generic comparison for fields without a schema-specific rule. Dicts are
+    # compared key by key and lists as unordered collections.
+    name = ' '.join(path.split('.')[-2:])
+    if old_value == new_value:
+        return []
+    if isinstance(old_value, dict) and isinstance(new_value, dict):
+        changes = []
+        for key in sorted(old_value.keys() | new_value.keys(), key=str):
+            changes.extend(diff_values(path + '.' + str(key), old_value.get(key), new_value.get(key)))
+        return changes
+    if isinstance(old_value, list) and isinstance(new_value, list):
+        old_items = {_canonical(item): item for item in old_value}
+        new_items = {_canonical(item): item for item in new_value}
+        changes = []
+        for key in new_items.keys() - old_items.keys():
+            changes.append(_change(path, name + ' added', None, new_items[key]))
+        for key in old_items.keys() - new_items.keys():
+            changes.append(_change(path, name + ' removed', old_items[key], None))
+        return changes
+    if old_value is None:
+        return [_change(path, name + ' added', None, new_value)]
+    if new_value is None:
+        return [_change(path, name + ' removed', old_value, None)]
+    return [_change(path, name + ' changed', old_value, new_value)]
+
+
+FIELD_DIFFS = {
+    'names': diff_names,
+    'links': diff_links,
+    'external_ids': diff_external_ids,
+    'relationships': diff_relationships,
+    'locations': diff_locations
+}
+
+
+def diff_records(old_record, new_record):
+    # Returns a list of changes, each with field_path, change_type, old_value
+    # and new_value. v1 records and unknown fields fall back to diff_values.
+    changes = []
+    old_record = old_record or {}
+    new_record = new_record or {}
+    for field in list(old_record) + [field for field in new_record if field not in old_record]:
+        old_value = old_record.get(field)
+        new_value = new_record.get(field)
+        if old_value == new_value:
+            continue
+        field_diff = FIELD_DIFFS.get(field)
+        if field_diff is not None and isinstance(old_value or [], list) and isinstance(new_value or [], list) \
+                and _all_dicts(old_value, new_value):
+            changes.extend(field_diff(old_value, new_value))
+        else:
+            changes.extend(diff_values(field, old_value, new_value))
+    return changes
+
+
+def format_change(change):
+    return f"{change['change_type']} ({change['field_path']}): {change['old_value']} -> {change['new_value']}"
+
+
+def format_changes(changes):
+    return '; '.join(format_change(change) for change in changes)
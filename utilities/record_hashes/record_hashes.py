@@ -0,0 +1,328 @@
+import os
+import csv
+import json
+import heapq
+import codecs
+import shutil
+import hashlib
+import tempfile
+from zipfile import ZipFile
+
+HASHES_SUFFIX = '.hashes.csv'
+HEADER = ['id', 'hash', 'offset', 'length']
+FINGERPRINT_TAG = '#dump'
+# Sidecars built for dumps that do not have one are saved here, rather than
+# next to the input dumps
+CACHE_DIR = os.environ.get('ROR_RECORD_HASHES_CACHE',
+                           os.path.join(os.path.expanduser('~'), '.cache', 'ror_record_hashes'))
+STREAM_CHUNK_SIZE = 1024 * 1024
+RUN_SIZE = 10000
+
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+_decoder = json.JSONDecoder()
+
+
+def _canonical(value):
+    # Keys are sorted and list items are sorted by their own canonical form, so
+    # reordering names, links, external IDs etc. does not change the hash.
+    if isinstance(value, dict):
+        return '{' + ','.join(_encode(key) + ':' + _canonical(value[key]) for key in sorted(value)) + '}'
+    if isinstance(value, list):
+        return '[' + ','.join(sorted(_canonical(item) for item in value)) + ']'
+    return _encode(value)
+
+
+def content_hash(record):
+    return hashlib.sha256(_canonical(record).encode('utf-8')).hexdigest()
+
+
+def dump_fingerprint(dump_path):
+    # Written as the first row of a sidecar. A sidecar whose fingerprint does
+    # not match the dump's size and modification time is not used.
+    stat = os.stat(dump_path)
+    return [FINGERPRINT_TAG, str(stat.st_size), str(stat.st_mtime_ns)]
+
+
+def hashes_path(dump_path, member=None, cache_dir=None):
+    # Sidecar for a dump JSON file, or for a JSON member of a dump zip, in the
+    # same directory as the dump unless a cache directory is given.
+    name = member if member is not None else os.path.basename(dump_path)
+    stem = os.path.splitext(os.path.basename(name))[0]
+    directory = cache_dir if cache_dir is not None else os.path.dirname(dump_path)
+    return os.path.join(directory, stem + HASHES_SUFFIX)
+
+
+class RecordHashWriter:
+    # Writes the sidecar row by row. Pass add as on_write to a JsonArrayWriter
+    # so hashes and offsets are recorded while the dump itself is written.
+    # Rows go to a temporary file until seal is called with the finished
+    # dump, as the sidecar starts with the dump's fingerprint.
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = open(path + '.rows', 'w', newline='')
+        self._writer = csv.writer(self._file)
+
+    def add(self, record, offset, length):
+        self._writer.writerow([record['id'], content_hash(record), offset, length])
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+    def seal(self, dump_path):
+        self.close()
+        with open(self.path + '.tmp', 'w', newline='') as f_out:
+            writer = csv.writer(f_out)
+            writer.writerow(dump_fingerprint(dump_path))
+            writer.writerow(HEADER)
+            with open(self.path + '.rows', newline='') as f_in:
+                shutil.copyfileobj(f_in, f_out)
+        os.replace(self.path + '.tmp', self.path)
+        os.remove(self.path + '.rows')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _read_hash_rows(path):
+    with open(path, newline='') as f_in:
+        reader = csv.reader(f_in)
+        next(reader)
+        next(reader)
+        for ror_id, digest, offset, length in reader:
+            yield ror_id, digest, int(offset), int(length)
+
+
+def read_hashes(path):
+    return {ror_id: (digest, offset, length) for ror_id, digest, offset, length in _read_hash_rows(path)}
+
+
+def dump_member(zip_file, exclude=None):
+    json_files = [name for name in zip_file.namelist() if name.endswith('.json') and 'MACOSX' not in name]
+    if exclude is not None:
+        json_files = [name for name in json_files if exclude not in name] or json_files
+    return json_files[0]
+
+
+def _open_dump(dump_path, member=None):
+    if dump_path.endswith('.zip'):
+        zf = ZipFile(dump_path)
+        return zf.open(member or dump_member(zf)), zf
+    return open(dump_path, 'rb'), None
+
+
+def iter_records(dump_path, member=None, chunk_size=STREAM_CHUNK_SIZE, digest=None):
+    # Streams the top-level records of a dump JSON array, or of the JSON file
+    # in a dump zip, with the byte offset and length of each record's text.
+    # Only about one chunk of the file is held in memory at a time. If digest
+    # is given (e.g. a hashlib.sha256()), every byte of the file is fed to it.
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    f_in, zf = _open_dump(dump_path, member)
+    text = ''
+    index = 0
+    cursor = 0
+    cursor_byte = 0
+    eof = False
+    try:
+        while True:
+            while index < len(text) and text[index] in ' \t\r\n,[':
+                index += 1
+            if index < len(text) and text[index] == ']':
+                break
+            record = None
+            if index < len(text):
+                try:
+                    record, end = _decoder.raw_decode(text, index)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+            if record is None:
+                if eof:
+                    return
+                chunk = f_in.read(chunk_size)
+                eof = not chunk
+                if digest is not None:
+                    digest.update(chunk)
+                # Drop text before the cursor; its byte length is already counted
+                text = text[cursor:] + decoder.decode(chunk, final=eof)
+                index -= cursor
+                cursor = 0
+                continue
+            offset = cursor_byte + len(text[cursor:index].encode('utf-8'))
+            length = len(text[index:end].encode('utf-8'))
+            yield record, offset, length
+            cursor = index = end
+            cursor_byte = offset + length
+        if digest is not None:
+            for chunk in iter(lambda: f_in.read(chunk_size), b''):
+                digest.update(chunk)
+    finally:
+        f_in.close()
+        if zf is not None:
+            zf.close()
+
+
+def sidecar_matches(path, dump_path):
+    try:
+        with open(path, newline='') as f_in:
+            return next(csv.reader(f_in), None) == dump_fingerprint(dump_path)
+    except (OSError, csv.Error, UnicodeDecodeError):
+        return False
+
+
+def iter_hash_rows(dump_path, member=None, save=True, cache_dir=None):
+    # Yields (id, hash, offset, length) in dump order, from the sidecar next
+    # to the dump or in cache_dir (CACHE_DIR by default) if there is one that
+    # matches the dump. Otherwise the dump is streamed and, if save is set,
+    # the sidecar is written to cache_dir as rows are produced.
+    cache_dir = cache_dir if cache_dir is not None else CACHE_DIR
+    for path in dict.fromkeys([hashes_path(dump_path, member), hashes_path(dump_path, member, cache_dir)]):
+        if os.path.exists(path):
+            if sidecar_matches(path, dump_path):
+                yield from _read_hash_rows(path)
+                return
+            print(f"Record hashes in {path} do not match {dump_path}. Rebuilding.")
+    path = hashes_path(dump_path, member, cache_dir)
+    writer = None
+    if save:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            f_out = open(path + '.tmp', 'w', newline='')
+            writer = csv.writer(f_out)
+            writer.writerow(dump_fingerprint(dump_path))
+            writer.writerow(HEADER)
+        except OSError as e:
+            print(f"Could not save record hashes for {dump_path}: {e}")
+    for record, offset, length in iter_records(dump_path, member):
+        row = (record['id'], content_hash(record), offset, length)
+        if writer is not None:
+            writer.writerow(row)
+        yield row
+    if writer is not None:
+        f_out.close()
+        os.replace(path + '.tmp', path)
+
+
+def load_hashes(dump_path, member=None, save=True, cache_dir=None):
+    return {ror_id: (digest, offset, length)
+            for ror_id, digest, offset, length in iter_hash_rows(dump_path, member, save, cache_dir)}
+
+
+def changed_ids(old_hashes, new_hashes):
+    removed = old_hashes.keys() - new_hashes.keys()
+    added = new_hashes.keys() - old_hashes.keys()
+    changed = {ror_id for ror_id in old_hashes.keys() & new_hashes.keys()
+               if old_hashes[ror_id][0] != new_hashes[ror_id][0]}
+    return added, removed, changed
+
+
+def _spill_run(run, tmp_dir):
+    fd, path = tempfile.mkstemp(suffix='.csv', dir=tmp_dir)
+    with os.fdopen(fd, 'w', newline='') as f_out:
+        csv.writer(f_out).writerows(run)
+    return path
+
+
+def _read_run(path):
+    with open(path, newline='') as f_in:
+        for ror_id, digest, offset, length in csv.reader(f_in):
+            yield ror_id, digest, int(offset), int(length)
+
+
+def sort_hash_rows(rows, tmp_dir, run_size=RUN_SIZE):
+    # External sort by ROR ID: sorted runs of run_size rows are spilled to
+    # tmp_dir and merged lazily, so memory stays at one run plus one row per
+    # spilled run.
+    runs = []
+    run = []
+    for row in rows:
+        run.append(row)
+        if len(run) == run_size:
+            run.sort()
+            runs.append(_spill_run(run, tmp_dir))
+            run = []
+    run.sort()
+    if not runs:
+        return iter(run)
+    runs.append(_spill_run(run, tmp_dir))
+    return heapq.merge(*[_read_run(path) for path in runs])
+
+
+def _spill_json_run(run, tmp_dir):
+    fd, path = tempfile.mkstemp(suffix='.jsonl', dir=tmp_dir)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f_out:
+        for row in run:
+            f_out.write(json.dumps(row, ensure_ascii=False) + '\n')
+    return path
+
+
+def _read_json_run(path):
+    with open(path, encoding='utf-8') as f_in:
+        for line in f_in:
+            yield json.loads(line)
+
+
+def sort_json_rows(rows, tmp_dir, run_size=RUN_SIZE):
+    # External sort like sort_hash_rows, for rows of any JSON values, e.g.
+    # entries that carry a parsed record. Spilled rows come back as lists.
+    runs = []
+    run = []
+    for row in rows:
+        run.append(row)
+        if len(run) == run_size:
+            run.sort()
+            runs.append(_spill_json_run(run, tmp_dir))
+            run = []
+    run.sort()
+    if not runs:
+        return iter(run)
+    runs.append(_spill_json_run(run, tmp_dir))
+    return heapq.merge(*[_read_json_run(path) for path in runs])
+
+
+def merge_join(old_rows, new_rows):
+    # Joins two ID-sorted row streams, yielding (status, id, old_row, new_row)
+    # for every ID that was added, removed or changed.
+    old_row = next(old_rows, None)
+    new_row = next(new_rows, None)
+    while old_row is not None or new_row is not None:
+        if new_row is None or (old_row is not None and old_row[0] < new_row[0]):
+            yield 'removed', old_row[0], old_row, None
+            old_row = next(old_rows, None)
+        elif old_row is None or new_row[0] < old_row[0]:
+            yield 'added', new_row[0], None, new_row
+            new_row = next(new_rows, None)
+        else:
+            if old_row[1] != new_row[1]:
+                yield 'changed', old_row[0], old_row, new_row
+            old_row = next(old_rows, None)
+            new_row = next(new_rows, None)
+
+
+def iter_entries(dump_path, entries, member=None):
+    # Yields (entry, record) for entries starting with (offset, length), which
+    # must be in ascending offset order. The file is read front to back in a
+    # single pass, so a zip member is decompressed at most once however many
+    # entries there are.
+    f_in, zf = _open_dump(dump_path, member)
+    try:
+        for entry in entries:
+            f_in.seek(entry[0])
+            yield entry, json.loads(f_in.read(entry[1]))
+    finally:
+        f_in.close()
+        if zf is not None:
+            zf.close()
+
+
+def read_entries(dump_path, entries, member=None):
+    # Parses only the records at the given (offset, length, id) entries
+    return {entry[2]: record for entry, record in iter_entries(dump_path, sorted(entries), member)}
+
+
+def read_records(dump_path, hashes, ids, member=None):
+    return read_entries(dump_path, [(hashes[ror_id][1], hashes[ror_id][2], ror_id) for ror_id in ids], member)
@@ -2,8 +2,11 @@ import argparse
 import copy
 import json
 import os
+import sys
 import logging
 from zipfile import ZipFile, ZIP_DEFLATED
+sys.path.append('../json_array_writer')
+from json_array_writer import write_json_array
 ERROR_LOG = "errors.log"
 
 logging.basicConfig(filename=ERROR_LOG,level=logging.ERROR, filemode='w')
@@ -27,21 +30,16 @@ def split_dump(dump_unzipped, output_path, chunk_size):
     saved_files = []
     #try:
     path, dump_filename = os.path.split(dump_unzipped)
-    f = open(dump_unzipped, 'r')
-    all_records = json.load(f)
+    with open(dump_unzipped, 'r') as f:
+        all_records = json.load(f)
     print(str(len(all_records)) + f" records in dump {dump_unzipped}")
-    split_records = [all_records[i:i + chunk_size] for i in range(0, len(all_records), chunk_size)]
-    print(f"Dump split into {str(len(split_records))} chunks")
-    i = 1
-    for record_chunk in split_records:
+    chunk_starts = range(0, len(all_records), chunk_size)
+    print(f"Dump split into {str(len(chunk_starts))} chunks")
+    for i, start in enumerate(chunk_starts, start=1):
         print(f"Saving chunk {i}")
         chunk_filename = dump_filename.strip(".json") + f"_chunk{i}.json"
-        with open(os.path.join(output_path, chunk_filename), "w") as writer:
-            writer.write(
-                json.dumps(record_chunk, ensure_ascii=False, indent=4, separators=(',', ': '))
-            )
+        write_json_array(os.path.join(output_path, chunk_filename), all_records[start:start + chunk_size], ensure_ascii=False)
         saved_files.append(chunk_filename)
-        i += 1
     return saved_files
     #except:
     #    logging.error(f"Error creating v{output_schema_version} dump file: {e}")
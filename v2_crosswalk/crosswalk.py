@@ -9,8 +9,10 @@ from datetime import date
 from datetime import datetime
 from zipfile import ZipFile, ZIP_DEFLATED
 sys.path.append('../utilities/data_dump_to_csv')
+sys.path.append('../utilities/json_array_writer')
 import convert_to_csv
 import convert_to_csv_v2
+from json_array_writer import JsonArrayWriter
 
 import convert_v1_to_v2
 import convert_v2_to_v1
@@ -33,7 +35,6 @@ def convert_dump(dump_zip_path, output_schema_version, input_path, output_path):
     print("file date is:")
     print(file_date)
     dump_unzipped = ''
-    converted_records = []
     with ZipFile(dump_zip_path, "r") as zf:
         json_files_count = sum('.json' in s for s in zf.namelist())
         if json_files_count == 1:
@@ -45,17 +46,9 @@ def convert_dump(dump_zip_path, output_schema_version, input_path, output_path):
             print("Dump zip contains multiple json files. Something is wrong.")
 
     #try:
-    f = open(dump_unzipped, 'r')
-    records = json.load(f)
+    with open(dump_unzipped, 'r') as f:
+        records = json.load(f)
     print(str(len(records)) + f" records in v{output_schema_version} dump")
-    for record in records:
-        print("processing dump record " + str(record['id']))
-        if output_schema_version == 2:
-            converted_record = convert_v1_to_v2.convert_v1_to_v2(record, file_date)
-        else:
-            converted_record = convert_v2_to_v1.convert_v2_to_v1(record)
-        converted_records.append(converted_record)
-    print(str(len(converted_records)) + f" to be added to v{output_schema_version} dump")
     path, file = os.path.split(dump_unzipped)
     print(file)
     if output_schema_version == 2:
@@ -64,9 +57,15 @@ def convert_dump(dump_zip_path, output_schema_version, input_path, output_path):
         filename = file.replace('_schema_v2.json', '') + ".json"
     print(filename)
 
-    open(output_path + filename, "w").write(
-        json.dumps(converted_records, ensure_ascii=False, indent=4, separators=(',', ': '))
-    )
+    with open(output_path + filename, "w") as f_out, JsonArrayWriter(f_out, ensure_ascii=False) as writer:
+        for record in records:
+            print("processing dump record " + str(record['id']))
+            if output_schema_version == 2:
+                converted_record = convert_v1_to_v2.convert_v1_to_v2(record, file_date)
+            else:
+                converted_record = convert_v2_to_v1.convert_v2_to_v1(record)
+            writer.write(converted_record)
+    print(str(writer.count) + f" added to v{output_schema_version} dump")
     if os.path.exists(output_path + filename):
         return output_path + filename
     else:
@@ -7,6 +7,8 @@ from zipfile import ZipFile, ZIP_DEFLATED
 from datetime import datetime
 from csv import DictReader
 import sys
+sys.path.append('../utilities/json_array_writer')
+from json_array_writer import write_json_array
 
 ERROR_LOG = "errors.log"
 INPUT_PATH = "./"
@@ -27,9 +29,7 @@ def update_dates(dump_file, date_file):
             print("updating record " + record['id'])
             record['admin']['created']['date'] = date_item[0]['created']
             record['admin']['last_modified']['date'] = date_item[0]['last_modified']
-        open(dump_file, "w").write(
-            json.dumps(dump_json, indent=4, separators=(',', ': '))
-        )
+    write_json_array(dump_file, dump_json)
 
 def main():
     parser = argparse.ArgumentParser()